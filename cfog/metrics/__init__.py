@@ -1,6 +1,11 @@
 from cfog.metrics.levenshtein import (
     levenshtein_distance,
     limited_levenshtein_distance,
+    levenshtein_distance_many,
+    damerau_levenshtein_distance,
+    limited_damerau_levenshtein_distance,
     levenshtein_distance_lte1,
     damerau_levenshtein_distance_lte1
 )
+from cfog.metrics.jaro import jaro_similarity, jaro_winkler_similarity
+from cfog.metrics.overlap import sorted_overlaps
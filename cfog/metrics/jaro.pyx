@@ -0,0 +1,138 @@
+# =============================================================================
+# Fog Jaro-Winkler Similarity
+# =============================================================================
+#
+# Functions computing the Jaro similarity and its Jaro-Winkler variant,
+# boosting the similarity of strings sharing a common prefix.
+#
+# [Urls]:
+# https://en.wikipedia.org/wiki/Jaro%E2%80%93Winkler_distance
+#
+# [References]:
+# Jaro, M. A. (1989). "Advances in record linkage methodology as applied to
+# the 1985 census of Tampa Florida". Journal of the American Statistical
+# Association 84 (406): 414–20.
+#
+# Winkler, W. E. (1990). "String Comparator Metrics and Enhanced Decision
+# Rules in the Fellegi-Sunter Model of Record Linkage". Proceedings of the
+# Section on Survey Research Methods. American Statistical Association:
+# 354–359.
+#
+import cython
+from libc.stdlib cimport calloc, free
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def jaro_similarity(str A, str B):
+    """
+    Function computing the Jaro similarity between two given strings.
+
+    Runs in O(m * w), m being the size of the first string and w the size of
+    the matching window.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        float: Jaro similarity between A & B.
+
+    """
+    if A is B or A == B:
+        return 1.0
+
+    cdef Py_ssize_t LA = len(A)
+    cdef Py_ssize_t LB = len(B)
+
+    if LA == 0 or LB == 0:
+        return 0.0
+
+    cdef Py_ssize_t window = (LA if LA > LB else LB) // 2 - 1
+
+    if window < 0:
+        window = 0
+
+    cdef char *flags = <char *> calloc(LA + LB, sizeof(char))
+    cdef char *flags_A = flags
+    cdef char *flags_B = flags + LA
+
+    cdef Py_ssize_t i, j, low, high
+    cdef Py_ssize_t matches = 0
+    cdef Py_ssize_t transpositions = 0
+    cdef Py_UCS4 a
+
+    # Finding matches
+    for i in range(LA):
+        a = A[i]
+        low = i - window if i > window else 0
+        high = i + window + 1 if i + window + 1 < LB else LB
+
+        for j in range(low, high):
+            if not flags_B[j] and a == B[j]:
+                flags_A[i] = 1
+                flags_B[j] = 1
+                matches += 1
+                break
+
+    if matches == 0:
+        free(flags)
+        return 0.0
+
+    # Counting transpositions
+    j = 0
+
+    for i in range(LA):
+        if not flags_A[i]:
+            continue
+
+        while not flags_B[j]:
+            j += 1
+
+        if A[i] != B[j]:
+            transpositions += 1
+
+        j += 1
+
+    free(flags)
+
+    return (
+        <double> matches / LA +
+        <double> matches / LB +
+        <double> (matches - transpositions // 2) / matches
+    ) / 3.0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def jaro_winkler_similarity(str A, str B, double prefix_weight=0.1,
+                            double boost_threshold=0.7):
+    """
+    Function computing the Jaro-Winkler similarity between two given strings,
+    i.e. the Jaro similarity boosted by the size of their common prefix, up
+    to 4 characters.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+        prefix_weight (float, optional): Weight of each character of the
+            common prefix. Should not exceed 0.25. Defaults to 0.1.
+        boost_threshold (float, optional): Jaro similarity over which the
+            similarity will be boosted. Defaults to 0.7.
+
+    Returns:
+        float: Jaro-Winkler similarity between A & B.
+
+    """
+    cdef double similarity = jaro_similarity(A, B)
+
+    if similarity <= boost_threshold:
+        return similarity
+
+    cdef Py_ssize_t limit = min(len(A), len(B), 4)
+    cdef Py_ssize_t prefix = 0
+
+    while prefix < limit and A[prefix] == B[prefix]:
+        prefix += 1
+
+    return similarity + prefix * prefix_weight * (1.0 - similarity)
@@ -18,19 +18,352 @@
 # correction of spelling errors", Communications of the ACM, ACM, 7 (3):
 # 171–176, doi:10.1145/363958.363994
 #
-# Note that this is still slower than python-Levensthein.
+# Hyyrö, Heikki. "A Bit-Vector Algorithm for Computing Levenshtein and
+# Damerau Edit Distances." Nordic Journal of Computing 10, no. 1 (2003):
+# 29–39.
+#
+# Myers, Gene. "A Fast Bit-Vector Algorithm for Approximate String Matching
+# Based on Dynamic Programming." Journal of the ACM 46, no. 3 (1999): 395–415.
+#
+# [Notes]:
+# Distances are computed using Myers' bit-parallel algorithm, as formulated
+# by Hyyrö for the global edit distance, on a single 64 bits word when the
+# shortest string fits, or on blocks of words else.
+#
+# Damerau-Levenshtein distances are computed in their "optimal string
+# alignment" variant, using Hyyrö's extension of the same algorithm when the
+# shortest string fits a single word, and a classical dynamic programming
+# scheme else.
+#
+# The limited variants are able to stop as soon as the distance can be known
+# to exceed the given maximum. Indeed, values of the dynamic programming
+# matrix never decrease along a diagonal, and the value of the cell lying on
+# the diagonal of the last cell can be computed cheaply from the vertical
+# delta vectors using popcounts.
 #
 import cython
-from libc.stdlib cimport malloc, free
+from cpython cimport array
+from libc.stdint cimport uint64_t
+from libc.stdlib cimport malloc, calloc, free
+from libc.string cimport memset
+
+cdef extern from *:
+    int __builtin_popcountll(unsigned long long) nogil
+
+cdef array.array UNSIGNED_INT_ARRAY = array.array('I')
+
+
+cdef struct SingleWordPattern:
+    uint64_t latin[256]
+    Py_UCS4 other_chars[64]
+    uint64_t other_masks[64]
+    Py_ssize_t other_count
+    Py_ssize_t m
+
+
+cdef struct BlockPattern:
+    uint64_t *latin
+    Py_UCS4 *other_chars
+    uint64_t *other_masks
+    uint64_t *VP
+    uint64_t *VN
+    Py_ssize_t other_count
+    Py_ssize_t m
+    Py_ssize_t words
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void single_word_pattern_init(SingleWordPattern *pattern, str A,
+                                   Py_ssize_t start, Py_ssize_t m):
+    """
+    Building the match vectors of a pattern A of length 1 <= m <= 64, starting
+    at the given offset.
+
+    """
+    cdef Py_ssize_t i, o
+    cdef Py_UCS4 c
+    cdef uint64_t bit = 1
+
+    memset(pattern.latin, 0, sizeof(pattern.latin))
+    pattern.other_count = 0
+    pattern.m = m
+
+    for i in range(m):
+        c = A[start + i]
+
+        if c < 256:
+            pattern.latin[c] |= bit
+        else:
+            for o in range(pattern.other_count):
+                if pattern.other_chars[o] == c:
+                    pattern.other_masks[o] |= bit
+                    break
+            else:
+                pattern.other_chars[pattern.other_count] = c
+                pattern.other_masks[pattern.other_count] = bit
+                pattern.other_count += 1
+
+        bit <<= 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t single_word_distance(SingleWordPattern *pattern, str B,
+                                     Py_ssize_t start, Py_ssize_t n,
+                                     Py_ssize_t max_distance):
+    """
+    Myers' algorithm computing the distance between a single word pattern and
+    a text B of length n, starting at the given offset. A negative maximum
+    distance means no limit.
+
+    """
+    cdef Py_ssize_t m = pattern.m
+    cdef Py_ssize_t j, o, row
+    cdef Py_UCS4 c
+
+    cdef uint64_t last = (<uint64_t> 1) << (m - 1)
+    cdef uint64_t mask = <uint64_t> -1 if m == 64 else ((<uint64_t> 1) << m) - 1
+
+    cdef uint64_t VP = <uint64_t> -1
+    cdef uint64_t VN = 0
+    cdef uint64_t Eq, X, D0, HP, HN
+
+    cdef Py_ssize_t score = m
+    cdef Py_ssize_t diagonal
+    cdef Py_ssize_t shift = n - m
+
+    for j in range(n):
+        c = B[start + j]
+
+        if c < 256:
+            Eq = pattern.latin[c]
+        else:
+            Eq = 0
+
+            for o in range(pattern.other_count):
+                if pattern.other_chars[o] == c:
+                    Eq = pattern.other_masks[o]
+                    break
+
+        X = Eq
+        D0 = (((X & VP) + VP) ^ VP) | X | VN
+
+        HP = VN | ~(D0 | VP)
+        HN = D0 & VP
+
+        if HP & last:
+            score += 1
+        elif HN & last:
+            score -= 1
+
+        HP = (HP << 1) | 1
+        HN = HN << 1
+
+        VP = HN | ~(D0 | HP)
+        VN = HP & D0
+
+        # Early exit using the value on the last cell's diagonal
+        if max_distance >= 0:
+            row = j + 1 - shift
+
+            if row < 0:
+                continue
+
+            diagonal = score
+
+            if row < m:
+                diagonal -= __builtin_popcountll((VP & mask) >> row)
+                diagonal += __builtin_popcountll((VN & mask) >> row)
+
+            if diagonal > max_distance:
+                return max_distance + 1
+
+    return score
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void block_pattern_init(BlockPattern *pattern, str A, Py_ssize_t start,
+                             Py_ssize_t m):
+    """
+    Building the match vectors of a pattern A of length m > 64, starting at
+    the given offset, on blocks of words.
+
+    """
+    cdef Py_ssize_t words = (m + 63) // 64
+
+    # NOTE: last row of the latin table is kept empty for unknown chars
+    pattern.latin = <uint64_t *> calloc(257 * words, sizeof(uint64_t))
+    pattern.other_chars = <Py_UCS4 *> malloc(m * sizeof(Py_UCS4))
+    pattern.other_masks = <uint64_t *> calloc(m * words, sizeof(uint64_t))
+    pattern.VP = <uint64_t *> malloc(words * sizeof(uint64_t))
+    pattern.VN = <uint64_t *> malloc(words * sizeof(uint64_t))
+    pattern.other_count = 0
+    pattern.m = m
+    pattern.words = words
+
+    cdef Py_ssize_t i, o, w
+    cdef Py_UCS4 c
+    cdef uint64_t bit
+
+    for i in range(m):
+        c = A[start + i]
+        w = i // 64
+        bit = (<uint64_t> 1) << (i % 64)
+
+        if c < 256:
+            pattern.latin[<Py_ssize_t> c * words + w] |= bit
+        else:
+            for o in range(pattern.other_count):
+                if pattern.other_chars[o] == c:
+                    pattern.other_masks[o * words + w] |= bit
+                    break
+            else:
+                pattern.other_chars[pattern.other_count] = c
+                pattern.other_masks[pattern.other_count * words + w] = bit
+                pattern.other_count += 1
+
+
+cdef void block_pattern_free(BlockPattern *pattern):
+    free(pattern.latin)
+    free(pattern.other_chars)
+    free(pattern.other_masks)
+    free(pattern.VP)
+    free(pattern.VN)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t block_distance(BlockPattern *pattern, str B, Py_ssize_t start,
+                               Py_ssize_t n, Py_ssize_t max_distance):
+    """
+    Hyyrö's blocked variant of Myers' algorithm computing the distance
+    between a block pattern and a text B of length n.
+
+    """
+    cdef Py_ssize_t m = pattern.m
+    cdef Py_ssize_t words = pattern.words
+    cdef uint64_t *VP = pattern.VP
+    cdef uint64_t *VN = pattern.VN
+
+    cdef Py_ssize_t j, o, w, row
+    cdef Py_UCS4 c
+
+    for w in range(words):
+        VP[w] = <uint64_t> -1
+        VN[w] = 0
+
+    cdef uint64_t last = (<uint64_t> 1) << ((m - 1) % 64)
+    cdef uint64_t last_mask = <uint64_t> -1 if m % 64 == 0 else (last << 1) - 1
+
+    cdef uint64_t *Eq
+    cdef uint64_t X, D0, HP, HN, HP_carry, HN_carry, HP_carry_temp, HN_carry_temp
+    cdef uint64_t word_mask
+
+    cdef Py_ssize_t score = m
+    cdef Py_ssize_t diagonal
+    cdef Py_ssize_t shift = n - m
+
+    for j in range(n):
+        c = B[start + j]
+
+        if c < 256:
+            Eq = pattern.latin + <Py_ssize_t> c * words
+        else:
+            Eq = pattern.latin + 256 * words
+
+            for o in range(pattern.other_count):
+                if pattern.other_chars[o] == c:
+                    Eq = pattern.other_masks + o * words
+                    break
+
+        HP_carry = 1
+        HN_carry = 0
+
+        for w in range(words):
+            X = Eq[w] | HN_carry
+            D0 = (((X & VP[w]) + VP[w]) ^ VP[w]) | X | VN[w]
+
+            HP = VN[w] | ~(D0 | VP[w])
+            HN = D0 & VP[w]
+
+            HP_carry_temp = HP_carry
+            HN_carry_temp = HN_carry
+
+            if w < words - 1:
+                HP_carry = HP >> 63
+                HN_carry = HN >> 63
+            else:
+                HP_carry = (HP & last) != 0
+                HN_carry = (HN & last) != 0
+
+            HP = (HP << 1) | HP_carry_temp
+            HN = (HN << 1) | HN_carry_temp
+
+            VP[w] = HN | ~(D0 | HP)
+            VN[w] = HP & D0
+
+        score += <Py_ssize_t> HP_carry - <Py_ssize_t> HN_carry
+
+        # Early exit using the value on the last cell's diagonal
+        if max_distance >= 0:
+            row = j + 1 - shift
+
+            if row < 0:
+                continue
+
+            diagonal = score
+
+            if row < m:
+                w = row // 64
+                word_mask = <uint64_t> -1 if w < words - 1 else last_mask
+                diagonal -= __builtin_popcountll((VP[w] & word_mask) >> (row % 64))
+                diagonal += __builtin_popcountll((VN[w] & word_mask) >> (row % 64))
+                w += 1
+
+                while w < words:
+                    word_mask = <uint64_t> -1 if w < words - 1 else last_mask
+                    diagonal -= __builtin_popcountll(VP[w] & word_mask)
+                    diagonal += __builtin_popcountll(VN[w] & word_mask)
+                    w += 1
+
+            if diagonal > max_distance:
+                return max_distance + 1
+
+    return score
+
+
+cdef Py_ssize_t myers(str A, str B, Py_ssize_t start, Py_ssize_t m,
+                      Py_ssize_t n, Py_ssize_t max_distance):
+    """
+    Function computing the distance between a pattern A of length m >= 1 and
+    a text B of length n, both starting at the given offset.
+
+    """
+    cdef SingleWordPattern single_word_pattern
+    cdef BlockPattern block_pattern
+    cdef Py_ssize_t distance
+
+    if m <= 64:
+        single_word_pattern_init(&single_word_pattern, A, start, m)
+        return single_word_distance(&single_word_pattern, B, start, n, max_distance)
+
+    block_pattern_init(&block_pattern, A, start, m)
+    distance = block_distance(&block_pattern, B, start, n, max_distance)
+    block_pattern_free(&block_pattern)
+
+    return distance
 
 
 @cython.boundscheck(False)
+@cython.wraparound(False)
 def levenshtein_distance(str A, str B):
     """
     Function computing the Levenshtein distance between two given strings.
 
-    Runs in O(mn), m being the size of the first string and n the size of the
-    second one.
+    Runs in O(ceil(m / 64) * n), m being the size of the shortest string and
+    n the size of the longest one.
 
     Args:
         A (str): First string.
@@ -44,8 +377,8 @@ def levenshtein_distance(str A, str B):
     if A is B or A == B:
         return 0
 
-    cdef unsigned int LA = len(A)
-    cdef unsigned int LB = len(B)
+    cdef Py_ssize_t LA = len(A)
+    cdef Py_ssize_t LB = len(B)
 
     if LA > LB:
         A, B = B, A
@@ -57,7 +390,7 @@ def levenshtein_distance(str A, str B):
         LB -= 1
 
     # Ignoring common prefix
-    cdef unsigned int start = 0
+    cdef Py_ssize_t start = 0
 
     while start < LA and A[start] == B[start]:
         start += 1
@@ -68,68 +401,11 @@ def levenshtein_distance(str A, str B):
     if LA == 0:
         return LB
 
-    if LA == 1:
-        if A[start] in B:
-            return LB - 1
-
-        return LB
-
-    cdef unsigned short *codes = <unsigned short *> malloc(LB * sizeof(unsigned short))
-    cdef unsigned int *vector = <unsigned int *> malloc(LB * sizeof(unsigned int))
-
-    cdef unsigned int i = 0
-
-    while i < LB:
-        codes[i] = ord(B[start + i])
-        vector[i] = i + 1
-        i += 1
-
-    cdef unsigned int current = 0
-    cdef unsigned int left = 0
-    cdef unsigned int above = 0
-    cdef unsigned short charA = 0
-    cdef unsigned int j = 0
-
-    i = 0
-
-    while i < LA:
-        left = i
-        current = i + 1
-        charA = ord(A[start + i])
-
-        j = 0
-
-        while j < LB:
-            above = current
-
-            current = left
-            left = vector[j]
-
-            if charA != codes[j]:
-
-                # Insertion
-                if left < current:
-                    current = left
-
-                # Deletion
-                if above < current:
-                    current = above
-
-                current += 1
-
-            vector[j] = current
-
-            j += 1
-
-        i += 1
-
-    free(codes)
-    free(vector)
-
-    return current
+    return myers(A, B, start, LA, LB, -1)
 
 
 @cython.boundscheck(False)
+@cython.wraparound(False)
 def limited_levenshtein_distance(unsigned int max_distance, str A, str B):
     """
     Function computing the limited Levenshtein distance between two given
@@ -153,28 +429,25 @@ def limited_levenshtein_distance(unsigned int max_distance, str A, str B):
     if A is B or A == B:
         return 0
 
-    cdef unsigned int upper_bound = max_distance + 1
+    cdef Py_ssize_t upper_bound = max_distance + 1
 
-    cdef unsigned int LA = len(A)
-    cdef unsigned int LB = len(B)
+    cdef Py_ssize_t LA = len(A)
+    cdef Py_ssize_t LB = len(B)
 
     if LA > LB:
         A, B = B, A
         LA, LB = LB, LA
 
-    if LA == 0:
-        return upper_bound if LB > max_distance else LB
+    if LB - LA > max_distance:
+        return upper_bound
 
     # Ignoring common suffix
     while LA > 0 and A[LA - 1] == B[LB - 1]:
         LA -= 1
         LB -= 1
 
-    if LA == 0:
-        return upper_bound if LB > max_distance else LB
-
     # Ignoring common prefix
-    cdef unsigned int start = 0
+    cdef Py_ssize_t start = 0
 
     while start < LA and A[start] == B[start]:
         start += 1
@@ -185,83 +458,351 @@ def limited_levenshtein_distance(unsigned int max_distance, str A, str B):
     if LA == 0:
         return upper_bound if LB > max_distance else LB
 
-    cdef unsigned int diff = LB - LA
+    cdef Py_ssize_t distance = myers(A, B, start, LA, LB, max_distance)
 
-    if max_distance > LB:
-        max_distance = LB
-    elif diff > max_distance:
-        return upper_bound
+    return distance if distance <= max_distance else upper_bound
 
-    cdef unsigned short *codes = <unsigned short *> malloc(LB * sizeof(unsigned short))
-    cdef unsigned int *vector = <unsigned int *> malloc(LB * sizeof(unsigned int))
 
-    cdef unsigned int i = 0
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def levenshtein_distance_many(str query, list candidates, limit=None):
+    """
+    Function computing the Levenshtein distance between a query string and
+    many candidate strings at once, building the query's bit vectors only
+    once.
 
-    while i < max_distance:
-        codes[i] = ord(B[start + i])
-        vector[i] = i + 1
-        i += 1
+    Args:
+        query (str): Query string.
+        candidates (list): Candidate strings.
+        limit (number, optional): If given, distances over this limit will be
+            reported as limit + 1 as soon as possible, as with
+            limited_levenshtein_distance. Defaults to None.
 
-    while i < LB:
-        codes[i] = ord(B[start + i])
-        vector[i] = upper_bound
-        i += 1
+    Returns:
+        array: Distances between the query & each candidate.
+
+    """
+    cdef Py_ssize_t m = len(query)
+    cdef Py_ssize_t l = len(candidates)
+    cdef Py_ssize_t max_distance = -1
+    cdef Py_ssize_t upper_bound = 0
+    cdef Py_ssize_t i, n, d
+
+    if limit is not None:
+        max_distance = <Py_ssize_t> limit
+        upper_bound = max_distance + 1
+
+    cdef array.array distances = array.clone(UNSIGNED_INT_ARRAY, l, zero=False)
+    cdef unsigned int[:] view = distances
+
+    cdef SingleWordPattern single_word_pattern
+    cdef BlockPattern block_pattern
+    cdef bint single_word = m <= 64
+
+    if m == 0:
+        pass
+    elif single_word:
+        single_word_pattern_init(&single_word_pattern, query, 0, m)
+    else:
+        block_pattern_init(&block_pattern, query, 0, m)
 
-    cdef unsigned int offset = max_distance - diff
-    cdef bint have_max = max_distance < LB
+    cdef str B
 
-    cdef unsigned int j_start = 0
-    cdef unsigned int j_end = max_distance
+    for i in range(l):
+        B = candidates[i]
+        n = len(B)
 
-    cdef unsigned int current = 0
-    cdef unsigned int left
-    cdef unsigned int above
-    cdef unsigned int charA
-    cdef unsigned int j
+        if max_distance >= 0 and (n - m > max_distance or m - n > max_distance):
+            d = upper_bound
+        elif m == 0:
+            d = n
+        elif single_word:
+            d = single_word_distance(&single_word_pattern, B, 0, n, max_distance)
+        else:
+            d = block_distance(&block_pattern, B, 0, n, max_distance)
 
-    i = 0
+        if max_distance >= 0 and d > max_distance:
+            d = upper_bound
 
-    while i < LA:
-        left = i
-        current = i + 1
+        view[i] = d
 
-        charA = ord(A[start + i])
-        j_start += 1 if i > offset else 0
-        j_end += 1 if j_end < LB else 0
+    if m != 0 and not single_word:
+        block_pattern_free(&block_pattern)
 
-        j = j_start
+    return distances
 
-        while j < j_end:
-            above = current
 
-            current = left
-            left = vector[j]
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t single_word_osa_distance(SingleWordPattern *pattern, str B,
+                                         Py_ssize_t start, Py_ssize_t n,
+                                         Py_ssize_t max_distance):
+    """
+    Hyyrö's extension of Myers' algorithm computing the optimal string
+    alignment distance between a single word pattern and a text B of length
+    n, starting at the given offset. A negative maximum distance means no
+    limit.
 
-            if charA != codes[j]:
+    """
+    cdef Py_ssize_t m = pattern.m
+    cdef Py_ssize_t j, o, row
+    cdef Py_UCS4 c
 
-                # Insertion
-                if left < current:
-                    current = left
+    cdef uint64_t last = (<uint64_t> 1) << (m - 1)
+    cdef uint64_t mask = <uint64_t> -1 if m == 64 else ((<uint64_t> 1) << m) - 1
 
-                # Deletion
-                if above < current:
-                    current = above
+    cdef uint64_t VP = <uint64_t> -1
+    cdef uint64_t VN = 0
+    cdef uint64_t D0 = 0
+    cdef uint64_t Eq_old = 0
+    cdef uint64_t Eq, TR, HP, HN
 
-                current += 1
+    cdef Py_ssize_t score = m
+    cdef Py_ssize_t diagonal
+    cdef Py_ssize_t shift = n - m
 
-            vector[j] = current
+    for j in range(n):
+        c = B[start + j]
 
-            j += 1
+        if c < 256:
+            Eq = pattern.latin[c]
+        else:
+            Eq = 0
+
+            for o in range(pattern.other_count):
+                if pattern.other_chars[o] == c:
+                    Eq = pattern.other_masks[o]
+                    break
+
+        # Transpositions are matches of the previous column, shifted by one
+        TR = (((~D0) & Eq) << 1) & Eq_old
+        D0 = (((Eq & VP) + VP) ^ VP) | Eq | VN | TR
+
+        HP = VN | ~(D0 | VP)
+        HN = D0 & VP
+
+        if HP & last:
+            score += 1
+        elif HN & last:
+            score -= 1
+
+        HP = (HP << 1) | 1
+        HN = HN << 1
+
+        VP = HN | ~(D0 | HP)
+        VN = HP & D0
+
+        Eq_old = Eq
+
+        # Early exit using the value on the last cell's diagonal
+        if max_distance >= 0:
+            row = j + 1 - shift
+
+            if row < 0:
+                continue
+
+            diagonal = score
+
+            if row < m:
+                diagonal -= __builtin_popcountll((VP & mask) >> row)
+                diagonal += __builtin_popcountll((VN & mask) >> row)
+
+            if diagonal > max_distance:
+                return max_distance + 1
+
+    return score
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t osa_dynamic_programming(str A, str B, Py_ssize_t start,
+                                        Py_ssize_t m, Py_ssize_t n,
+                                        Py_ssize_t max_distance):
+    """
+    Classical dynamic programming computing the optimal string alignment
+    distance between a pattern A of length m and a text B of length n using
+    three rows, used when the pattern does not fit a single word.
+
+    """
+    cdef Py_ssize_t *rows = <Py_ssize_t *> malloc(3 * (n + 1) * sizeof(Py_ssize_t))
+    cdef Py_ssize_t *before = rows
+    cdef Py_ssize_t *previous = rows + (n + 1)
+    cdef Py_ssize_t *current = rows + 2 * (n + 1)
+    cdef Py_ssize_t *temp
+
+    cdef Py_ssize_t i, j, cost, value
+    cdef Py_ssize_t shift = n - m
+    cdef Py_UCS4 a, b, a_previous = 0
+
+    for j in range(n + 1):
+        previous[j] = j
+
+    for i in range(1, m + 1):
+        a = A[start + i - 1]
+        current[0] = i
+
+        for j in range(1, n + 1):
+            b = B[start + j - 1]
+            cost = 0 if a == b else 1
 
-        if have_max and vector[i + diff] > max_distance:
-            return upper_bound
+            value = previous[j - 1] + cost
 
-        i += 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+
+            if (
+                i > 1 and j > 1 and
+                a == B[start + j - 2] and
+                a_previous == b and
+                before[j - 2] + 1 < value
+            ):
+                value = before[j - 2] + 1
+
+            current[j] = value
+
+        # Early exit using the value on the last cell's diagonal
+        if max_distance >= 0 and current[i + shift] > max_distance:
+            free(rows)
+            return max_distance + 1
+
+        a_previous = a
+
+        temp = before
+        before = previous
+        previous = current
+        current = temp
+
+    value = previous[n]
+    free(rows)
+
+    return value
+
+
+cdef Py_ssize_t osa(str A, str B, Py_ssize_t start, Py_ssize_t m,
+                    Py_ssize_t n, Py_ssize_t max_distance):
+    """
+    Function computing the optimal string alignment distance between a
+    pattern A of length m >= 1 and a text B of length n, both starting at the
+    given offset.
+
+    """
+    cdef SingleWordPattern single_word_pattern
+
+    if m <= 64:
+        single_word_pattern_init(&single_word_pattern, A, start, m)
+        return single_word_osa_distance(&single_word_pattern, B, start, n, max_distance)
+
+    return osa_dynamic_programming(A, B, start, m, n, max_distance)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def damerau_levenshtein_distance(str A, str B):
+    """
+    Function computing the Damerau-Levenshtein distance between two given
+    strings, in its "optimal string alignment" variant, i.e. where no
+    substring can be edited more than once.
+
+    Runs in O(n) when the shortest string has no more than 64 characters,
+    n being the size of the longest one, and in O(m * n) else.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        int: Damerau-Levenshtein distance between A & B.
+
+    """
+
+    if A is B or A == B:
+        return 0
+
+    cdef Py_ssize_t LA = len(A)
+    cdef Py_ssize_t LB = len(B)
+
+    if LA > LB:
+        A, B = B, A
+        LA, LB = LB, LA
+
+    # Ignoring common suffix
+    while LA > 0 and A[LA - 1] == B[LB - 1]:
+        LA -= 1
+        LB -= 1
+
+    # Ignoring common prefix
+    cdef Py_ssize_t start = 0
+
+    while start < LA and A[start] == B[start]:
+        start += 1
+
+    LA -= start
+    LB -= start
+
+    if LA == 0:
+        return LB
+
+    return osa(A, B, start, LA, LB, -1)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def limited_damerau_levenshtein_distance(unsigned int max_distance, str A,
+                                         str B):
+    """
+    Function computing the limited Damerau-Levenshtein distance, in its
+    "optimal string alignment" variant, between two given strings, i.e. if
+    the distance between A & B is over the given maximum, the function will
+    stop computing and return an upper bound of max_distance + 1.
+
+    Args:
+        max_distance (number): Maximum allowable distance between A & B.
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        int: Damerau-Levenshtein distance between A & B or an upper bound.
+
+    """
+
+    if A is B or A == B:
+        return 0
+
+    cdef Py_ssize_t upper_bound = max_distance + 1
+
+    cdef Py_ssize_t LA = len(A)
+    cdef Py_ssize_t LB = len(B)
+
+    if LA > LB:
+        A, B = B, A
+        LA, LB = LB, LA
+
+    if LB - LA > max_distance:
+        return upper_bound
+
+    # Ignoring common suffix
+    while LA > 0 and A[LA - 1] == B[LB - 1]:
+        LA -= 1
+        LB -= 1
+
+    # Ignoring common prefix
+    cdef Py_ssize_t start = 0
+
+    while start < LA and A[start] == B[start]:
+        start += 1
+
+    LA -= start
+    LB -= start
+
+    if LA == 0:
+        return upper_bound if LB > max_distance else LB
 
-    free(codes)
-    free(vector)
+    cdef Py_ssize_t distance = osa(A, B, start, LA, LB, max_distance)
 
-    return current if current <= max_distance else upper_bound
+    return distance if distance <= max_distance else upper_bound
 
 
 def levenshtein_distance_lte1(str A, str B):
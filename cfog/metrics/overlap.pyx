@@ -0,0 +1,78 @@
+# =============================================================================
+# Fog Sorted Overlap
+# =============================================================================
+#
+# Functions computing the overlap, i.e. intersection size, of sorted arrays
+# of unsigned integer tokens, as used by the PPJoin verification step.
+#
+import cython
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def sorted_overlaps(const unsigned int[:] record, const unsigned int[:] tokens,
+                    const unsigned long long[:] offsets, list candidates,
+                    list require_overlaps):
+    """
+    Function computing the overlap between a sorted record and a batch of
+    sorted candidate records stored in a flat token buffer.
+
+    The overlap of a candidate is -1 if it does not reach its required
+    overlap, which is detected as soon as it becomes obvious.
+
+    Args:
+        record (array): Sorted tokens of the record.
+        tokens (array): Flat buffer of candidate tokens.
+        offsets (array): Offsets of the records in the token buffer.
+        candidates (list): Candidate record ids.
+        require_overlaps (list): Required overlap for each candidate.
+
+    Returns:
+        list: The overlaps.
+
+    """
+    cdef Py_ssize_t lx = record.shape[0]
+    cdef Py_ssize_t n = len(candidates)
+    cdef Py_ssize_t c, candidate, start, ly, posx, posy
+    cdef long current_overlap, require_overlap
+    cdef unsigned int a, b
+
+    overlaps = [0] * n
+
+    for c in range(n):
+        candidate = candidates[c]
+        require_overlap = require_overlaps[c]
+
+        start = offsets[candidate]
+        ly = offsets[candidate + 1] - start
+
+        posx = 0
+        posy = 0
+        current_overlap = 0
+
+        while posx < lx and posy < ly:
+            if (
+                lx - posx + current_overlap < require_overlap or
+                ly - posy + current_overlap < require_overlap
+            ):
+                current_overlap = -1
+                break
+
+            a = record[posx]
+            b = tokens[start + posy]
+
+            if a == b:
+                current_overlap += 1
+                posx += 1
+                posy += 1
+            elif a < b:
+                posx += 1
+            else:
+                posy += 1
+
+        if current_overlap < require_overlap:
+            current_overlap = -1
+
+        overlaps[c] = current_overlap
+
+    return overlaps
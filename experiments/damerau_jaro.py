@@ -0,0 +1,52 @@
+import csv
+import random
+from fog.metrics.levenshtein import (
+    damerau_levenshtein_distance as python_damerau_levenshtein_distance,
+    limited_damerau_levenshtein_distance as python_limited_damerau_levenshtein_distance
+)
+from fog.metrics.jaro import jaro_winkler_similarity as python_jaro_winkler_similarity
+from cfog.metrics import (
+    levenshtein_distance,
+    damerau_levenshtein_distance,
+    limited_damerau_levenshtein_distance,
+    jaro_winkler_similarity
+)
+from experiments.utils import Timer
+
+with open('./data/musicians.csv', 'r') as f:
+    reader = csv.DictReader(f)
+
+    artists = sorted(set(line['artist'] for line in reader))
+
+random.seed(123)
+PAIRS = [(random.choice(artists), random.choice(artists)) for _ in range(100_000)]
+
+print('Pairs: %i' % len(PAIRS))
+
+with Timer('cfog-levenshtein'):
+    for A, B in PAIRS:
+        levenshtein_distance(A, B)
+
+with Timer('python-damerau'):
+    for A, B in PAIRS[:10_000]:
+        python_damerau_levenshtein_distance(A, B)
+
+with Timer('python-damerau-limited'):
+    for A, B in PAIRS[:10_000]:
+        python_limited_damerau_levenshtein_distance(2, A, B)
+
+with Timer('cfog-damerau'):
+    for A, B in PAIRS:
+        damerau_levenshtein_distance(A, B)
+
+with Timer('cfog-damerau-limited'):
+    for A, B in PAIRS:
+        limited_damerau_levenshtein_distance(2, A, B)
+
+with Timer('python-jaro-winkler'):
+    for A, B in PAIRS[:10_000]:
+        python_jaro_winkler_similarity(A, B)
+
+with Timer('cfog-jaro-winkler'):
+    for A, B in PAIRS:
+        jaro_winkler_similarity(A, B)
@@ -1,10 +1,18 @@
 import csv
+import tracemalloc
+from collections import defaultdict
 from fog.clustering import (
     all_pairs,
     ppjoin,
     ppjoin_plus,
     pairwise_connected_components
 )
+from fog.clustering.ppjoin import (
+    preprocess,
+    InvertedIndexItem,
+    JaccardHelper,
+    TokenizedRecords
+)
 from fog.tokenizers import trigrams
 from fog.metrics import jaccard_similarity
 from experiments.utils import Timer
@@ -51,6 +59,7 @@ JACCARD_TRIGRAMS_08_GROUND_TRUTH = [
     ('Tim Smith (musician)', 'Tom Smith (musician)')
 ]
 
+
 def compare(A, B):
     assert len(A) == len(B), 'len A = %i, while len B = %i' % (len(A), len(B))
 
@@ -59,6 +68,7 @@ def compare(A, B):
 
     assert A == B
 
+
 with open('./data/musicians.csv', 'r') as f:
     ARTISTS = set(line['artist'] for line in csv.DictReader(f) if len(line['artist'].strip()) > 0)
 
@@ -95,3 +105,57 @@ with Timer('PPJoin+ crc32'):
     pairs = list(ppjoin_plus(ARTISTS, 0.8, tokenizer=trigrams, token_ordering='crc32'))
 
 compare(pairs, JACCARD_TRIGRAMS_08_GROUND_TRUTH)
+
+
+# Memory footprint of the records & inverted index representations
+def traced_memory(fn):
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, current
+
+
+TOKENIZED_RECORDS, ARGSORT = preprocess(list(ARTISTS), trigrams, 'freq')
+HELPER = JaccardHelper(0.8)
+
+
+def legacy_storage():
+    records = [list(record) for record in TOKENIZED_RECORDS]
+    inverted_index = defaultdict(list)
+
+    for k in ARGSORT:
+        record = records[k]
+
+        for t in range(HELPER.probe_length(len(record))):
+            inverted_index[record[t]].append((k, t))
+
+    return records, inverted_index
+
+
+def compact_storage():
+    records = TokenizedRecords()
+
+    for record in TOKENIZED_RECORDS:
+        records.append(record)
+
+    inverted_index = defaultdict(InvertedIndexItem)
+
+    for k in ARGSORT:
+        record = records[k]
+
+        for t in range(HELPER.probe_length(len(record))):
+            index_item = inverted_index[record[t]]
+            index_item.ids.append(k)
+            index_item.positions.append(t)
+
+    return records, inverted_index
+
+
+_, legacy_bytes = traced_memory(legacy_storage)
+_, compact_bytes = traced_memory(compact_storage)
+
+print('Lists & tuples storage: %i bytes' % legacy_bytes)
+print('Array-backed storage: %i bytes' % compact_bytes)
+print('Memory reduction: %.1f%%' % (100 * (1 - compact_bytes / legacy_bytes)))
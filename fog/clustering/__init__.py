@@ -1,24 +1,34 @@
-from fog.clustering.blocking import blocking
+from fog.clustering.blocking import blocking, BlockingStats
 from fog.clustering.intersection_index import (
     intersection_index
 )
 from fog.clustering.key_collision import key_collision
 from fog.clustering.laesa import laesa
+from fog.clustering.leader import streaming_leader
 from fog.clustering.minhash import minhash
-from fog.clustering.nn_descent import nn_descent, nn_descent_full
+from fog.clustering.nn_descent import (
+    nn_descent,
+    nn_descent_full,
+    NNDescentGraph,
+    NNDescentStats
+)
 from fog.clustering.pairwise import (
     pairwise,
     pairwise_leader,
     pairwise_fuzzy_clusters,
-    pairwise_connected_components
+    pairwise_connected_components,
+    PairwiseStats
 )
-from fog.clustering.passjoin import passjoin
+from fog.clustering.passjoin import passjoin, PassJoinStats
 from fog.clustering.ppjoin import (
     all_pairs,
     ppjoin,
-    ppjoin_plus
+    ppjoin_plus,
+    ppjoin_top_k,
+    weighted_ppjoin,
+    PPJoinIndex
 )
-from fog.clustering.quickjoin import quickjoin
+from fog.clustering.quickjoin import quickjoin, QuickJoinStats
 from fog.clustering.sorted_neighborhood import (
     sorted_neighborhood,
     adaptive_sorted_neighborhood
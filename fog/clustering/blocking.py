@@ -6,50 +6,202 @@
 # items to one or more buckets before computing pairwise comparisons on them.
 #
 import dill
-from collections import defaultdict
+from array import array
+from collections import defaultdict, Counter
 from multiprocessing import Pool
-from fog.clustering.utils import make_similarity_function, clusters_from_pairs
+from fog.clustering.utils import (
+    make_similarity_function,
+    clusters_from_pairs,
+    upper_triangular_matrix_tile_iter
+)
 
-# TODO: max_block_size to avoid ngrams with high DF
 # TODO: worker using a VPTree
 # TODO: custom inner algorithm
 # TODO: fuzzy blocking variant
 # TODO: possibility not to merge if sure cannot collide twice
-# TODO: the worker_graph is not used right now, the code does not use it (make a clusters from graph also)
 
+COMPARISONS_PER_TASK = 10_000
+
+# NOTE: set once per worker process by `block_worker_init`
+BLOCK_WORKER_STATE = {}
+
+
+class BlockingStats(object):
+    """
+    Object that can be given to blocking to record statistics about its run,
+    useful to assess how skewed the blocks are.
+
+    Besides aggregates, the distribution of the compared blocks is kept as
+    a histogram of their sizes, from which the number of comparisons
+    performed for each block follows, i.e. n * (n - 1) / 2.
+
+    Attributes:
+        blocks (int): Number of blocks containing at least two items.
+        stop_blocks (int): Number of blocks skipped because they exceeded
+            the maximum block size.
+        comparisons (int): Number of comparisons performed.
+        max_block_comparisons (int): Number of comparisons performed for the
+            largest block.
+        tiles (int): Number of tiles oversized blocks were split into.
+        tasks (int): Number of tasks sent to the subprocesses.
+        block_sizes (Counter): Number of compared blocks, indexed by size.
+
+    """
+
+    __slots__ = (
+        'blocks',
+        'stop_blocks',
+        'comparisons',
+        'max_block_comparisons',
+        'tiles',
+        'tasks',
+        'block_sizes'
+    )
+
+    def __init__(self):
+        self.blocks = 0
+        self.stop_blocks = 0
+        self.comparisons = 0
+        self.max_block_comparisons = 0
+        self.tiles = 0
+        self.tasks = 0
+        self.block_sizes = Counter()
+
+    def __repr__(self):
+        return '<%(class_name)s %(attributes)s>' % {
+            'class_name': self.__class__.__name__,
+            'attributes': ' '.join(
+                '%s=%i' % (name, getattr(self, name))
+                for name in self.__slots__
+                if name != 'block_sizes'
+            )
+        }
+
+
+def block_units(buckets, tile_size, stats):
+    """
+    Function yielding the units of work needed to compare the items of the
+    given buckets, i.e. whole buckets or, for oversized ones, the tiles of
+    their upper triangular matrix.
+
+    """
+    for bucket in buckets:
+        n = len(bucket)
+
+        if n < 2:
+            continue
+
+        comparisons = n * (n - 1) // 2
+
+        stats.blocks += 1
+        stats.block_sizes[n] += 1
+        stats.comparisons += comparisons
+        stats.max_block_comparisons = max(stats.max_block_comparisons, comparisons)
+
+        if n <= tile_size:
+            yield comparisons, bucket, None
+            continue
+
+        for i_offset, j_offset in upper_triangular_matrix_tile_iter(n, tile_size):
+            stats.tiles += 1
+
+            I = bucket[i_offset:i_offset + tile_size]
+
+            if i_offset == j_offset:
+                yield len(I) * (len(I) - 1) // 2, I, None
+            else:
+                J = bucket[j_offset:j_offset + tile_size]
+                yield len(I) * len(J), I, J
+
+
+def block_tasks(units, stats):
+    """
+    Function grouping units of work into tasks of roughly
+    COMPARISONS_PER_TASK comparisons, so that small blocks do not drown in
+    IPC overhead.
 
-def block_worker(payload):
     """
-    Worker function used compute pairwise distance/similarity over a whole
-    block.
+    task = []
+    comparisons = 0
+
+    for unit_comparisons, I, J in units:
+        task.append((I, J))
+        comparisons += unit_comparisons
+
+        if comparisons >= COMPARISONS_PER_TASK:
+            stats.tasks += 1
+            yield task
+            task = []
+            comparisons = 0
+
+    if task:
+        stats.tasks += 1
+        yield task
+
+
+def compare_units(data, similarity, units):
+    """
+    Function comparing the items of the given units of work, each of them
+    being either a whole block of ids (J being None) or a tile.
+
+    Returns:
+        array: Matched pairs, packed as consecutive ids.
 
     """
-    similarity, block, serialized, graph = payload
+    pairs = array('I')
 
-    if serialized:
-        similarity = dill.loads(similarity)
+    for I, J in units:
+        if J is None:
+            for x in range(len(I)):
+                a = I[x]
+                A = data[a]
 
-    pairs = []
-    n = len(block)
+                for y in range(x + 1, len(I)):
+                    b = I[y]
 
-    for i in range(n):
-        A = block[i]
+                    if similarity(A, data[b]):
+                        pairs.append(a)
+                        pairs.append(b)
 
-        for j in range(i + 1, n):
-            B = block[j]
+            continue
 
-            if graph is not None and A in graph and B in graph[A]:
-                continue
+        for a in I:
+            A = data[a]
 
-            if similarity(A, B):
-                pairs.append((A, B))
+            for b in J:
+                if similarity(A, data[b]):
+                    pairs.append(a)
+                    pairs.append(b)
 
     return pairs
 
 
+def block_worker_init(data, similarity):
+    """
+    Initializer of the block workers, storing the dataset & unpickling the
+    similarity function once per process.
+
+    """
+    BLOCK_WORKER_STATE['data'] = data
+    BLOCK_WORKER_STATE['similarity'] = dill.loads(similarity)
+
+
+def block_worker(units):
+    """
+    Worker function used to compare the items of a batch of blocks or tiles.
+
+    """
+    return compare_units(
+        BLOCK_WORKER_STATE['data'],
+        BLOCK_WORKER_STATE['similarity'],
+        units
+    )
+
+
 def blocking(data, block=None, blocks=None, similarity=None, distance=None,
              radius=None, min_size=2, max_size=float('inf'), processes=1,
-             mode='connected_components'):
+             mode='connected_components', max_block_size=None, tile_size=500,
+             stats=None):
     """
     Function returning an iterator over found clusters using the blocking
     method.
@@ -57,6 +209,11 @@ def blocking(data, block=None, blocks=None, similarity=None, distance=None,
     It works by dispatching given items into one or more buckets before
     computing pairwise comparisons on each bucket.
 
+    Blocks larger than the maximum block size, typically produced by very
+    common keys such as frequent ngrams, can be skipped altogether. When
+    running on multiple processes, large blocks are split into tiles and
+    small blocks are batched together so that tasks are evenly sized.
+
     Args:
         data (iterable): Arbitrary iterable containing data points to gather
             into clusters. Will be fully consumed.
@@ -79,6 +236,13 @@ def blocking(data, block=None, blocks=None, similarity=None, distance=None,
             Defaults to 1.
         mode (string, optional): 'fuzzy_clusters', 'connected_components'.
             Defaults to 'connected_components'.
+        max_block_size (int, optional): blocks containing more items than
+            this are considered as stop blocks and skipped. Defaults to None,
+            meaning no limit.
+        tile_size (int, optional): blocks containing more items than this
+            are split into tiles of this size. Defaults to 500.
+        stats (BlockingStats, optional): Stats object that will be updated
+            while the clustering runs. Defaults to None.
 
     Yields:
         list: A viable cluster.
@@ -88,62 +252,63 @@ def blocking(data, block=None, blocks=None, similarity=None, distance=None,
     # Formatting similarity
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
-    # Single block or blocks?
-    if blocks is None:
-        graph = defaultdict(list)
-        worker_graph = None
-
-        def add(x, y):
-            x.append(y)
-    else:
-        graph = defaultdict(set)
-        worker_graph = graph
+    if stats is None:
+        stats = BlockingStats()
 
-        def add(x, y):
-            x.add(y)
+    # Grouping item ids into buckets
+    if not isinstance(data, list):
+        data = list(data)
 
-    # Grouping items into buckets
     buckets = defaultdict(list)
 
-    for item in data:
+    # NOTE: stop blocks are released as soon as they exceed the maximum size
+    stop_blocks = set()
+
+    def add(b, i):
+        if b in stop_blocks:
+            return
+
+        bucket = buckets[b]
+        bucket.append(i)
+
+        if max_block_size is not None and len(bucket) > max_block_size:
+            stop_blocks.add(b)
+            del buckets[b]
+
+    for i, item in enumerate(data):
         if blocks is None:
-            buckets[block(item)].append(item)
+            add(block(item), i)
         else:
-            bs = set(blocks(item))
+            for b in set(blocks(item)):
+                add(b, i)
 
-            for b in bs:
-                buckets[b].append(item)
+    stats.stop_blocks += len(stop_blocks)
+    stop_blocks = None
 
     # Actual clustering
     def clustering():
-        if processes == 1:
-            for bucket in buckets.values():
-                if len(bucket) < 2:
-                    continue
+        units = block_units(buckets.values(), tile_size, stats)
 
-                if type(bucket) is not list:
-                    bucket = list(bucket)
+        if processes == 1:
+            for _, I, J in units:
+                pairs = compare_units(data, similarity, [(I, J)])
+                it = iter(pairs)
 
-                yield from block_worker((similarity, bucket, False, worker_graph))
+                yield from zip(it, it)
         else:
+            initargs = (data, dill.dumps(similarity))
 
-            pickled_similarity = dill.dumps(similarity)
-
-            pool_iter = (
-                (pickled_similarity, bucket if type(bucket) is list else list(bucket), True, None)
-                for bucket
-                in buckets.values()
-                if len(bucket) > 1
-            )
+            with Pool(processes=processes, initializer=block_worker_init, initargs=initargs) as pool:
+                for pairs in pool.imap_unordered(block_worker, block_tasks(units, stats)):
+                    it = iter(pairs)
 
-            with Pool(processes=processes) as pool:
-                for pairs in pool.imap_unordered(block_worker, pool_iter):
-                    yield from pairs
+                    yield from zip(it, it)
 
     yield from clusters_from_pairs(
         clustering(),
         fuzzy=blocks is not None,
         min_size=min_size,
         max_size=max_size,
-        mode=mode
+        mode=mode,
+        items=data
     )
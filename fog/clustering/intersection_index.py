@@ -102,12 +102,10 @@ def intersection_index(data, metric='jaccard', radius=0.8, key=None, min_size=2,
                     if I / M >= radius:
                         yield (i, j)
 
-    gen = clusters_from_pairs(
+    yield from clusters_from_pairs(
         clustering(),
         min_size=min_size,
         max_size=max_size,
-        mode=mode
+        mode=mode,
+        items=data
     )
-
-    for cluster in gen:
-        yield [data[i] for i in cluster]
@@ -52,19 +52,23 @@ def key_collision(data, key=None, keys=None, min_size=2, max_size=float('inf'),
 
     """
 
+    if not isinstance(data, list):
+        data = list(data)
+
+    # NOTE: buckets contain item ids
     buckets = defaultdict(list)
 
     # Single key
     if key is not None:
-        for item in data:
+        for i, item in enumerate(data):
             k = key(item)
 
             if k:
-                buckets[k].append(item)
+                buckets[k].append(i)
 
     # Multiple keys
     elif keys is not None:
-        for item in data:
+        for i, item in enumerate(data):
             ks = keys(item)
 
             if not ks:
@@ -72,15 +76,21 @@ def key_collision(data, key=None, keys=None, min_size=2, max_size=float('inf'),
 
             for k in ks:
                 if k:
-                    buckets[k].append(item)
+                    buckets[k].append(i)
 
     # Merging clusters
     if merge and key is None:
-        yield from clusters_from_buckets(buckets.values(), fuzzy=True)
+        yield from clusters_from_buckets(
+            buckets.values(),
+            min_size=min_size,
+            max_size=max_size,
+            fuzzy=True,
+            items=data
+        )
 
     # Buckets as clusters
     else:
         for cluster in buckets.values():
             if len(cluster) < min_size or len(cluster) > max_size:
                 continue
-            yield cluster
+            yield [data[i] for i in cluster]
@@ -142,7 +142,7 @@ def laesa(data, distance, radius, pivots=None, min_size=2,
                     DD += 1
 
                     if d <= radius:
-                        yield (x, data[k])
+                        yield (i, k)
 
         print('DISTANCES: %i' % DD)
 
@@ -150,5 +150,6 @@ def laesa(data, distance, radius, pivots=None, min_size=2,
         clustering(),
         min_size=min_size,
         max_size=max_size,
-        mode=mode
+        mode=mode,
+        items=data
     )
@@ -0,0 +1,168 @@
+# =============================================================================
+# Fog Streaming Leader Clustering
+# =============================================================================
+#
+# Implementation of a one-pass leader clusterer able to process unbounded
+# streams of items while keeping only a capped number of active leaders in
+# memory.
+#
+from collections import defaultdict, OrderedDict
+
+from fog.clustering.utils import (
+    make_similarity_function,
+    make_batch_similarity_function
+)
+
+
+class Leader(object):
+    __slots__ = ('key', 'block', 'cluster', 'time')
+
+    def __init__(self, key, block, item, time):
+        self.key = key
+        self.block = block
+        self.cluster = [item]
+        self.time = time
+
+
+def streaming_leader(data, similarity=None, distance=None, radius=None,
+                     min_size=2, max_size=float('inf'), key=None, block=None,
+                     max_leaders=None, max_age=None, timestamp=None):
+    """
+    Function returning an iterator over found clusters using a streaming
+    version of the leader algorithm.
+
+    Each incoming item is compared to the active leaders, in the order they
+    were created, and joins the cluster of the first similar one. If no
+    leader is similar, the item becomes a new leader.
+
+    Leaders are evicted, and their cluster yielded, when they exceed the
+    maximum number of active leaders (least recently updated first), when
+    they were not updated for more than a given age, or when their cluster
+    reaches the maximum size. This means the algorithm only needs to store
+    the active leaders' clusters in memory.
+
+    Without any eviction, the produced clusters are the same as the ones
+    produced by `pairwise_leader`, provided no cluster exceeds the maximum
+    size.
+
+    Args:
+        data (iterable): Arbitrary iterable containing data points to gather
+            into clusters. Can be unbounded.
+        similarity (callable): If radius is specified, a function returning
+            the similarity between two points. Else, a function returning
+            whether two points should be deemed similar. Alternatively, one can
+            specify `distance` instead.
+        distance (callable): If radius is specified, a function returning
+            the distance between two points. Else, a function returning
+            whether two point should not be deemed similar. Alternatively, one
+            can specify `similarity` instead.
+        radius (number, optional): produced clusters' radius.
+        min_size (number, optional): minimum number of items in a cluster for
+            it to be considered viable. Defaults to 2.
+        max_size (number, optional): maximum number of items in a cluster.
+            Clusters reaching this size are yielded right away and their
+            leader is retired. Defaults to infinity.
+        key (callable, optional): function returning an item's key.
+            Defaults to None.
+        block (callable, optional): function returning an item's block. If
+            given, items will only be compared to the leaders of their block.
+            Defaults to None.
+        max_leaders (int, optional): maximum number of active leaders.
+            Defaults to None, meaning no limit.
+        max_age (number, optional): maximum time a leader can stay active
+            without being updated. Defaults to None, meaning no limit.
+        timestamp (callable, optional): function returning an item's time,
+            which should never decrease along the stream. Defaults to None,
+            meaning the item's position in the stream.
+
+    Yields:
+        list: A viable cluster.
+
+    """
+
+    # Formatting similarity
+    batch_similarity = make_batch_similarity_function(similarity=similarity, distance=distance, radius=radius)
+    similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
+
+    # Active leaders, from least to most recently updated
+    leaders = OrderedDict()
+
+    # Leader keys indexed by block, in creation order
+    blocks = defaultdict(dict)
+
+    def evict(leader_id):
+        leader = leaders.pop(leader_id)
+        index = blocks[leader.block]
+
+        del index[leader_id]
+
+        if not index:
+            del blocks[leader.block]
+
+        return leader.cluster
+
+    for i, item in enumerate(data):
+        k = key(item) if key is not None else item
+        b = block(item) if block is not None else None
+        t = timestamp(item) if timestamp is not None else i
+
+        # Evicting stale leaders
+        if max_age is not None:
+            while leaders:
+                leader_id, leader = next(iter(leaders.items()))
+
+                if t - leader.time <= max_age:
+                    break
+
+                cluster = evict(leader_id)
+
+                if len(cluster) >= min_size:
+                    yield cluster
+
+        # Finding the first similar leader
+        index = blocks.get(b)
+        match = None
+
+        if index:
+            if batch_similarity is not None:
+                leader_ids, leader_keys = zip(*index.items())
+
+                for j in batch_similarity(k, list(leader_keys)):
+                    match = leader_ids[j]
+                    break
+            else:
+                for leader_id, leader_key in index.items():
+                    if similarity(leader_key, k):
+                        match = leader_id
+                        break
+
+        if match is not None:
+            leader = leaders[match]
+            leader.cluster.append(item)
+            leader.time = t
+            leaders.move_to_end(match)
+
+            if len(leader.cluster) >= max_size:
+                cluster = evict(match)
+
+                if len(cluster) >= min_size:
+                    yield cluster
+
+            continue
+
+        # Item becomes a new leader
+        leaders[i] = Leader(k, b, item, t)
+        blocks[b][i] = k
+
+        if max_leaders is not None and len(leaders) > max_leaders:
+            cluster = evict(next(iter(leaders)))
+
+            if len(cluster) >= min_size:
+                yield cluster
+
+    # Flushing remaining leaders
+    while leaders:
+        cluster = evict(next(iter(leaders)))
+
+        if len(cluster) >= min_size:
+            yield cluster
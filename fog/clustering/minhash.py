@@ -130,9 +130,13 @@ def minhash(data, h=256, key=None, radius=0.8, bands=None, use_numpy=False,
 
     mh = MinHash(h, use_numpy=use_numpy, seed=seed)
 
+    if not isinstance(data, list):
+        data = list(data)
+
+    # NOTE: buckets contain item ids
     buckets = defaultdict(list)
 
-    for item in data:
+    for i, item in enumerate(data):
         k = item
 
         if key is not None:
@@ -142,7 +146,7 @@ def minhash(data, h=256, key=None, radius=0.8, bands=None, use_numpy=False,
 
         for band in range(0, h_upper_bound, rows):
             band_key = (band, '%'.join(str(n) for n in signature[band:band + rows]))
-            buckets[band_key].append(item)
+            buckets[band_key].append(i)
 
     def double_check(A, B):
         if key is not None:
@@ -153,5 +157,6 @@ def minhash(data, h=256, key=None, radius=0.8, bands=None, use_numpy=False,
     yield from clusters_from_buckets(
         buckets.values(),
         mode='connected_components',
-        similarity=double_check
+        similarity=double_check,
+        items=data
     )
@@ -16,13 +16,34 @@
 # recall, at the cost of poorer performance. Chosing log2(n) as k seems to
 # be a generally good compromise.
 #
+import dill
 import math
 import random
-from heapq import heapify, heapreplace
+from functools import partial
+from heapq import heapify, heappop, heappush, heapreplace, nlargest
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
 from fog.clustering.utils import clusters_from_pairs
 
+try:
+    import numpy as np
+except:
+    np = None
+
 # TODO: parallelize nn_descent_full
 
+ENGINES = ('python', 'numpy')
+
+# NOTE: number of slots of the filter of already evaluated pairs, which must
+# be a power of two
+PAIR_FILTER_SIZE = 1 << 20
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# NOTE: number of tasks per process & iteration, to balance the load
+TASKS_PER_PROCESS = 4
+
+NN_DESCENT_WORKER_STATE = {}
+
 
 def sample(rng, N, k, i):
     """
@@ -57,75 +78,171 @@ def reverse(B):
     return R
 
 
-def nn_descent(data, radius, similarity=None, distance=None, k=None,
-               min_size=2, max_size=float('inf'),
-               mode='connected_components',
-               seed=None):
+def push_neighbor(heap, k, s, j):
     """
-    Function returning an iterator over found clusters using the NN-Descent
-    algorithm.
+    Function adding a neighbor to the given heap if it is not full or if the
+    neighbor is more similar than the least similar one. Returns whether the
+    heap was updated.
 
-    Args:
-        data (iterable): Arbitrary iterable containing data points to gather
-            into clusters. Will be fully consumed.
-        radius (number): produced clusters' radius.
-        k (number, optional): number of nearest neighbor to find per item.
-            If not given, k will default to log2(n).
-        similarity (callable): If radius is specified, a function returning
-            the similarity between two points. Else, a function returning
-            whether two points should be deemed similar. Alternatively, one can
-            specify `distance` instead.
-        distance (callable): If radius is specified, a function returning
-            the distance between two points. Else, a function returning
-            whether two point should not be deemed similar. Alternatively, one
-            can specify `similarity` instead.
-        min_size (number, optional): minimum number of items in a cluster for
-            it to be considered viable. Defaults to 2.
-        max_size (number, optional): maximum number of items in a cluster for
-            it to be considered viable. Defaults to infinity.
-        mode (string, optional): 'fuzzy_clusters', 'connected_components'.
-            Defaults to 'connected_components'.
-        seed (number, optional): Seed for RNG. Defaults to None.
+    """
+    if len(heap) < k:
+        for _, other in heap:
+            if other == j:
+                return False
 
-    Yields:
-        list: A viable cluster.
+        heappush(heap, (s, j))
+        return True
+
+    if s <= heap[0][0]:
+        return False
 
+    for _, other in heap:
+        if other == j:
+            return False
+
+    heapreplace(heap, (s, j))
+    return True
+
+
+class NNDescentStats(object):
     """
+    Object given to the NN-Descent callback after the initial sampling of the
+    graph, then after each iteration, to monitor its convergence.
 
-    # Seeding rng
-    rng = random.Random(seed)
+    Attributes:
+        iteration (int): Index of the iteration, 0 being the initial sampling.
+        updates (int): Number of updates of the neighbor heaps.
+        comparisons (int): Number of similarity computations.
 
-    # Inverting distance if needed
-    if distance is not None:
-        similarity = lambda x, y: -distance(x, y)
-        radius = -radius
+    """
 
-    # Making data set into indexable list
-    if type(data) is not list:
-        data = list(data)
+    __slots__ = ('iteration', 'updates', 'comparisons')
 
-    # Note that B & R could be flat arrays
-    V = data
-    B = []
-    N = len(V)
+    def __init__(self, iteration=0, updates=0, comparisons=0):
+        self.iteration = iteration
+        self.updates = updates
+        self.comparisons = comparisons
 
-    # Chosing k
-    if k is None:
-        k = int(math.log2(N))
+    def __repr__(self):
+        return '<%(class_name)s %(attributes)s>' % {
+            'class_name': self.__class__.__name__,
+            'attributes': ' '.join(
+                '%s=%i' % (name, getattr(self, name))
+                for name in self.__slots__
+            )
+        }
 
-    # Initial samples
-    for i, item in enumerate(V):
-        neighbors = [(similarity(item, V[j]), j) for j in sample(rng, N, k, i)]
-        heapify(neighbors)
-        B.append(neighbors)
 
-    c = 1
+def compare_many(V, similarity, similarity_many, i, indices):
+    """
+    Function computing the similarities between the given item & the items
+    at the given indices.
+
+    """
+    if similarity_many is not None:
+        return similarity_many(V[i], [V[j] for j in indices])
+
+    return [similarity(V[i], V[j]) for j in indices]
+
+
+def local_join(V, similarity, similarity_many, k, candidates, i, heap):
+    """
+    Function comparing the given item with the candidates of its candidates
+    and updating its heap accordingly. Returns the number of updates & the
+    number of comparisons.
+
+    """
+    indices = [jj for ii in candidates(i) for jj in candidates(ii) if jj != i]
+    updates = 0
+
+    for s, jj in zip(compare_many(V, similarity, similarity_many, i, indices), indices):
+        if push_neighbor(heap, k, s, jj):
+            updates += 1
+
+    return updates, len(indices)
+
+
+def nn_descent_worker_init(V, similarity, similarity_many, k, offsets, values):
+    NN_DESCENT_WORKER_STATE['V'] = V
+    NN_DESCENT_WORKER_STATE['similarity'] = dill.loads(similarity)
+    NN_DESCENT_WORKER_STATE['similarity_many'] = dill.loads(similarity_many)
+    NN_DESCENT_WORKER_STATE['k'] = k
+    NN_DESCENT_WORKER_STATE['offsets'] = offsets
+    NN_DESCENT_WORKER_STATE['values'] = values
+
+
+def nn_descent_join_worker(task):
+    """
+    Worker function running the local join of a contiguous range of items,
+    whose heaps are sent along, the candidate lists of the iteration being
+    shared through packed arrays.
+
+    """
+    start, heaps = task
+
+    offsets = NN_DESCENT_WORKER_STATE['offsets']
+    values = NN_DESCENT_WORKER_STATE['values']
 
-    while c != 0:
+    def candidates(i):
+        return values[offsets[i]:offsets[i + 1]]
+
+    updates = 0
+    comparisons = 0
+
+    for i, heap in enumerate(heaps, start):
+        u, c = local_join(
+            NN_DESCENT_WORKER_STATE['V'],
+            NN_DESCENT_WORKER_STATE['similarity'],
+            NN_DESCENT_WORKER_STATE['similarity_many'],
+            NN_DESCENT_WORKER_STATE['k'],
+            candidates,
+            i,
+            heap
+        )
+
+        updates += u
+        comparisons += c
+
+    return start, heaps, updates, comparisons
+
+
+def nn_descent_compare_worker(task):
+    P, Q = task
+
+    return compare_pairs(
+        NN_DESCENT_WORKER_STATE['V'],
+        NN_DESCENT_WORKER_STATE['similarity'],
+        NN_DESCENT_WORKER_STATE['similarity_many'],
+        P,
+        Q
+    )
+
+
+def refine_heaps(V, similarity, similarity_many, k, B, delta, callback=None,
+                 pool=None, processes=1, offsets=None, values=None):
+    """
+    Function running NN-Descent iterations over the given heaps, in place,
+    until the number of updates falls under the early termination threshold.
+
+    Since, during an iteration, an item's local join only updates its own
+    heap and the candidate lists are fixed, items can be split across
+    processes while producing the exact same graph.
+
+    """
+    N = len(V)
+    threshold = delta * N * k
+    c = N * k
+    iteration = 0
+
+    # NOTE: as in the paper, stopping when c < delta * N * k, or when the
+    # graph did not change at all
+    while c != 0 and c >= threshold:
         R = reverse(B)
         C = []
 
         c = 0
+        comparisons = 0
+        iteration += 1
 
         for i, item in enumerate(V):
             candidates = set(j for _, j in B[i])
@@ -133,40 +250,798 @@ def nn_descent(data, radius, similarity=None, distance=None, k=None,
 
             C.append(list(candidates))
 
-        for i in range(N):
-            BA = C[i]
+        if pool is None:
+            for i in range(N):
+                u, d = local_join(V, similarity, similarity_many, k, C.__getitem__, i, B[i])
 
-            for ii in BA:
-                BB = C[ii]
+                c += u
+                comparisons += d
 
-                for jj in BB:
+        else:
 
-                    if i == jj:
-                        continue
+            # Sharing the candidate lists with the processes
+            o = 0
 
-                    s = similarity(V[i], V[jj])
+            for i, candidates in enumerate(C):
+                offsets[i] = o
+                values[o:o + len(candidates)] = candidates
+                o += len(candidates)
 
-                    if s > B[i][0][0]:
-                        c += 1
-                        heapreplace(B[i], (s, jj))
+            offsets[N] = o
 
-    def clustering():
-        for i, neighbors in enumerate(B):
+            size = max(1, -(-N // (processes * TASKS_PER_PROCESS)))
+            tasks = ((start, B[start:start + size]) for start in range(0, N, size))
+
+            for start, heaps, u, d in pool.imap_unordered(nn_descent_join_worker, tasks):
+                B[start:start + len(heaps)] = heaps
+
+                c += u
+                comparisons += d
+
+        if callback is not None:
+            callback(NNDescentStats(iteration, c, comparisons))
+
+
+def nn_descent_heaps(V, similarity, k, rng, delta=0.0, similarity_many=None,
+                     processes=1, callback=None):
+    """
+    Function building the approximate k-nn graph of the given items, as a list
+    of min heaps of (similarity, index) tuples.
+
+    """
+    B = []
+    N = len(V)
+
+    # Initial samples
+    for i in range(N):
+        indices = sample(rng, N, k, i)
+        neighbors = list(zip(compare_many(V, similarity, similarity_many, i, indices), indices))
+        heapify(neighbors)
+        B.append(neighbors)
+
+    if callback is not None:
+        callback(NNDescentStats(0, N * k, N * k))
+
+    if processes < 2:
+        refine_heaps(V, similarity, similarity_many, k, B, delta, callback=callback)
+        return B
+
+    # Candidate lists hold at most N * k neighbors & N * k reverse neighbors
+    offsets = RawArray('I', N + 1)
+    values = RawArray('I', 2 * N * k)
+
+    initargs = (
+        V,
+        dill.dumps(similarity),
+        dill.dumps(similarity_many),
+        k,
+        offsets,
+        values
+    )
+
+    with Pool(processes=processes, initializer=nn_descent_worker_init, initargs=initargs) as pool:
+        refine_heaps(
+            V,
+            similarity,
+            similarity_many,
+            k,
+            B,
+            delta,
+            callback=callback,
+            pool=pool,
+            processes=processes,
+            offsets=offsets,
+            values=values
+        )
+
+    return B
+
+
+def sorted_unique(A):
+    """
+    Function returning the sorted unique values of the given array.
+
+    """
+    if len(A) == 0:
+        return A
+
+    A = np.sort(A)
+
+    return A[np.r_[True, A[1:] != A[:-1]]]
+
+
+def sample_matrix(rng, N, k):
+    """
+    Function sampling, for each of the N items, k distinct indices from the
+    range 0-N without the item's own index.
+
+    """
+    I = rng.integers(0, N - 1, size=(N, k))
+
+    # Skipping the item's own index
+    I += I >= np.arange(N)[:, None]
+
+    # Resampling rows containing duplicates
+    S = np.sort(I, axis=1)
+
+    for i in np.flatnonzero((S[:, 1:] == S[:, :-1]).any(axis=1)).tolist():
+        row = rng.choice(N - 1, size=k, replace=False)
+        I[i] = row + (row >= i)
+
+    return I
+
+
+def sample_groups(rng, groups, values, limit):
+    """
+    Function keeping at most `limit` random values per group, and returning
+    the kept groups & values sorted by group.
+
+    """
+    order = np.lexsort((rng.random(len(groups)), groups))
+    groups = groups[order]
+    values = values[order]
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(groups)])
+    ranks = np.arange(len(groups)) - np.repeat(starts, counts)
+
+    mask = ranks < limit
+
+    return groups[mask], values[mask], order[mask]
+
+
+def group_products(N, A_groups, A_values, B_groups, B_values):
+    """
+    Function returning every (a, b) pair of values belonging to the same
+    group, B being sorted by group.
+
+    """
+    B_counts = np.bincount(B_groups, minlength=N)
+    B_starts = np.cumsum(B_counts) - B_counts
+
+    repeats = B_counts[A_groups]
+    total = int(repeats.sum())
+
+    left = np.repeat(A_values, repeats)
+    offsets = np.arange(total) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    right = B_values[np.repeat(B_starts[A_groups], repeats) + offsets]
+
+    return left, right
+
+
+def compare_pairs(V, similarity, similarity_many, P, Q):
+    """
+    Function computing the similarities of the given pairs, P being sorted.
+
+    """
+    if similarity_many is None:
+        return np.fromiter(
+            (similarity(V[p], V[q]) for p, q in zip(P.tolist(), Q.tolist())),
+            dtype=np.float64,
+            count=len(P)
+        )
+
+    scores = np.empty(len(P), dtype=np.float64)
+
+    if len(P) == 0:
+        return scores
+
+    starts = np.flatnonzero(np.r_[True, P[1:] != P[:-1]]).tolist()
+
+    for start, end in zip(starts, starts[1:] + [len(P)]):
+        scores[start:end] = similarity_many(V[int(P[start])], [V[q] for q in Q[start:end].tolist()])
+
+    return scores
+
+
+def merge_neighbors(indices, scores, flags, U, W, S):
+    """
+    Function merging candidate (u, w, similarity) updates into the neighbor
+    matrices, in place. Returns the number of updates.
+
+    """
+    N, k = indices.shape
+
+    # Dropping candidates that cannot enter their neighborhood
+    mask = S > scores[U, -1]
+    U, W, S = U[mask], W[mask], S[mask]
+
+    if len(U) == 0:
+        return 0
+
+    # Dropping candidates already in the neighborhood
+    mask = (indices[U] != W[:, None]).all(axis=1)
+    U, W, S = U[mask], W[mask], S[mask]
+
+    if len(U) == 0:
+        return 0
+
+    nodes = sorted_unique(U)
+
+    G = np.concatenate((np.repeat(nodes, k), U))
+    J = np.concatenate((indices[nodes].ravel(), W))
+    X = np.concatenate((scores[nodes].ravel(), S))
+    F = np.concatenate((flags[nodes].ravel(), np.ones(len(U), dtype=bool)))
+    E = np.concatenate((np.zeros(len(nodes) * k, dtype=bool), np.ones(len(U), dtype=bool)))
+
+    # Keeping the k most similar, current neighbors winning ties
+    order = np.lexsort((E, -X, G))
+    G, J, X, F, E = G[order], J[order], X[order], F[order], E[order]
+
+    starts = np.flatnonzero(np.r_[True, G[1:] != G[:-1]])
+    counts = np.diff(np.r_[starts, len(G)])
+    mask = (np.arange(len(G)) - np.repeat(starts, counts)) < k
+
+    indices[nodes] = J[mask].reshape(-1, k)
+    scores[nodes] = X[mask].reshape(-1, k)
+    flags[nodes] = F[mask].reshape(-1, k)
+
+    return int(E[mask].sum())
+
+
+def compare_pairs_in_parallel(pool, processes, P, Q):
+    """
+    Function computing the similarities of the given pairs using a pool of
+    processes, P being sorted. Chunks never split the pairs of a same item
+    so that similarities can still be batched.
+
+    """
+    cuts = np.linspace(0, len(P), processes * TASKS_PER_PROCESS + 1).astype(np.int64)[1:-1]
+    cuts = np.searchsorted(P, P[cuts[cuts < len(P)]])
+    bounds = sorted_unique(np.r_[0, cuts, len(P)]).tolist()
+
+    tasks = ((P[a:b], Q[a:b]) for a, b in zip(bounds, bounds[1:]))
+
+    return np.concatenate(
+        [np.empty(0, dtype=np.float64)] +
+        list(pool.imap(nn_descent_compare_worker, tasks))
+    )
+
+
+def nn_descent_matrix(V, similarity, k, rng, delta=0.0, rho=1.0,
+                      similarity_many=None, processes=1, callback=None):
+    """
+    Function building the approximate k-nn graph of the given items, as a
+    (N, k) matrix of neighbor indices and a (N, k) matrix of similarities,
+    both sorted from most to least similar.
+
+    """
+    if processes < 2:
+        compare = partial(compare_pairs, V, similarity, similarity_many)
+
+        return descend_matrix(V, compare, k, rng, delta, rho, callback)
+
+    initargs = (
+        V,
+        dill.dumps(similarity),
+        dill.dumps(similarity_many),
+        k,
+        None,
+        None
+    )
+
+    with Pool(processes=processes, initializer=nn_descent_worker_init, initargs=initargs) as pool:
+        compare = partial(compare_pairs_in_parallel, pool, processes)
+
+        return descend_matrix(V, compare, k, rng, delta, rho, callback)
+
+
+def descend_matrix(V, compare, k, rng, delta, rho, callback=None):
+    """
+    Function running the NN-Descent iterations of the numpy engine, where
+    each iteration performs the local join of the paper over the whole graph
+    at once: only pairs involving at least one new neighbor are considered,
+    and pairs already evaluated are skipped using a bounded hash filter.
+    Similarities are computed by the given function, while updates are
+    merged into the neighbor matrices afterwards.
+
+    """
+    N = len(V)
+    rhoK = max(1, int(rho * k))
+
+    # Initial samples
+    indices = sample_matrix(rng, N, k)
+    scores = compare(np.repeat(np.arange(N), k), indices.ravel()).reshape(N, k)
+
+    if callback is not None:
+        callback(NNDescentStats(0, N * k, N * k))
+
+    order = np.argsort(-scores, axis=1, kind='stable')
+    indices = np.take_along_axis(indices, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    flags = np.ones((N, k), dtype=bool)
+
+    # Bounded filter of already evaluated pairs, where collisions only mean
+    # some pairs will be evaluated twice
+    evaluated = np.full(PAIR_FILTER_SIZE, -1, dtype=np.int64)
+    shift = np.uint64(64 - (PAIR_FILTER_SIZE.bit_length() - 1))
+
+    rows = np.repeat(np.arange(N), k)
+    threshold = delta * N * k
+    c = N * k
+    iteration = 0
+
+    while c != 0 and c >= threshold:
+        iteration += 1
+
+        J = indices.ravel()
+        F = flags.ravel()
+
+        # Old neighbors, and a sample of the new ones that become old
+        old_groups, old_values = rows[~F], J[~F]
+
+        positions = np.flatnonzero(F)
+        new_groups, new_values, kept = sample_groups(rng, rows[positions], J[positions], rhoK)
+        F[positions[kept]] = False
+
+        # Adding sampled reverse neighbors
+        reverse_old_groups, reverse_old_values, _ = sample_groups(rng, old_values, old_groups, rhoK)
+        reverse_new_groups, reverse_new_values, _ = sample_groups(rng, new_values, new_groups, rhoK)
+
+        new_groups = np.concatenate((new_groups, reverse_new_groups))
+        new_values = np.concatenate((new_values, reverse_new_values))
+        order = np.argsort(new_groups, kind='stable')
+        new_groups, new_values = new_groups[order], new_values[order]
+
+        old_groups = np.concatenate((old_groups, reverse_old_groups))
+        old_values = np.concatenate((old_values, reverse_old_values))
+        order = np.argsort(old_groups, kind='stable')
+        old_groups, old_values = old_groups[order], old_values[order]
+
+        # Local join: new x new & new x old
+        P1, Q1 = group_products(N, new_groups, new_values, new_groups, new_values)
+        P2, Q2 = group_products(N, new_groups, new_values, old_groups, old_values)
+
+        P = np.concatenate((P1, P2))
+        Q = np.concatenate((Q1, Q2))
+
+        mask = P != Q
+        P, Q = P[mask], Q[mask]
+
+        keys = sorted_unique(np.minimum(P, Q) * N + np.maximum(P, Q))
+
+        slots = ((keys.astype(np.uint64) * np.uint64(HASH_MULTIPLIER)) >> shift).astype(np.int64)
+        mask = evaluated[slots] != keys
+        keys, slots = keys[mask], slots[mask]
+        evaluated[slots] = keys
+
+        P, Q = keys // N, keys % N
+        S = compare(P, Q)
+
+        c = merge_neighbors(
+            indices,
+            scores,
+            flags,
+            np.concatenate((P, Q)),
+            np.concatenate((Q, P)),
+            np.concatenate((S, S))
+        )
+
+        if callback is not None:
+            callback(NNDescentStats(iteration, c, len(P)))
+
+    return indices, scores
+
+
+class NNDescentGraph(object):
+    """
+    Approximate k-nn graph built using the NN-Descent algorithm, that can be
+    queried, incrementally updated with new items & persisted to disk so that
+    its expensive construction can be amortized.
+
+    Args:
+        data (iterable, optional): Items used to build the graph. Defaults
+            to `None`.
+        similarity (callable): A function returning the similarity between two
+            items. Alternatively, one can specify `distance` instead.
+        distance (callable): A function returning the distance between two
+            items. Alternatively, one can specify `similarity` instead.
+        k (number, optional): number of nearest neighbor to find per item.
+            If not given, k will default to log2(n), n being the number of
+            items given to the constructor, and to at least 1.
+        seed (number, optional): Seed for RNG. Defaults to None.
+        engine (str, optional): Engine used to build the graph, either
+            `python`, storing neighbors in heaps, or `numpy`, storing them
+            in fixed-size matrices and running each iteration's local join
+            over the whole graph at once. Defaults to `python`.
+        delta (number, optional): early termination threshold. Roughly the
+            fraction of true k-nn that are allowed to be missed due to an
+            early termination. Defaults to 0, meaning iterations run until
+            the graph does not change anymore. The paper suggests 0.001.
+        rho (number, optional): sample rate of the `numpy` engine, defining
+            a trade-off between accuracy and speed. Defaults to 1.0.
+        similarity_many (callable, optional): A function taking an item & a
+            list of items and returning their similarities, used to batch
+            similarity computations when building the graph.
+        distance_many (callable, optional): A function taking an item & a
+            list of items and returning their distances, such as
+            `levenshtein_distance_many` from cfog. Alternatively, one can
+            specify `similarity_many` instead.
+        processes (int, optional): Number of processes used to build the
+            graph. The produced graph does not depend on it. Defaults to 1.
+        callback (callable, optional): Function called with a
+            `NNDescentStats` object after the initial sampling of the graph,
+            then after each iteration. Defaults to None.
+
+    """
+
+    def __init__(self, data=None, similarity=None, distance=None, k=None,
+                 seed=None, engine='python', delta=0.0, rho=1.0,
+                 similarity_many=None, distance_many=None, processes=1,
+                 callback=None):
+
+        if similarity is None and distance is None:
+            raise TypeError('fog.clustering.nn_descent: need a similarity or a distance')
+
+        if engine not in ENGINES:
+            raise TypeError('fog.clustering.nn_descent: unknown engine "%s"' % engine)
+
+        if engine == 'numpy':
+            assert np is not None, 'numpy is not installed'
+
+        self.rng = random.Random(seed)
+        self.distance = distance
+
+        # Inverting distance if needed
+        if distance is not None:
+            similarity = lambda x, y: -distance(x, y)
+
+        if distance_many is not None:
+            if engine == 'numpy':
+                similarity_many = lambda x, Y: -np.asarray(distance_many(x, Y), dtype=np.float64)
+            else:
+                similarity_many = lambda x, Y: [-d for d in distance_many(x, Y)]
+
+        self.similarity = similarity
+
+        # Making data set into indexable list
+        items = list(data) if data is not None else []
+
+        # Chosing k
+        if k is None:
+            k = max(1, int(math.log2(len(items)))) if items else 1
+
+        self.k = k
+        self.items = items
+        self.heaps = []
+
+        if items:
+            if len(items) <= k:
+                self.heaps = [
+                    sorted((similarity(A, B), j) for j, B in enumerate(items) if j != i)
+                    for i, A in enumerate(items)
+                ]
+
+            elif engine == 'numpy':
+                indices, scores = nn_descent_matrix(
+                    items,
+                    similarity,
+                    k,
+                    np.random.default_rng(self.rng.getrandbits(64)),
+                    delta=delta,
+                    rho=rho,
+                    similarity_many=similarity_many,
+                    processes=processes,
+                    callback=callback
+                )
+
+                # Rows sorted in ascending order are valid min heaps
+                self.heaps = [
+                    list(zip(row_scores, row_indices))
+                    for row_scores, row_indices in zip(scores[:, ::-1].tolist(), indices[:, ::-1].tolist())
+                ]
+
+            else:
+                self.heaps = nn_descent_heaps(
+                    items,
+                    similarity,
+                    k,
+                    self.rng,
+                    delta=delta,
+                    similarity_many=similarity_many,
+                    processes=processes,
+                    callback=callback
+                )
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return '<%(class_name)s k=%(k)i items=%(items)i>' % {
+            'class_name': self.__class__.__name__,
+            'k': self.k,
+            'items': len(self.items)
+        }
+
+    def __score(self, s):
+        return -s if self.distance is not None else s
+
+    def neighbors(self, i):
+        """
+        Method returning the approximate nearest neighbors of the given item,
+        from nearest to farthest.
+
+        Args:
+            i (int): Index of the item.
+
+        Returns:
+            list: List of (index, similarity) tuples, or (index, distance)
+                tuples if the graph was built using a distance.
+
+        """
+        return [(j, self.__score(s)) for s, j in sorted(self.heaps[i], reverse=True)]
+
+    def search(self, item, breadth):
+        """
+        Method greedily searching the graph for the nearest neighbors of the
+        given item, starting from random entry points and moving towards the
+        neighbors of the best candidates found so far. Returns a min heap of
+        (similarity, index) tuples.
+
+        """
+        items = self.items
+        heaps = self.heaps
+        similarity = self.similarity
+        n = len(items)
+
+        # Starting from random entry points
+        visited = set(self.rng.sample(range(n), min(breadth, n)))
+
+        best = [(similarity(item, items[j]), j) for j in visited]
+        heapify(best)
+
+        frontier = [(-s, j) for s, j in best]
+        heapify(frontier)
+
+        while frontier:
+            s, j = heappop(frontier)
+
+            # Best candidate cannot improve the results anymore
+            if len(best) >= breadth and -s < best[0][0]:
+                break
+
+            for _, jj in heaps[j]:
+                if jj in visited:
+                    continue
+
+                visited.add(jj)
+
+                s = similarity(item, items[jj])
+
+                if len(best) < breadth:
+                    heappush(best, (s, jj))
+                elif s > best[0][0]:
+                    heapreplace(best, (s, jj))
+                else:
+                    continue
+
+                heappush(frontier, (-s, jj))
+
+        return best
+
+    def add(self, item, breadth=None):
+        """
+        Method adding a new item to the graph without rebuilding it. The
+        item's neighbors are first found by searching the graph, then the
+        item is joined with them so that it can enter their own neighborhood.
+
+        Args:
+            item (any): The item to add.
+            breadth (number, optional): Number of best candidates kept while
+                searching the item's neighbors. Defaults to twice k.
+
+        Returns:
+            int: The index of the added item.
+
+        """
+        heaps = self.heaps
+        k = self.k
+
+        i = len(self.items)
+
+        if i == 0:
+            self.items.append(item)
+            heaps.append([])
+            return i
+
+        if breadth is None:
+            breadth = 2 * k
+
+        candidates = self.search(item, max(k, breadth))
+
+        self.items.append(item)
+
+        heap = []
+        heaps.append(heap)
+
+        for s, j in candidates:
+            push_neighbor(heap, k, s, j)
+            push_neighbor(heaps[j], k, s, i)
+
+        return i
+
+    def query(self, item, k=None, breadth=None):
+        """
+        Method returning the approximate nearest neighbors of the given item,
+        found by greedily searching the graph.
+
+        Args:
+            item (any): The item to query.
+            k (number, optional): Number of neighbors to return. Defaults to
+                the k of the graph.
+            breadth (number, optional): Number of best candidates kept during
+                the search. The larger it is, the better the recall, at the
+                cost of more similarity computations. Defaults to twice k.
+
+        Returns:
+            list: List of (index, similarity) tuples, or (index, distance)
+                tuples if the graph was built using a distance, from nearest
+                to farthest.
+
+        """
+        if k is None:
+            k = self.k
+
+        if breadth is None:
+            breadth = 2 * k
+
+        if not self.items:
+            return []
+
+        best = self.search(item, max(k, breadth))
+
+        return [(j, self.__score(s)) for s, j in nlargest(k, best)]
+
+    def pairs(self, radius):
+        """
+        Method returning an iterator over the (i, j) pairs of the graph whose
+        similarity is at least, or whose distance is at most, the given radius.
+
+        """
+        if self.distance is not None:
+            radius = -radius
+
+        for i, neighbors in enumerate(self.heaps):
             for s, j in neighbors:
                 if s >= radius:
                     yield (i, j)
 
-    gen = clusters_from_pairs(
-        clustering(),
+    def clusters(self, radius, min_size=2, max_size=float('inf'),
+                 mode='connected_components'):
+        """
+        Method returning an iterator over the clusters found in the graph.
+
+        Args:
+            radius (number): produced clusters' radius.
+            min_size (number, optional): minimum number of items in a cluster
+                for it to be considered viable. Defaults to 2.
+            max_size (number, optional): maximum number of items in a cluster
+                for it to be considered viable. Defaults to infinity.
+            mode (string, optional): 'fuzzy_clusters', 'connected_components'.
+                Defaults to 'connected_components'.
+
+        Yields:
+            list: A viable cluster.
+
+        """
+        yield from clusters_from_pairs(
+            self.pairs(radius),
+            min_size=min_size,
+            max_size=max_size,
+            mode=mode,
+            fuzzy=True,
+            items=self.items
+        )
+
+    def save(self, path):
+        """
+        Method saving the graph to disk.
+
+        Args:
+            path (str): Path of the file to write.
+
+        """
+        with open(path, 'wb') as f:
+            dill.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Method loading a graph from disk.
+
+        Args:
+            path (str): Path of the file to read.
+
+        Returns:
+            NNDescentGraph: The loaded graph.
+
+        """
+        with open(path, 'rb') as f:
+            graph = dill.load(f)
+
+        if not isinstance(graph, cls):
+            raise TypeError('fog.clustering.nn_descent: "%s" does not contain a valid graph' % path)
+
+        return graph
+
+
+def nn_descent(data, radius, similarity=None, distance=None, k=None,
+               min_size=2, max_size=float('inf'),
+               mode='connected_components',
+               seed=None, engine='python', delta=0.0, rho=1.0,
+               similarity_many=None, distance_many=None, processes=1,
+               callback=None):
+    """
+    Function returning an iterator over found clusters using the NN-Descent
+    algorithm.
+
+    Note that one can use a `NNDescentGraph` instead to keep the k-nn graph
+    around, query it or update it.
+
+    Args:
+        data (iterable): Arbitrary iterable containing data points to gather
+            into clusters. Will be fully consumed.
+        radius (number): produced clusters' radius.
+        k (number, optional): number of nearest neighbor to find per item.
+            If not given, k will default to log2(n).
+        similarity (callable): If radius is specified, a function returning
+            the similarity between two points. Else, a function returning
+            whether two points should be deemed similar. Alternatively, one can
+            specify `distance` instead.
+        distance (callable): If radius is specified, a function returning
+            the distance between two points. Else, a function returning
+            whether two point should not be deemed similar. Alternatively, one
+            can specify `similarity` instead.
+        min_size (number, optional): minimum number of items in a cluster for
+            it to be considered viable. Defaults to 2.
+        max_size (number, optional): maximum number of items in a cluster for
+            it to be considered viable. Defaults to infinity.
+        mode (string, optional): 'fuzzy_clusters', 'connected_components'.
+            Defaults to 'connected_components'.
+        seed (number, optional): Seed for RNG. Defaults to None.
+        engine (str, optional): 'python', 'numpy'. See `NNDescentGraph`.
+            Defaults to 'python'.
+        delta (number, optional): early termination threshold. Roughly the
+            fraction of true k-nn that are allowed to be missed due to an
+            early termination. Defaults to 0, meaning iterations run until
+            the graph does not change anymore. The paper suggests 0.001.
+        rho (number, optional): sample rate of the numpy engine. Defaults
+            to 1.0.
+        similarity_many (callable, optional): A function taking an item & a
+            list of items and returning their similarities.
+        distance_many (callable, optional): A function taking an item & a
+            list of items and returning their distances.
+        processes (int, optional): Number of processes used to build the
+            k-nn graph. Defaults to 1.
+        callback (callable, optional): Function called with a
+            `NNDescentStats` object after each iteration. Defaults to None.
+
+    Yields:
+        list: A viable cluster.
+
+    """
+    graph = NNDescentGraph(
+        data,
+        similarity=similarity,
+        distance=distance,
+        k=k,
+        seed=seed,
+        engine=engine,
+        delta=delta,
+        rho=rho,
+        similarity_many=similarity_many,
+        distance_many=distance_many,
+        processes=processes,
+        callback=callback
+    )
+
+    yield from graph.clusters(
+        radius,
         min_size=min_size,
         max_size=max_size,
-        mode=mode,
-        fuzzy=True
+        mode=mode
     )
 
-    for cluster in gen:
-        yield [V[i] for i in cluster]
-
 
 def shuffle_k(rng, L, k):
     i = -1
@@ -362,13 +1237,11 @@ def nn_descent_full(data, radius, similarity=None, distance=None, k=None,
                 if s >= radius:
                     yield (i, j)
 
-    gen = clusters_from_pairs(
+    yield from clusters_from_pairs(
         clustering(),
         min_size=min_size,
         max_size=max_size,
         mode=mode,
-        fuzzy=True
+        fuzzy=True,
+        items=V
     )
-
-    for cluster in gen:
-        yield [V[i] for i in cluster]
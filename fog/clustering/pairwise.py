@@ -6,18 +6,68 @@
 # suitable clusters.
 #
 import dill
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from functools import partial
+from itertools import islice
 from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
 from phylactery import UnionFind
 
 from fog.clustering.utils import (
     make_similarity_function,
-    upper_triangular_matrix_chunk_iter
+    make_batch_similarity_function,
+    upper_triangular_matrix_tile_iter
 )
 
+TILES_PER_TASK = 8
+LEADER_CHUNKS_PER_PROCESS = 2
+
+# NOTE: set once per worker process by `pairwise_tile_worker_init` and
+# `pairwise_leader_worker_init` respectively
+TILE_WORKER_STATE = {}
+LEADER_WORKER_STATE = {}
+
+
+class PairwiseStats(object):
+    """
+    Object that can be given to pairwise_connected_components to record
+    statistics about its run.
+
+    Attributes:
+        comparisons (int): Number of pairs actually compared.
+        pruned (int): Number of pairs skipped because both items were already
+            known to belong to the same component.
+        relabels (int): Number of component labels rewritten in the array
+            shared with the subprocesses.
+
+    """
+
+    __slots__ = ('comparisons', 'pruned', 'relabels')
+
+    def __init__(self):
+        self.comparisons = 0
+        self.pruned = 0
+        self.relabels = 0
+
+    def update(self, other):
+        self.comparisons += other.comparisons
+        self.pruned += other.pruned
+        self.relabels += other.relabels
+
+    def __repr__(self):
+        return '<%(class_name)s %(attributes)s>' % {
+            'class_name': self.__class__.__name__,
+            'attributes': ' '.join(
+                '%s=%i' % (name, getattr(self, name))
+                for name in self.__slots__
+            )
+        }
+
 
 def pairwise_leader(data, similarity=None, distance=None, radius=None,
-                    min_size=2, max_size=float('inf')):
+                    min_size=2, max_size=float('inf'), processes=1,
+                    chunk_size=1000):
     """
     Function returning an iterator over found clusters using the leader
     algorithm.
@@ -43,6 +93,12 @@ def pairwise_leader(data, similarity=None, distance=None, radius=None,
     Note that this algorithm can work by storing only the current cluster in
     memory.
 
+    Note also that it can be parallelized, in which case the items following
+    each leader will be scanned in chunks by the subprocesses, which will
+    receive the data only once. Since this costs at least one round trip to
+    the subprocesses per leader, it only pays off on large datasets, where
+    the scan following each leader dwarfs this overhead.
+
     Example:
         The following chain:
             ('abc', 'bcd', 'cde', 'def', 'efg', 'ghi')
@@ -66,7 +122,12 @@ def pairwise_leader(data, similarity=None, distance=None, radius=None,
         min_size (number, optional): minimum number of items in a cluster for
             it to be considered viable. Defaults to 2.
         max_size (number, optional): maximum number of items in a cluster for
-            it to be considered viable. Defaults to infinity.
+            it to be considered viable. Items of a cluster exceeding this
+            size are released so they can join subsequent clusters.
+            Defaults to infinity.
+        processes (number, optional): number of processes to use. Defaults to 1.
+        chunk_size (number, optional): number of candidates compared to a
+            leader by each subprocess task. Defaults to 1000.
 
     Yields:
         list: A viable cluster.
@@ -74,6 +135,7 @@ def pairwise_leader(data, similarity=None, distance=None, radius=None,
     """
 
     # Formatting similarity
+    batch_similarity = make_batch_similarity_function(similarity=similarity, distance=distance, radius=radius)
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
     # We need to consume as a list to be able of random access
@@ -81,66 +143,267 @@ def pairwise_leader(data, similarity=None, distance=None, radius=None,
         data = list(data)
 
     n = len(data)
-    visited = set()
 
-    for i in range(n):
-        if i in visited:
+    if processes == 1:
+        visited = bytearray(n)
+        scan = partial(leader_scan, data, similarity, batch_similarity, visited)
+        yield from leader_clusters(data, visited, scan, min_size, max_size)
+        return
+
+    visited = RawArray('B', n)
+
+    initargs = (
+        data,
+        dill.dumps(similarity),
+        dill.dumps(batch_similarity),
+        visited
+    )
+
+    with Pool(processes=processes, initializer=pairwise_leader_worker_init, initargs=initargs) as pool:
+
+        def scan(i):
+
+            # NOTE: not worth a round trip to the subprocesses
+            if n - i - 1 <= chunk_size:
+                yield from leader_scan(data, similarity, batch_similarity, visited, i)
+                return
+
+            ranges = (
+                (i, start, min(n, start + chunk_size))
+                for start in range(i + 1, n, chunk_size)
+            )
+
+            # NOTE: only a bounded window of chunks is submitted at once so
+            # that, when the scan stops early because the cluster became too
+            # large, few stale chunks remain to be processed
+            pending = deque(
+                pool.apply_async(pairwise_leader_worker, (r,))
+                for r in islice(ranges, LEADER_CHUNKS_PER_PROCESS * processes)
+            )
+
+            while pending:
+                matches = pending.popleft().get()
+
+                for r in islice(ranges, 1):
+                    pending.append(pool.apply_async(pairwise_leader_worker, (r,)))
+
+                yield from matches
+
+        yield from leader_clusters(data, visited, scan, min_size, max_size)
+
+
+def leader_scan(data, similarity, batch_similarity, visited, i, start=None,
+                stop=None):
+    """
+    Function yielding, in order, the unvisited items from the given range
+    that are similar to the leader i.
+
+    """
+    A = data[i]
+    start = i + 1 if start is None else start
+    stop = len(data) if stop is None else stop
+
+    if batch_similarity is not None:
+        candidates = [j for j in range(start, stop) if not visited[j]]
+
+        for j in batch_similarity(A, [data[j] for j in candidates]):
+            yield candidates[j]
+
+        return
+
+    for j in range(start, stop):
+        if visited[j]:
             continue
 
-        A = data[i]
+        if similarity(A, data[j]):
+            yield j
 
-        cluster = None
 
-        for j in range(i + 1, n):
-            if j in visited:
-                continue
+def leader_clusters(data, visited, scan, min_size, max_size):
+    """
+    Function yielding the clusters found by the leader algorithm, given a
+    function scanning the items similar to a leader.
 
-            B = data[j]
+    """
+    for i in range(len(data)):
+        if visited[i]:
+            continue
 
-            if similarity(A, B):
+        # NOTE: oversized clusters are dropped and their items are released
+        # so they can join subsequent clusters
+        members = []
 
-                if cluster is None:
-                    cluster = [A, B]
-                else:
-                    cluster.append(B)
+        for j in scan(i):
+            members.append(j)
+
+            if len(members) + 1 > max_size:
+                members = None
+                break
+
+        if members is None:
+            continue
+
+        for j in members:
+            visited[j] = 1
+
+        if len(members) + 1 >= min_size:
+            yield [data[i]] + [data[j] for j in members]
+
+
+def pairwise_leader_worker_init(data, similarity, batch_similarity, visited):
+    """
+    Initializer of the leader workers, storing the dataset, the shared
+    visited bitmap & unpickling the similarity functions once per process.
+
+    """
+    LEADER_WORKER_STATE['data'] = data
+    LEADER_WORKER_STATE['similarity'] = dill.loads(similarity)
+    LEADER_WORKER_STATE['batch_similarity'] = dill.loads(batch_similarity)
+    LEADER_WORKER_STATE['visited'] = visited
+
+
+def pairwise_leader_worker(payload):
+    """
+    Worker function scanning a range of candidates for the given leader.
+
+    Returns:
+        array: Indices of the matching candidates.
+
+    """
+    i, start, stop = payload
 
-                if len(cluster) > max_size:
-                    for c in range(1, len(cluster)):
-                        visited.delete(c)
-                    break
+    return array('I', leader_scan(
+        LEADER_WORKER_STATE['data'],
+        LEADER_WORKER_STATE['similarity'],
+        LEADER_WORKER_STATE['batch_similarity'],
+        LEADER_WORKER_STATE['visited'],
+        i,
+        start=start,
+        stop=stop
+    ))
 
-                visited.add(j)
 
-        if cluster is not None and len(cluster) >= min_size:
-            yield cluster
+def pairwise_tile_worker_init(keys, similarity, batch_similarity, tile_size,
+                              labels=None):
+    """
+    Initializer of the tile workers, storing the dataset & unpickling the
+    similarity functions once per process. Note that when processes are
+    forked, the dataset is inherited and never pickled.
+
+    """
+    TILE_WORKER_STATE['keys'] = keys
+    TILE_WORKER_STATE['similarity'] = dill.loads(similarity)
+    TILE_WORKER_STATE['batch_similarity'] = dill.loads(batch_similarity)
+    TILE_WORKER_STATE['tile_size'] = tile_size
+    TILE_WORKER_STATE['labels'] = labels
 
 
-def pairwise_worker(payload):
+def pairwise_tile_worker(tiles):
     """
-    Worker function used to compute pairwise computations over chunks of
-    an upper triangular matrix in parallel.
+    Worker function computing pairwise similarities over a batch of tiles of
+    an upper triangular matrix, given their offsets.
+
+    If component labels are shared with the worker, pairs whose items have
+    the same label are skipped, since they are already connected.
+
+    Returns:
+        tuple: Matched pairs, packed as consecutive i, j indices, and stats.
 
     """
-    similarity, I, J, offset_i, offset_j = payload
+    keys = TILE_WORKER_STATE['keys']
+    similarity = TILE_WORKER_STATE['similarity']
+    batch_similarity = TILE_WORKER_STATE['batch_similarity']
+    tile_size = TILE_WORKER_STATE['tile_size']
+    labels = TILE_WORKER_STATE['labels']
+
+    n = len(keys)
+    pairs = array('I')
+    stats = PairwiseStats()
+
+    for i_offset, j_offset in tiles:
+        i_limit = min(n, i_offset + tile_size)
+        j_limit = min(n, j_offset + tile_size)
+
+        diagonal_tile = i_offset == j_offset
+
+        # Reading the tile's labels only once
+        if labels is not None:
+            i_labels = labels[i_offset:i_limit]
+            j_labels = labels[j_offset:j_limit]
+
+        for i in range(i_offset, i_limit):
+            A = keys[i]
+            start = i + 1 if diagonal_tile else j_offset
+            pruned = 0
+
+            if batch_similarity is not None:
+                if labels is not None:
+                    label = i_labels[i - i_offset]
+                    candidates = [j for j in range(start, j_limit) if j_labels[j - j_offset] != label]
+                    pruned = j_limit - start - len(candidates)
+                else:
+                    candidates = range(start, j_limit)
+
+                for j in batch_similarity(A, [keys[j] for j in candidates]):
+                    pairs.append(i)
+                    pairs.append(candidates[j])
+
+            elif labels is not None:
+                label = i_labels[i - i_offset]
+
+                for j in range(start, j_limit):
+                    if j_labels[j - j_offset] == label:
+                        pruned += 1
+                        continue
+
+                    if similarity(A, keys[j]):
+                        pairs.append(i)
+                        pairs.append(j)
+
+            else:
+                for j in range(start, j_limit):
+                    if similarity(A, keys[j]):
+                        pairs.append(i)
+                        pairs.append(j)
 
-    similarity = dill.loads(similarity)
-    pairs = []
+            stats.comparisons += j_limit - start - pruned
+            stats.pruned += pruned
 
-    diagonal_chunk = offset_i == offset_j
+    return pairs, stats
 
-    if diagonal_chunk:
-        J = I
 
-    for i in range(len(I)):
-        A = I[i]
+def pairwise_tiles(keys, similarity, batch_similarity, processes, tile_size,
+                   labels=None):
+    """
+    Function computing every pairwise similarity of the given keys in
+    parallel, by splitting the upper triangular matrix into square tiles.
+
+    The keys & similarity functions are shipped only once to each worker,
+    which then receive batches of tile offsets and send back packed arrays
+    of pairs. Component labels, if given, must be a shared array that the
+    caller may update while iterating to let workers prune more pairs.
 
-        for j in range(0 if not diagonal_chunk else i + 1, len(J)):
-            B = J[j]
+    Yields:
+        tuple: Matched pairs of a batch of tiles, packed as consecutive i, j
+            indices, and stats.
 
-            if similarity(A, B):
-                pairs.append((offset_i + i, offset_j + j))
+    """
+    tiles = list(upper_triangular_matrix_tile_iter(len(keys), tile_size))
+    batches = (
+        tiles[i:i + TILES_PER_TASK]
+        for i in range(0, len(tiles), TILES_PER_TASK)
+    )
 
-    return pairs
+    initargs = (
+        keys,
+        dill.dumps(similarity),
+        dill.dumps(batch_similarity),
+        tile_size,
+        labels
+    )
+
+    with Pool(processes=processes, initializer=pairwise_tile_worker_init, initargs=initargs) as pool:
+        yield from pool.imap_unordered(pairwise_tile_worker, batches)
 
 
 def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
@@ -164,7 +427,9 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
     This algorithm runs in O(n * (n - 1) / 2), i.e. O(n^2).
 
     Note that this algorithm can be parallelized and then run in
-    O (n * (n - 1) / 2 / p), p being the number of processes.
+    O (n * (n - 1) / 2 / p), p being the number of processes. In which case
+    the data is shipped only once to each subprocess, which will then only
+    receive the offsets of the tiles of the matrix they need to compute.
 
     TODO: option to sort by degree
 
@@ -187,7 +452,9 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
         distance (callable): If radius is specified, a function returning
             the distance between two points. Else, a function returning
             whether two point should not be deemed similar. Alternatively, one
-            can specify `similarity` instead.
+            can specify `similarity` instead. If this is cfog's
+            levenshtein_distance and radius is specified, each point will be
+            compared to the next ones in a single batch.
         radius (number, optional): produced clusters' radius.
         min_size (number, optional): minimum number of items in a cluster for
             it to be considered viable. Defaults to 2.
@@ -196,8 +463,8 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
         key (callable, optional): function returning an item's key.
             Defaults to None.
         processes (number, optional): number of processes to use. Defaults to 1.
-        chunk_size (number, optional): size of matrix chunks to send to
-            subprocesses. Defaults to 100.
+        chunk_size (number, optional): size of the square tiles of the
+            similarity matrix processed by subprocesses. Defaults to 100.
 
     Yields:
         list: A viable cluster.
@@ -205,6 +472,7 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
     """
 
     # Formatting similarity
+    batch_similarity = make_batch_similarity_function(similarity=similarity, distance=distance, radius=radius)
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
     # We need to consume as a list to be able of random access
@@ -224,6 +492,13 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
         for i in range(n):
             A = keys[i]
 
+            if batch_similarity is not None:
+                for j in batch_similarity(A, keys[i + 1:]):
+                    graph[i].append(i + 1 + j)
+                    graph[i + 1 + j].append(i)
+
+                continue
+
             for j in range(i + 1, n):
                 B = keys[j]
 
@@ -231,22 +506,18 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
                     graph[i].append(j)
                     graph[j].append(i)
     else:
+        pairs = []
 
-        pickled_similarity = dill.dumps(similarity)
+        for matches, _ in pairwise_tiles(keys, similarity, batch_similarity, processes, chunk_size):
+            it = iter(matches)
+            pairs.extend(zip(it, it))
 
-        # Iterator
-        pool_iter = (
-            (pickled_similarity, ) + chunk
-            for chunk
-            in upper_triangular_matrix_chunk_iter(keys, chunk_size)
-        )
+        # NOTE: sorting pairs so that clusters are the same as when serial
+        pairs.sort()
 
-        # Pool
-        with Pool(processes=processes) as pool:
-            for matches in pool.imap(pairwise_worker, pool_iter):
-                for i, j in matches:
-                    graph[i].append(j)
-                    graph[j].append(i)
+        for i, j in pairs:
+            graph[i].append(j)
+            graph[j].append(i)
 
     # Building clusters
     visited = set()
@@ -267,7 +538,8 @@ def pairwise_fuzzy_clusters(data, similarity=None, distance=None, radius=None,
 
 def pairwise_connected_components(data, similarity=None, distance=None, radius=None,
                                   min_size=2, max_size=float('inf'), key=None,
-                                  processes=1, chunk_size=100):
+                                  processes=1, chunk_size=100, prune=True,
+                                  stats=None):
     """
     Function returning an iterator over found clusters by computing a
     similarity graph of given data and extracting its connected components.
@@ -300,7 +572,9 @@ def pairwise_connected_components(data, similarity=None, distance=None, radius=N
         distance (callable): If radius is specified, a function returning
             the distance between two points. Else, a function returning
             whether two point should not be deemed similar. Alternatively, one
-            can specify `similarity` instead.
+            can specify `similarity` instead. If this is cfog's
+            levenshtein_distance and radius is specified, each point will be
+            compared to the next ones in a single batch.
         radius (number, optional): produced clusters' radius.
         min_size (number, optional): minimum number of items in a cluster for
             it to be considered viable. Defaults to 2.
@@ -309,8 +583,14 @@ def pairwise_connected_components(data, similarity=None, distance=None, radius=N
         key (callable, optional): function returning an item's key.
             Defaults to None.
         processes (number, optional): number of processes to use. Defaults to 1.
-        chunk_size (number, optional): size of matrix chunks to send to
-            subprocesses. Defaults to 100.
+        chunk_size (number, optional): size of the square tiles of the
+            similarity matrix processed by subprocesses. Defaults to 100.
+        prune (bool, optional): whether to share the labels of the components
+            found so far with subprocesses, so they can skip pairs already
+            known to be connected, as when running on a single process.
+            Defaults to True.
+        stats (PairwiseStats, optional): Stats object that will be updated
+            with the number of compared & pruned pairs. Defaults to None.
 
     Yields:
         list: A viable cluster.
@@ -318,6 +598,7 @@ def pairwise_connected_components(data, similarity=None, distance=None, radius=N
     """
 
     # Formatting similarity
+    batch_similarity = make_batch_similarity_function(similarity=similarity, distance=distance, radius=radius)
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
     # We need to consume as a list to be able of random access
@@ -332,6 +613,9 @@ def pairwise_connected_components(data, similarity=None, distance=None, radius=N
     n = len(data)
     sets = UnionFind(n)
 
+    if stats is None:
+        stats = PairwiseStats()
+
     # Computing pairwise distances
     if processes == 1:
         for i in range(n):
@@ -339,29 +623,71 @@ def pairwise_connected_components(data, similarity=None, distance=None, radius=N
 
             # NOTE: if one adds a cardinality test hear, we get the leader algo
 
+            if batch_similarity is not None:
+                candidates = [j for j in range(i + 1, n) if not sets.connected(i, j)]
+
+                stats.comparisons += len(candidates)
+                stats.pruned += n - i - 1 - len(candidates)
+
+                for j in batch_similarity(A, [keys[j] for j in candidates]):
+                    sets.union(i, candidates[j])
+
+                continue
+
             for j in range(i + 1, n):
                 B = keys[j]
 
                 if sets.connected(i, j):
+                    stats.pruned += 1
                     continue
 
+                stats.comparisons += 1
+
                 if similarity(A, B):
                     sets.union(i, j)
     else:
-        pickled_similarity = dill.dumps(similarity)
-
-        # Iterator
-        pool_iter = (
-            (pickled_similarity, ) + chunk
-            for chunk
-            in upper_triangular_matrix_chunk_iter(keys, chunk_size)
-        )
-
-        # Pool
-        with Pool(processes=processes) as pool:
-            for matches in pool.imap_unordered(pairwise_worker, pool_iter):
-                for i, j in matches:
-                    sets.union(i, j)
+        labels = None
+
+        if prune:
+            # NOTE: any item of a component is a sound label for its other
+            # items, so workers can read labels while they are being updated
+            labels = RawArray('I', range(n))
+
+            # Items of the components having more than one item, by label
+            members = {}
+
+        for matches, task_stats in pairwise_tiles(keys, similarity, batch_similarity, processes, chunk_size, labels):
+            stats.update(task_stats)
+            it = iter(matches)
+
+            for i, j in zip(it, it):
+                sets.union(i, j)
+
+                if labels is None:
+                    continue
+
+                # Relabeling the smallest component, so that each item is
+                # relabeled at most log(n) times overall
+                a = labels[i]
+                b = labels[j]
+
+                if a == b:
+                    continue
+
+                A = members.pop(a, None) or [a]
+                B = members.pop(b, None) or [b]
+
+                if len(A) > len(B):
+                    A, B = B, A
+                    b = a
+
+                for x in A:
+                    labels[x] = b
+
+                B.extend(A)
+                members[b] = B
+
+                stats.relabels += len(A)
 
     # TODO: Should really be using the sparse version
     for component in sets.components(min_size=min_size, max_size=max_size):
@@ -19,9 +19,24 @@
 # [Urls]:
 # http://people.csail.mit.edu/dongdeng/projects/passjoin/index.html
 #
-from collections import defaultdict
+import dill
+import math
+from collections import defaultdict, OrderedDict
+from multiprocessing import Pool
+
 from fog.clustering.utils import clusters_from_pairs
 
+try:
+    from cfog.metrics.levenshtein import (
+        levenshtein_distance as cfog_levenshtein_distance,
+        levenshtein_distance_many as cfog_levenshtein_distance_many
+    )
+except:
+    cfog_levenshtein_distance = None
+    cfog_levenshtein_distance_many = None
+
+BANDS_PER_PROCESS = 4
+
 
 def count_substrings_l(k, s, l):
     """
@@ -190,8 +205,289 @@ def multi_match_aware_substrings(k, string, l, i, pi, li):
         current_substring = substring
 
 
+class PassJoinStats(object):
+    """
+    Object that can be given to passjoin to record statistics about its run,
+    useful to assess its memory footprint for instance.
+
+    Attributes:
+        peak_index_size (int): Maximum number of segments held at once by the
+            inverted index. When running on multiple processes, this is the
+            maximum held by a single worker.
+        evicted_lengths (int): Number of string lengths whose segments were
+            released because no string could probe them anymore.
+        candidates (int): Number of candidates found through the index,
+            including the ones found more than once for a same string.
+        verifications (int): Number of distances computed. When candidates
+            are verified in batch, candidates sharing a same string only
+            count once.
+        cache_hits (int): Number of verifications spared by the cache.
+
+    """
+
+    __slots__ = (
+        'peak_index_size',
+        'evicted_lengths',
+        'candidates',
+        'verifications',
+        'cache_hits'
+    )
+
+    def __init__(self):
+        self.peak_index_size = 0
+        self.evicted_lengths = 0
+        self.candidates = 0
+        self.verifications = 0
+        self.cache_hits = 0
+
+    def update(self, other):
+        self.peak_index_size = max(self.peak_index_size, other.peak_index_size)
+        self.evicted_lengths += other.evicted_lengths
+        self.candidates += other.candidates
+        self.verifications += other.verifications
+        self.cache_hits += other.cache_hits
+
+    def __repr__(self):
+        return '<%(class_name)s %(attributes)s>' % {
+            'class_name': self.__class__.__name__,
+            'attributes': ' '.join(
+                '%s=%i' % (name, getattr(self, name))
+                for name in self.__slots__
+            )
+        }
+
+
+def passjoin_pairs(data, order, k, distance, sort=True, offset=0, stats=None,
+                   verification_cache=None):
+    """
+    Function yielding the id pairs of strings having a Levenshtein distance
+    less than or equal to k.
+
+    Args:
+        data (list): Strings.
+        order (iterable): Order in which string ids will be processed.
+        k (number): Levenshtein distance threshold.
+        distance (callable): Levenshtein distance function.
+        sort (boolean, optional): whether order is sorted using sort_key.
+            Defaults to True.
+        offset (int, optional): Number of strings, at the beginning of the
+            order, that must only be indexed and not matched. Defaults to 0.
+        stats (PassJoinStats, optional): Stats object to update.
+            Defaults to None.
+        verification_cache (int, optional): Maximum number of verification
+            results, keyed by string values, to remember across probes, the
+            least recently used ones being evicted first. Defaults to None,
+            meaning no cache, as does any number <= 0.
+
+    Yields:
+        tuple: A matching pair of ids.
+
+    """
+
+    # TODO: test exact match cases
+    # TODO: empty string should probably be handled in its own way?
+
+    L = defaultdict(lambda: defaultdict(list))
+    Ll = None
+
+    index_size = 0
+    peak_index_size = 0
+    evicted_lengths = 0
+    candidate_count = 0
+    verifications = 0
+    cache_hits = 0
+    last_s = None
+
+    cache = OrderedDict() if verification_cache is not None and verification_cache > 0 else None
+
+    def remember(A, B, match):
+
+        # Evicting the least recently used entry
+        if len(cache) >= verification_cache:
+            cache.popitem(last=False)
+
+        cache[(A, B) if A < B else (B, A)] = match
+
+    # Using cfog's batch function if we can
+    batch = cfog_levenshtein_distance is not None and distance is cfog_levenshtein_distance
+    pending = defaultdict(list)
+
+    for position, a in enumerate(order):
+        A = data[a]
+        s = len(A)
+
+        # When sorted by decreasing length, no string will ever be able to
+        # probe lengths greater than s + k again, so we can release them
+        if sort and s != last_s:
+            for l in [l for l in L if l > s + k]:
+                index_size -= sum(len(candidates) for candidates in L[l].values())
+                evicted_lengths += 1
+                del L[l]
+
+            last_s = s
+
+        # Attempting to match the string, unless it must only be indexed
+        if position >= offset:
+
+            # NOTE: a same candidate may be found through several segments
+            # but, since a pair is only produced when probing the last of its
+            # strings, this is enough to verify it at most once
+            tested = set()
+
+            for l in range(s if sort else max(0, s - k), s + k + 1):
+                Ll = L.get(l)
+
+                # Index is empty for this length, no need to enquire further
+                if Ll is None:
+                    continue
+
+                for i, start, length in partition(k, l):
+                    for substring in multi_match_aware_substrings(k, A, l, i, start, length):
+                        candidates = Ll.get((i, substring))
+
+                        if candidates is None:
+                            continue
+
+                        candidate_count += len(candidates)
+
+                        for b in candidates:
+                            if b in tested:
+                                continue
+
+                            tested.add(b)
+
+                            # NOTE: no need to compute Levenshtein distance for tiny strings
+                            if s <= k and l <= k:
+                                yield (a, b)
+                                continue
+
+                            B = data[b]
+
+                            if cache is not None:
+                                key = (A, B) if A < B else (B, A)
+                                match = cache.get(key)
+
+                                if match is not None:
+                                    cache.move_to_end(key)
+                                    cache_hits += 1
+
+                                    if match:
+                                        yield (a, b)
+
+                                    continue
+
+                            # Candidates will be verified in a single batch, once
+                            # per distinct string
+                            if batch:
+                                pending[B].append(b)
+                                continue
+
+                            verifications += 1
+                            match = distance(A, B) <= k
+
+                            if cache is not None:
+                                remember(A, B, match)
+
+                            if match:
+                                yield (a, b)
+
+            if pending:
+                strings = list(pending)
+                distances = cfog_levenshtein_distance_many(A, strings, limit=k)
+                verifications += len(strings)
+
+                for B, d in zip(strings, distances):
+                    match = d <= k
+
+                    if cache is not None:
+                        remember(A, B, match)
+
+                    if match:
+                        for b in pending[B]:
+                            yield (a, b)
+
+                pending.clear()
+
+        # Indexing the string
+        Ll = L[s]
+
+        for key in segments(k, A):
+            Ll[key].append(a)
+            index_size += 1
+
+        if index_size > peak_index_size:
+            peak_index_size = index_size
+
+    if stats is not None:
+        stats.peak_index_size = max(stats.peak_index_size, peak_index_size)
+        stats.evicted_lengths += evicted_lengths
+        stats.candidates += candidate_count
+        stats.verifications += verifications
+        stats.cache_hits += cache_hits
+
+
+def length_bands(lengths, k, count):
+    """
+    Function splitting strings sorted by decreasing length into contiguous
+    bands of strings having the same lengths, and computing, for each band,
+    the position of the longest string its strings could possibly match.
+
+    Args:
+        lengths (list): Lengths of the strings, sorted in decreasing order.
+        k (number): Levenshtein distance threshold.
+        count (int): Target number of bands.
+
+    Yields:
+        tuple: start, probe_start, stop.
+
+    """
+    n = len(lengths)
+    band_size = max(1, math.ceil(n / count))
+
+    start = 0
+    probe_start = 0
+
+    while probe_start < n:
+        stop = min(n, probe_start + band_size)
+
+        # Bands must not split strings of a same length
+        while stop < n and lengths[stop] == lengths[stop - 1]:
+            stop += 1
+
+        while lengths[start] > lengths[probe_start] + k:
+            start += 1
+
+        yield start, probe_start, stop
+
+        probe_start = stop
+
+
+def passjoin_worker(payload):
+    """
+    Worker function used to join a band of strings in parallel.
+
+    """
+    distance, k, strings, offset, verification_cache = payload
+
+    distance = dill.loads(distance)
+    stats = PassJoinStats()
+
+    pairs = list(passjoin_pairs(
+        strings,
+        range(len(strings)),
+        k,
+        distance,
+        offset=offset,
+        stats=stats,
+        verification_cache=verification_cache
+    ))
+
+    return pairs, stats
+
+
 def passjoin(data, k, distance, sort=True, min_size=2, max_size=float('inf'),
-             mode='connected_components'):
+             mode='connected_components', processes=1, stats=None,
+             verification_cache=None):
     """
     Function returning an iterator over found clusters using the PassJoin
     algorithm that is able to find every pair of strings having a Levenshtein
@@ -211,73 +507,92 @@ def passjoin(data, k, distance, sort=True, min_size=2, max_size=float('inf'),
             into clusters. Will be fully consumed.
         k (number): Levenshtein distance threshold.
         distance (callable): Function tasked to compute the Levenshtein distance
-            between two points of data.
+            between two points of data. If this is cfog's levenshtein_distance,
+            the candidates of each string will be verified in a single batch.
         sort (boolean, optional): whether to sort the data beforehand. Defaults
-            to True.
+            to True. Data is always sorted when using more than one process.
         min_size (number, optional): minimum number of items in a cluster for
             it to be considered viable. Defaults to 2.
         max_size (number, optional): maximum number of items in a cluster for
             it to be considered viable. Defaults to infinity.
         mode (string, optional): 'fuzzy_clusters', 'connected_components'.
             Defaults to 'connected_components'.
+        processes (number, optional): number of processes to use. Strings
+            will be split into bands of similar lengths and each band will be
+            joined against the strings at most k characters longer it can
+            possibly match. Defaults to 1.
+        stats (PassJoinStats, optional): Stats object that will be updated
+            while the clustering runs. Note that, when data is sorted, the
+            segments of lengths no string can probe anymore are released,
+            which bounds the index's peak size. Defaults to None.
+        verification_cache (int, optional): Maximum number of verification
+            results to remember, keyed by string values, so that duplicate
+            strings don't need to be verified again. Note that candidates are
+            always deduplicated so that a pair is never verified twice. The
+            least recently used results are evicted first. Defaults to None,
+            meaning no cache, as does any number <= 0.
 
     Yields:
         list: A viable cluster.
 
     """
 
-    if sort:
+    # NOTE: items are handled through their integer ids so that they are
+    # never hashed and so that duplicates remain distinct
+    if not isinstance(data, list):
+        data = list(data)
 
-        # NOTE: sorting in reverse as per "4.2 Effective Indexing Strategy"
-        data = sorted(data, key=sort_key)
+    order = range(len(data))
 
-    # TODO: when keys lengths are <= k some pairs are tested more than once!
-    # TODO: test exact match cases
-    # TODO: empty string should probably be handled in its own way?
-
-    def clustering():
-        L = defaultdict(lambda: defaultdict(list))
-        Ll = None
+    if sort or processes > 1:
 
-        for A in data:
-            s = len(A)
-
-            # Attempting to match the string
-            for l in range(s if sort else max(0, s - k), s + k + 1):
-                Ll = L.get(l)
-
-                # Index is empty for this length, no need to enquire further
-                if Ll is None:
-                    continue
-
-                for i, start, length in partition(k, l):
-                    for substring in multi_match_aware_substrings(k, A, l, i, start, length):
-                        candidates = Ll.get((i, substring))
-
-                        if candidates is None:
-                            continue
-
-                        for B in candidates:
-
-                            # NOTE: first condition is here not to compute Levenshtein
-                            # distance for tiny strings
-                            # NOTE: a pair may arise more than once here
-                            # It's taken care of later but I feel we can do better...
-                            # What's more, we should also record non-matches even if the
-                            # case of testing twice is naturally rarer
-                            if (s <= k and l <= k) or distance(A, B) <= k:
-                                yield (A, B)
-
-            # Indexing the string
-            # NOTE: it's possible to cleanup some memory when working on sorted strings
-            Ll = L[s]
-
-            for key in segments(k, A):
-                Ll[key].append(A)
+        # NOTE: sorting in reverse as per "4.2 Effective Indexing Strategy"
+        order = sorted(order, key=lambda i: sort_key(data[i]))
+
+    def clustering_parallel():
+        lengths = [len(data[i]) for i in order]
+        bands = list(length_bands(lengths, k, processes * BANDS_PER_PROCESS))
+
+        pickled_distance = dill.dumps(distance)
+
+        pool_iter = (
+            (
+                pickled_distance,
+                k,
+                [data[i] for i in order[start:stop]],
+                probe_start - start,
+                verification_cache
+            )
+            for start, probe_start, stop in bands
+        )
+
+        # NOTE: the pool's iterator is ordered so that the pairs are yielded in
+        # the exact same order as with a single process
+        with Pool(processes=processes) as pool:
+            for (start, _, _), (pairs, band_stats) in zip(bands, pool.imap(passjoin_worker, pool_iter)):
+                if stats is not None:
+                    stats.update(band_stats)
+
+                for i, j in pairs:
+                    yield order[start + i], order[start + j]
+
+    if processes > 1:
+        pairs = clustering_parallel()
+    else:
+        pairs = passjoin_pairs(
+            data,
+            order,
+            k,
+            distance,
+            sort=sort,
+            stats=stats,
+            verification_cache=verification_cache
+        )
 
     yield from clusters_from_pairs(
-        clustering(),
+        pairs,
         min_size=min_size,
         max_size=max_size,
-        mode=mode
+        mode=mode,
+        items=data
     )
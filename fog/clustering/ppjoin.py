@@ -14,18 +14,38 @@
 # https://github.com/TsinghuaDatabaseGroup/Similarity-Search-and-Join
 # http://www.vldb.org/pvldb/vol9/p636-mann.pdf
 #
+import dill
 import math
+from array import array
 from collections import defaultdict, Counter
 from bisect import bisect_left
+from heapq import heapify, heappush, heappop, heapreplace
+from multiprocessing import Pool
 from ebbe import sorted_uniq
 
 from fog.lsh.utils import crc32
+from fog.metrics.cosine import sparse_normalize
+
+try:
+    import numpy as np
+except:
+    np = None
+
+try:
+    from cfog.metrics.overlap import sorted_overlaps as cfog_sorted_overlaps
+except:
+    cfog_sorted_overlaps = None
 
 EPSILON = 1e-6
 PRUNE_FLAG = -1
 MAX_DEPTH = 2
+BANDS_PER_PROCESS = 4
 
 TOKEN_ORDERINGS = ('freq', 'crc32')
+VERIFICATIONS = ('auto', 'python', 'numpy', 'cfog')
+
+# NOTE: under this number of candidates, numpy overhead is not worth it
+NUMPY_MIN_BATCH = 64
 
 
 class MetricHelper(object):
@@ -95,16 +115,126 @@ class BinaryCosineHelper(MetricHelper):
         return math.ceil(l * self.threshold * self.threshold - EPSILON)
 
 
+METRIC_HELPERS = {
+    'jaccard': JaccardHelper,
+    'dice': DiceHelper,
+    'binary_cosine': BinaryCosineHelper
+}
+
+
+class WeightedJaccardHelper(MetricHelper):
+    def normalize(self, vector):
+        return vector
+
+    def prefix_length(self, weights, size):
+        require_overlap = self.threshold * size - EPSILON
+
+        for i in range(len(weights)):
+            size -= weights[i]
+
+            if size < require_overlap:
+                return i + 1
+
+        return len(weights)
+
+    def possible_sizes(self, size1, max_weight1, size2, max_weight2):
+        return size2 >= size1 * self.threshold - EPSILON and size1 >= size2 * self.threshold - EPSILON
+
+    def compute_similarity(self, x, y, size1, size2):
+        overlap = 0.0
+
+        for w1, w2 in sparse_intersection(x, y):
+            overlap += w1 if w1 < w2 else w2
+
+        return overlap / (size1 + size2 - overlap) + EPSILON
+
+
+class WeightedCosineHelper(MetricHelper):
+    def normalize(self, vector):
+        return sparse_normalize(vector)
+
+    def prefix_length(self, weights, size):
+        squared_threshold = self.threshold * self.threshold - EPSILON
+        squared_norm = sum(w * w for w in weights)
+
+        for i in range(len(weights)):
+            squared_norm -= weights[i] * weights[i]
+
+            if squared_norm < squared_threshold:
+                return i + 1
+
+        return len(weights)
+
+    def possible_sizes(self, size1, max_weight1, size2, max_weight2):
+        return size2 * max_weight1 >= self.threshold - EPSILON and size1 * max_weight2 >= self.threshold - EPSILON
+
+    def compute_similarity(self, x, y, size1, size2):
+        product = 0.0
+
+        for w1, w2 in sparse_intersection(x, y):
+            product += w1 * w2
+
+        return product + EPSILON
+
+
+WEIGHTED_METRIC_HELPERS = {
+    'jaccard': WeightedJaccardHelper,
+    'cosine': WeightedCosineHelper
+}
+
+
+class TokenizedRecords(object):
+    """
+    Compact storage of tokenized records, as a flat buffer of integer tokens
+    along with the offset at which each record starts and its length.
+    """
+
+    __slots__ = ('tokens', 'offsets', 'lengths')
+
+    def __init__(self):
+        self.tokens = array('I')
+        self.offsets = array('Q', [0])
+        self.lengths = array('I')
+
+    def append(self, record):
+        self.tokens.extend(record)
+        self.offsets.append(len(self.tokens))
+        self.lengths.append(len(record))
+
+    def length(self, k):
+        return self.lengths[k]
+
+    def take(self, ids):
+        store = TokenizedRecords()
+
+        for k in ids:
+            store.append(self[k])
+
+        return store
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k):
+        return self.tokens[self.offsets[k]:self.offsets[k + 1]]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+
 class InvertedIndexItem(object):
-    __slots__ = ('pos', 'ids')
+    __slots__ = ('pos', 'ids', 'positions')
 
     def __init__(self):
         self.pos = 0
-        self.ids = []
+        self.ids = array('I')
+        self.positions = array('I')
 
     def __iter__(self):
         yield self.pos
         yield self.ids
+        yield self.positions
 
 
 def compute_overlap(x, y, require_overlap):
@@ -131,7 +261,106 @@ def compute_overlap(x, y, require_overlap):
         else:
             posy += 1
 
-    return current_overlap
+    return current_overlap if current_overlap >= require_overlap else -1
+
+
+def sparse_intersection(x, y):
+    """
+    Function yielding the weights of the tokens shared by two weighted records,
+    represented as a list of sorted tokens and a list of matching weights.
+
+    """
+    tokens_x, weights_x = x
+    tokens_y, weights_y = y
+
+    lx = len(tokens_x)
+    ly = len(tokens_y)
+
+    posx = 0
+    posy = 0
+
+    while posx < lx and posy < ly:
+        a = tokens_x[posx]
+        b = tokens_y[posy]
+
+        if a == b:
+            yield weights_x[posx], weights_y[posy]
+            posx += 1
+            posy += 1
+        elif a < b:
+            posx += 1
+        else:
+            posy += 1
+
+
+def python_overlaps(record, tokenized_records, candidates, require_overlaps):
+    return [
+        compute_overlap(record, tokenized_records[candidate], require_overlap)
+        for candidate, require_overlap in zip(candidates, require_overlaps)
+    ]
+
+
+def numpy_overlaps(record, tokenized_records, candidates, require_overlaps):
+    if len(candidates) < NUMPY_MIN_BATCH:
+        return python_overlaps(record, tokenized_records, candidates, require_overlaps)
+
+    tokens = np.frombuffer(tokenized_records.tokens, dtype=np.uint32)
+    offsets = np.frombuffer(tokenized_records.offsets, dtype=np.uint64).astype(np.int64)
+
+    # Gathering the candidates' tokens from the flat buffer
+    ids = np.array(candidates, dtype=np.int64)
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    bounds = np.cumsum(lengths) - lengths
+    values = tokens[np.arange(lengths.sum()) + np.repeat(starts - bounds, lengths)]
+
+    # Sorted intersection, by binary search in the record
+    x = np.frombuffer(record, dtype=np.uint32)
+
+    if len(x) == 0:
+        matches = np.zeros(len(values), dtype=np.int64)
+    else:
+        positions = np.searchsorted(x, values)
+        np.minimum(positions, len(x) - 1, out=positions)
+        matches = (x[positions] == values).astype(np.int64)
+
+    # NOTE: summing through a cumulative sum since reduceat mishandles empty
+    # candidates
+    cumulative = np.r_[0, np.cumsum(matches)]
+    overlaps = cumulative[bounds + lengths] - cumulative[bounds]
+
+    overlaps[overlaps < np.array(require_overlaps, dtype=np.int64)] = -1
+
+    return overlaps.tolist()
+
+
+def cfog_overlaps(record, tokenized_records, candidates, require_overlaps):
+    return cfog_sorted_overlaps(
+        record,
+        tokenized_records.tokens,
+        tokenized_records.offsets,
+        candidates,
+        require_overlaps
+    )
+
+
+def select_overlaps_function(verification):
+    if verification == 'auto':
+        if cfog_sorted_overlaps is not None:
+            return cfog_overlaps
+
+        if np is not None:
+            return numpy_overlaps
+
+        return python_overlaps
+
+    if verification == 'numpy':
+        return numpy_overlaps
+
+    if verification == 'cfog':
+        return cfog_overlaps
+
+    return python_overlaps
 
 
 def suffix_filter(x, y, x_start, x_end, y_start, y_end, hd, depth=0):
@@ -214,101 +443,114 @@ def suffix_filter(x, y, x_start, x_end, y_start, y_end, hd, depth=0):
 
 
 def preprocess(records, tokenizer=None, token_ordering=None):
-    freqs = Counter()
-    tokenized_records = []
+    """
+    Function tokenizing the given records and mapping their tokens to
+    integers respecting the desired global ordering.
 
-    for record in records:
-        if tokenizer is not None:
-            record = tokenizer(record)
+    Note that when the ordering is `freq` or `None`, the records will be
+    tokenized twice, to avoid holding the raw tokens in memory.
 
-            if not isinstance(record, list):
-                record = list(record)
+    Args:
+        records (list): Records to preprocess.
+        tokenizer (callable, optional): Tokenizer. Defaults to `None`.
+        token_ordering (str, optional): Token ordering. Defaults to `None`.
 
-            if token_ordering == 'freq':
-                for token in record:
-                    freqs[token] += 1
+    Returns:
+        tuple: tokenized records, record ids sorted by length.
 
-        record = sorted_uniq(record)
+    """
 
-        if token_ordering == 'crc32':
-            record = sorted(crc32(token) for token in record)
+    def tokenize(record):
+        if tokenizer is not None:
+            return tokenizer(record)
 
-        tokenized_records.append(record)
+        return record
+
+    labels = None
 
     if token_ordering == 'freq':
+        freqs = Counter()
+
+        for record in records:
+            freqs.update(tokenize(record))
+
         labels = {token: i for i, (token, _) in enumerate(sorted(freqs.items(), key=lambda x: (x[1], x[0])))}
 
-        tokenized_records = [
-            sorted(labels[token] for token in record)
-            for record in tokenized_records
-        ]
+        del freqs
 
-    argsort = sorted(range(len(tokenized_records)), key=lambda i: len(tokenized_records[i]))
+    elif token_ordering is None:
+        vocabulary = set()
 
-    return tokenized_records, argsort
+        for record in records:
+            vocabulary.update(tokenize(record))
 
+        labels = {token: i for i, token in enumerate(sorted(vocabulary))}
 
-def ppjoin(records, threshold, metric='jaccard', tokenizer=None, all_pairs=False,
-           plus=False, token_ordering='freq'):
-    """
-    Function returning an iterator over similar pairs of records found using
-    the All-Pairs, PPJoin or PPJoin+ algorithm.
+        del vocabulary
 
-    Args:
-        records (iterable): The records to work on.
-        threshold (float): The similarity threshold under which pairs of
-            records won't be deemed similar enough.
-        metric (str, optional): The similarity metric to use. Can be `jaccard`,
-            `dice` or `binary_cosine`. Defaults to `jaccard`.
-        tokenizer (callable, optional): An optional tokenizer function processing
-            the records, such as ngrams etc. Defaults to `None`.
-        all_pairs (bool, optional): Whether to avoid leveraging PPJoin's
-            filtering strategies and only apply the simpler All-Pairs
-            algorithm instead. Defaults to `False`.
-        plus (bool, optional): Whether to use PPJoin+'s suffix filtering.
-            Defaults to `False`.
-        token_ordering (str, optional): Which kind of token global ordering
-            to use when sorting tokens for prefix filtering. Can be `None`,
-            `freq` or `crc32`. `None` mean sorting will be done alphabetically.
-            `freq` will sort tokens by increasing corpus frequency to
-            minimize collisions. Finally `crc32` will map tokens to their crc32
-            hash, meaning the order will be random. Defaults to `freq`.
+    tokenized_records = TokenizedRecords()
 
-    Yields:
-        tuple: A similar pair.
+    for record in records:
+        if labels is None:
+            record = sorted_uniq(crc32(token) for token in tokenize(record))
+        else:
+            record = sorted_uniq(labels[token] for token in tokenize(record))
 
-    """
+        tokenized_records.append(record)
 
-    if tokenizer is not None and not callable(tokenizer):
-        raise TypeError('fog.clustering.ppjoin: tokenizer is not callable')
+    argsort = array('I', sorted(range(len(tokenized_records)), key=tokenized_records.length))
 
-    if token_ordering is not None and token_ordering not in TOKEN_ORDERINGS:
-        raise TypeError('fog.clustering.ppjoin: unknown token ordering "%s"' % token_ordering)
+    return tokenized_records, argsort
 
-    # Instantiating metric helper
-    if metric == 'jaccard':
-        helper = JaccardHelper(threshold)
-    elif metric == 'dice':
-        helper = DiceHelper(threshold)
-    elif metric == 'binary_cosine':
-        helper = BinaryCosineHelper(threshold)
-    else:
-        raise TypeError('fog.clustering.ppjoin: unsupported metric "%s"' % metric)
 
-    # First we need to order records by length and make them indexable
-    if not isinstance(records, list):
-        records = list(records)
+def ppjoin_pairs(tokenized_records, order, helper, all_pairs=False, plus=False,
+                 offset=0, verification='auto'):
+    """
+    Function running the actual join over preprocessed records and yielding
+    the ids of similar pairs.
 
-    tokenized_records, argsort = preprocess(records, tokenizer, token_ordering)
+    Args:
+        tokenized_records (list): Tokenized records.
+        order (iterable): Record ids, sorted by length.
+        helper (MetricHelper): Metric helper.
+        all_pairs (bool, optional): Whether to use All-Pairs. Defaults to `False`.
+        plus (bool, optional): Whether to use suffix filtering. Defaults to
+            `False`.
+        offset (int, optional): Number of records, at the beginning of the
+            given order, that must be indexed but not probed. Defaults to `0`.
+        verification (str, optional): Candidate verification kernel.
+            Defaults to `auto`.
+
+    Yields:
+        tuple: A similar pair of record ids.
+
+    """
+    threshold = helper.threshold
+    tokens = tokenized_records.tokens
+    offsets = tokenized_records.offsets
+    lengths = tokenized_records.lengths
+    compute_overlaps = select_overlaps_function(verification)
 
     # State
     inverted_index = defaultdict(InvertedIndexItem)
 
     # Performing the join
-    for k in argsort:
+    for i, k in enumerate(order):
         record = tokenized_records[k]
         record_length = len(record)
 
+        # Records preceding the offset are only indexed, not probed
+        if i < offset:
+            index_length = helper.index_length(record_length)
+
+            if threshold < index_length:
+                for t in range(0, helper.probe_length(record_length)):
+                    index_item = inverted_index[record[t]]
+                    index_item.ids.append(k)
+                    index_item.positions.append(t)
+
+            continue
+
         min_length = helper.min_possible_length(record_length)
         probe_length = helper.probe_length(record_length)
         index_length = helper.index_length(record_length)
@@ -325,12 +567,13 @@ def ppjoin(records, threshold, metric='jaccard', tokenizer=None, all_pairs=False
             token = record[t]
             index_item = inverted_index[token]
             ids = index_item.ids
+            positions = index_item.positions
 
-            while index_item.pos < len(ids) and len(tokenized_records[ids[index_item.pos][0]]) < min_length:
+            while index_item.pos < len(ids) and lengths[ids[index_item.pos]] < min_length:
                 index_item.pos += 1
 
             for p in range(index_item.pos, len(ids)):
-                candidate_id = ids[p][0]
+                candidate_id = ids[p]
 
                 if all_pairs:
                     if candidate_id not in occurances:
@@ -340,8 +583,8 @@ def ppjoin(records, threshold, metric='jaccard', tokenizer=None, all_pairs=False
 
                     continue
 
-                candidate_pos = ids[p][1]
-                candidate_length = len(tokenized_records[candidate_id])
+                candidate_pos = positions[p]
+                candidate_length = lengths[candidate_id]
 
                 require_overlap = require_overlaps[candidate_length]
 
@@ -397,33 +640,195 @@ def ppjoin(records, threshold, metric='jaccard', tokenizer=None, all_pairs=False
                         occurances[candidate_id] += 1
 
             if threshold < index_length:
-                ids.append((k, t))
+                ids.append(k)
+                positions.append(t)
+
+        candidates = []
+        candidates_require_overlaps = []
 
         for candidate, count in occurances.items():
             if count == PRUNE_FLAG:
                 continue
 
-            candidate_record = tokenized_records[candidate]
-            candidate_size = len(candidate_record)
+            candidate_size = lengths[candidate]
             require_overlap = require_overlaps[candidate_size]
             index_length = helper.index_length(candidate_size)
 
-            if candidate_record[index_length - 1] < record[probe_length - 1]:
+            if tokens[offsets[candidate] + index_length - 1] < record[probe_length - 1]:
                 if count + candidate_size - index_length < require_overlap:
                     continue
             else:
                 if count + record_length - probe_length < require_overlap:
                     continue
 
-            real_overlap = compute_overlap(record, candidate_record, require_overlap)
+            candidates.append(candidate)
+            candidates_require_overlaps.append(require_overlap)
 
+        if not candidates:
+            continue
+
+        # Verifying the whole batch of candidates at once
+        overlaps = compute_overlaps(record, tokenized_records, candidates, candidates_require_overlaps)
+
+        for candidate, real_overlap in zip(candidates, overlaps):
             if real_overlap == -1:
                 continue
 
-            similarity = helper.compute_similarity(record_length, candidate_size, real_overlap)
+            similarity = helper.compute_similarity(record_length, lengths[candidate], real_overlap)
 
             if similarity >= threshold:
-                yield records[k], records[candidate]
+                yield k, candidate
+
+
+def length_bands(lengths, helper, count):
+    """
+    Function splitting length-sorted records into contiguous bands of
+    records having the same lengths, and computing, for each band, the
+    position of the shortest record its records could possibly match.
+
+    Args:
+        lengths (list): Sorted record lengths.
+        helper (MetricHelper): Metric helper.
+        count (int): Target number of bands.
+
+    Yields:
+        tuple: start, probe_start, stop.
+
+    """
+    n = len(lengths)
+    band_size = max(1, math.ceil(n / count))
+
+    probe_start = 0
+
+    while probe_start < n:
+        stop = min(n, probe_start + band_size)
+
+        # Bands must not split records of a same length
+        while stop < n and lengths[stop] == lengths[stop - 1]:
+            stop += 1
+
+        start = bisect_left(lengths, helper.min_possible_length(lengths[probe_start]))
+
+        yield start, probe_start, stop
+
+        probe_start = stop
+
+
+def ppjoin_worker(payload):
+    """
+    Worker function used to join a band of records in parallel.
+
+    """
+    helper, tokenized_records, offset, all_pairs, plus, verification = payload
+
+    return list(ppjoin_pairs(
+        tokenized_records,
+        range(len(tokenized_records)),
+        helper,
+        all_pairs,
+        plus,
+        offset,
+        verification
+    ))
+
+
+def ppjoin(records, threshold, metric='jaccard', tokenizer=None, all_pairs=False,
+           plus=False, token_ordering='freq', processes=1, verification='auto'):
+    """
+    Function returning an iterator over similar pairs of records found using
+    the All-Pairs, PPJoin or PPJoin+ algorithm.
+
+    Args:
+        records (iterable): The records to work on.
+        threshold (float): The similarity threshold under which pairs of
+            records won't be deemed similar enough.
+        metric (str, optional): The similarity metric to use. Can be `jaccard`,
+            `dice` or `binary_cosine`. Defaults to `jaccard`.
+        tokenizer (callable, optional): An optional tokenizer function processing
+            the records, such as ngrams etc. Defaults to `None`.
+        all_pairs (bool, optional): Whether to avoid leveraging PPJoin's
+            filtering strategies and only apply the simpler All-Pairs
+            algorithm instead. Defaults to `False`.
+        plus (bool, optional): Whether to use PPJoin+'s suffix filtering.
+            Defaults to `False`.
+        token_ordering (str, optional): Which kind of token global ordering
+            to use when sorting tokens for prefix filtering. Can be `None`,
+            `freq` or `crc32`. `None` mean sorting will be done alphabetically.
+            `freq` will sort tokens by increasing corpus frequency to
+            minimize collisions. Finally `crc32` will map tokens to their crc32
+            hash, meaning the order will be random. Defaults to `freq`.
+        processes (int, optional): Number of processes to use. Records will
+            be split into bands of similar lengths and each band will be
+            joined against the shorter records it can possibly match.
+            The yielded pairs remain the same as with a single process.
+            Defaults to `1`.
+        verification (str, optional): Which kernel to use to verify, in a
+            single batch, the candidates of each record. Can be `python`,
+            `numpy` (vectorized intersection over the flat token buffer),
+            `cfog` (compiled merge) or `auto`, which will pick `cfog` if
+            the native extension is available, then `numpy`, then `python`.
+            Results are identical whatever the kernel. Defaults to `auto`.
+
+    Yields:
+        tuple: A similar pair.
+
+    """
+
+    if tokenizer is not None and not callable(tokenizer):
+        raise TypeError('fog.clustering.ppjoin: tokenizer is not callable')
+
+    if token_ordering is not None and token_ordering not in TOKEN_ORDERINGS:
+        raise TypeError('fog.clustering.ppjoin: unknown token ordering "%s"' % token_ordering)
+
+    if verification not in VERIFICATIONS:
+        raise TypeError('fog.clustering.ppjoin: unknown verification "%s"' % verification)
+
+    if verification == 'numpy':
+        assert np is not None, 'numpy is not installed'
+
+    if verification == 'cfog':
+        assert cfog_sorted_overlaps is not None, 'cfog native extension is not available'
+
+    # Instantiating metric helper
+    if metric not in METRIC_HELPERS:
+        raise TypeError('fog.clustering.ppjoin: unsupported metric "%s"' % metric)
+
+    helper = METRIC_HELPERS[metric](threshold)
+
+    # First we need to order records by length and make them indexable
+    if not isinstance(records, list):
+        records = list(records)
+
+    tokenized_records, argsort = preprocess(records, tokenizer, token_ordering)
+
+    if processes == 1:
+        for k, candidate in ppjoin_pairs(tokenized_records, argsort, helper, all_pairs, plus,
+                                         verification=verification):
+            yield records[k], records[candidate]
+
+        return
+
+    lengths = [tokenized_records.length(k) for k in argsort]
+    bands = list(length_bands(lengths, helper, processes * BANDS_PER_PROCESS))
+
+    pool_iter = (
+        (
+            helper,
+            tokenized_records.take(argsort[start:stop]),
+            probe_start - start,
+            all_pairs,
+            plus,
+            verification
+        )
+        for start, probe_start, stop in bands
+    )
+
+    # NOTE: the pool's iterator is ordered so that the pairs are yielded in
+    # the exact same order as with a single process
+    with Pool(processes=processes) as pool:
+        for (start, _, _), pairs in zip(bands, pool.imap(ppjoin_worker, pool_iter)):
+            for i, j in pairs:
+                yield records[argsort[start + i]], records[argsort[start + j]]
 
 
 def all_pairs(records, threshold, metric='jaccard', tokenizer=None,
@@ -448,3 +853,587 @@ def ppjoin_plus(records, threshold, metric='jaccard', tokenizer=None,
         token_ordering=token_ordering,
         plus=True
     )
+
+
+def weighted_ppjoin(records, threshold, metric='cosine', tokenizer=None):
+    """
+    Function returning an iterator over similar pairs of weighted records,
+    e.g. tf-idf vectors, found using a weighted variant of the PPJoin
+    algorithm.
+
+    Tokens are globally sorted by increasing document frequency and only
+    the prefix of each record, i.e. the shortest run of tokens whose
+    remaining suffix cannot reach the threshold by itself, needs to be
+    indexed & probed. Candidates are then filtered using weighted size
+    bounds before being verified.
+
+    Args:
+        records (iterable): The records to work on. Each record should be
+            a sparse weighted set, represented by a dict, unless a tokenizer
+            is given.
+        threshold (float): The similarity threshold under which pairs of
+            records won't be deemed similar enough.
+        metric (str, optional): The similarity metric to use. Can be `cosine`,
+            in which case vectors will be normalized beforehand, or `jaccard`,
+            for the weighted Jaccard similarity. Defaults to `cosine`.
+        tokenizer (callable, optional): An optional function returning a
+            record's sparse weighted set as a dict. Defaults to `None`.
+
+    Yields:
+        tuple: A similar pair.
+
+    """
+
+    if tokenizer is not None and not callable(tokenizer):
+        raise TypeError('fog.clustering.ppjoin: tokenizer is not callable')
+
+    if metric not in WEIGHTED_METRIC_HELPERS:
+        raise TypeError('fog.clustering.ppjoin: unsupported weighted metric "%s"' % metric)
+
+    helper = WEIGHTED_METRIC_HELPERS[metric](threshold)
+
+    if not isinstance(records, list):
+        records = list(records)
+
+    # Preprocessing weighted records
+    vectors = []
+    freqs = Counter()
+
+    for record in records:
+        vector = tokenizer(record) if tokenizer is not None else record
+        vector = helper.normalize({token: weight for token, weight in vector.items() if weight > 0})
+
+        freqs.update(vector.keys())
+        vectors.append(vector)
+
+    labels = {token: i for i, (token, _) in enumerate(sorted(freqs.items(), key=lambda x: (x[1], x[0])))}
+
+    del freqs
+
+    weighted_records = []
+    sizes = []
+    max_weights = []
+
+    for vector in vectors:
+        items = sorted((labels[token], weight) for token, weight in vector.items())
+
+        tokens = [token for token, _ in items]
+        weights = [weight for _, weight in items]
+
+        weighted_records.append((tokens, weights))
+        sizes.append(sum(weights))
+        max_weights.append(max(weights) if weights else 0.0)
+
+    del vectors
+
+    # Performing the join
+    argsort = sorted(range(len(weighted_records)), key=lambda i: sizes[i])
+    inverted_index = defaultdict(list)
+
+    for k in argsort:
+        record = weighted_records[k]
+        tokens, weights = record
+        size = sizes[k]
+        max_weight = max_weights[k]
+
+        prefix_length = helper.prefix_length(weights, size)
+
+        candidates = []
+        seen = set()
+
+        for t in range(prefix_length):
+            ids = inverted_index[tokens[t]]
+
+            for candidate in ids:
+                if candidate in seen:
+                    continue
+
+                seen.add(candidate)
+
+                if not helper.possible_sizes(size, max_weight, sizes[candidate], max_weights[candidate]):
+                    continue
+
+                candidates.append(candidate)
+
+            ids.append(k)
+
+        for candidate in candidates:
+            similarity = helper.compute_similarity(
+                record,
+                weighted_records[candidate],
+                size,
+                sizes[candidate]
+            )
+
+            if similarity >= threshold:
+                yield records[k], records[candidate]
+
+
+def ppjoin_top_k(records, k, metric='jaccard', tokenizer=None,
+                 token_ordering='freq', per_record=False):
+    """
+    Function returning the k most similar pairs of records, or the k nearest
+    neighbors of every record, without requiring a similarity threshold, using
+    the Top-k Join algorithm.
+
+    Instead of relying on a fixed threshold, prefix events, i.e. a record and
+    a position in its sorted tokens, are processed by decreasing similarity
+    upper bound, while the threshold under which pairs cannot be part of the
+    result anymore is adaptively raised as better pairs are found. The join
+    stops as soon as no remaining event can beat this threshold.
+
+    Args:
+        records (iterable): The records to work on.
+        k (int): Number of pairs to return, or number of neighbors per record
+            if `per_record` is `True`.
+        metric (str, optional): The similarity metric to use. Can be `jaccard`,
+            `dice` or `binary_cosine`. Defaults to `jaccard`.
+        tokenizer (callable, optional): An optional tokenizer function processing
+            the records, such as ngrams etc. Defaults to `None`.
+        token_ordering (str, optional): Which kind of token global ordering
+            to use when sorting tokens for prefix filtering. Can be `None`,
+            `freq` or `crc32`. Defaults to `freq`.
+        per_record (bool, optional): Whether to find the k nearest neighbors
+            of every record instead of the k most similar pairs overall.
+            Defaults to `False`.
+
+    Yields:
+        tuple: A (record, record, similarity) triple, by decreasing similarity
+            or, if `per_record` is `True`, a (record, neighbors) tuple, for
+            every record in the original order, neighbors being a list of
+            at most k (record, similarity) tuples sorted by decreasing
+            similarity. Note that records sharing no token are never
+            considered neighbors.
+
+    """
+
+    if tokenizer is not None and not callable(tokenizer):
+        raise TypeError('fog.clustering.ppjoin: tokenizer is not callable')
+
+    if token_ordering is not None and token_ordering not in TOKEN_ORDERINGS:
+        raise TypeError('fog.clustering.ppjoin: unknown token ordering "%s"' % token_ordering)
+
+    if metric not in METRIC_HELPERS:
+        raise TypeError('fog.clustering.ppjoin: unsupported metric "%s"' % metric)
+
+    if k < 1:
+        raise TypeError('fog.clustering.ppjoin: k should be a positive integer')
+
+    # NOTE: we only need the helper to compute similarities, so the threshold
+    # is irrelevant here
+    helper = METRIC_HELPERS[metric](0.0)
+    similarity = helper.compute_similarity
+
+    if not isinstance(records, list):
+        records = list(records)
+
+    tokenized_records, _ = preprocess(records, tokenizer, token_ordering)
+    lengths = tokenized_records.lengths
+    n = len(tokenized_records)
+
+    # NOTE: the best similarity a pair whose first common token is at position
+    # i of a record of length l can reach is attained when the other record is
+    # exactly the record's suffix starting at i
+    def upper_bound(l, i):
+        return similarity(l, l - i, l - i)
+
+    events = [(-upper_bound(lengths[x], 0), x, 0) for x in range(n) if lengths[x] > 0]
+    heapify(events)
+
+    inverted_index = defaultdict(list)
+    verified = set()
+
+    if per_record:
+        neighbors = [[] for _ in range(n)]
+        full_neighbors = 0
+        floor = 0.0
+        countdown = 0
+
+        def kth_similarity(x):
+            h = neighbors[x]
+            return h[0][0] if len(h) == k else 0.0
+
+        def push(x, y, s):
+            nonlocal full_neighbors
+
+            for a, b in ((x, y), (y, x)):
+                h = neighbors[a]
+
+                if len(h) < k:
+                    heappush(h, (s, b))
+
+                    if len(h) == k:
+                        full_neighbors += 1
+
+                elif s > h[0][0]:
+                    heapreplace(h, (s, b))
+    else:
+        top = []
+
+        def kth_similarity():
+            return top[0][0] if len(top) == k else 0.0
+
+    while events:
+        bound, x, i = heappop(events)
+        bound = -bound
+
+        # Stopping when no remaining event can produce a better pair
+        if per_record:
+            if full_neighbors == n:
+                if bound > floor and countdown <= 0:
+                    floor = min(h[0][0] for h in neighbors)
+                    countdown = n
+
+                countdown -= 1
+
+                if bound <= floor:
+                    break
+        elif bound <= kth_similarity():
+            break
+
+        record = tokenized_records[x]
+        record_length = len(record)
+        postings = inverted_index[record[i]]
+
+        for y, j in postings:
+            pair = (y, x) if y < x else (x, y)
+
+            if pair in verified:
+                continue
+
+            candidate_length = lengths[y]
+
+            # Positional filtering
+            pair_bound = similarity(
+                record_length,
+                candidate_length,
+                min(record_length - i, candidate_length - j)
+            )
+
+            if per_record:
+                if pair_bound <= kth_similarity(x) and pair_bound <= kth_similarity(y):
+                    continue
+            elif pair_bound <= kth_similarity():
+                continue
+
+            verified.add(pair)
+
+            overlap = compute_overlap(record, tokenized_records[y], 0)
+            s = similarity(record_length, candidate_length, overlap)
+
+            if per_record:
+                push(x, y, s)
+            elif len(top) < k:
+                heappush(top, (s, y, x))
+            elif s > top[0][0]:
+                heapreplace(top, (s, y, x))
+
+        postings.append((x, i))
+
+        if i + 1 < record_length:
+            heappush(events, (-upper_bound(record_length, i + 1), x, i + 1))
+
+    if per_record:
+        for x in range(n):
+            yield records[x], [
+                (records[y], s - EPSILON)
+                for s, y in sorted(neighbors[x], key=lambda item: (-item[0], item[1]))
+            ]
+
+        return
+
+    for s, x, y in sorted(top, key=lambda item: (-item[0], item[1], item[2])):
+        yield records[x], records[y], s - EPSILON
+
+
+class PPJoinIndex(object):
+    """
+    Persistent & incrementally updatable PPJoin index able to find, in an
+    online fashion, the already indexed records that are similar to a given
+    one, without having to rebuild the inverted index for every new batch
+    of records.
+
+    Since records can be added and queried in any order, every record has its
+    whole probing prefix indexed, and postings are bucketed by record length
+    so that queries only need to scan the relevant length window.
+
+    Note that a global token ordering must remain stable for prefix filtering
+    to be exact. This means that with the `freq` ordering, the frequencies are
+    computed once on the records given to the constructor and that tokens
+    seen for the first time afterwards are deemed rarer than every known one.
+
+    Args:
+        threshold (float): The minimum similarity threshold the index will be
+            able to answer queries for.
+        records (iterable, optional): Initial records to index. Defaults to
+            `None`.
+        metric (str, optional): The similarity metric to use. Can be `jaccard`,
+            `dice` or `binary_cosine`. Defaults to `jaccard`.
+        tokenizer (callable, optional): An optional tokenizer function processing
+            the records, such as ngrams etc. Defaults to `None`.
+        token_ordering (str, optional): Which kind of token global ordering
+            to use when sorting tokens for prefix filtering. Can be `None`,
+            `freq` or `crc32`. Defaults to `freq`.
+
+    """
+
+    def __init__(self, threshold, records=None, metric='jaccard', tokenizer=None,
+                 token_ordering='freq'):
+
+        if tokenizer is not None and not callable(tokenizer):
+            raise TypeError('fog.clustering.ppjoin: tokenizer is not callable')
+
+        if token_ordering is not None and token_ordering not in TOKEN_ORDERINGS:
+            raise TypeError('fog.clustering.ppjoin: unknown token ordering "%s"' % token_ordering)
+
+        if metric not in METRIC_HELPERS:
+            raise TypeError('fog.clustering.ppjoin: unsupported metric "%s"' % metric)
+
+        self.threshold = threshold
+        self.metric = metric
+        self.tokenizer = tokenizer
+        self.token_ordering = token_ordering
+        self.helper = METRIC_HELPERS[metric](threshold)
+
+        # State
+        self.records = []
+        self.tokenized_records = []
+        self.inverted_index = {}
+        self.labels = {}
+
+        # NOTE: tokens unknown to the initial corpus are deemed rarer than
+        # any other, so they are given decreasing negative labels
+        self.next_label = -1
+
+        if records is not None:
+            self.__bulk_add(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return '<%(class_name)s metric=%(metric)s threshold=%(threshold)s records=%(records)i>' % {
+            'class_name': self.__class__.__name__,
+            'metric': self.metric,
+            'threshold': self.threshold,
+            'records': len(self.records)
+        }
+
+    def __tokens(self, record):
+        if self.tokenizer is not None:
+            record = self.tokenizer(record)
+
+        if self.token_ordering == 'crc32':
+            return sorted_uniq(crc32(token) for token in record)
+
+        return sorted_uniq(record)
+
+    def __labelize(self, tokens, register=False):
+        if self.token_ordering != 'freq':
+            return tokens
+
+        labels = self.labels
+        label = self.next_label
+        labelized = []
+
+        for token in tokens:
+            l = labels.get(token)
+
+            if l is None:
+                l = label
+                label -= 1
+
+                if register:
+                    labels[token] = l
+
+            labelized.append(l)
+
+        if register:
+            self.next_label = label
+
+        labelized.sort()
+
+        return labelized
+
+    def __index(self, record, tokenized_record):
+        i = len(self.records)
+        self.records.append(record)
+        self.tokenized_records.append(tokenized_record)
+
+        record_length = len(tokenized_record)
+        prefix_length = min(record_length, self.helper.probe_length(record_length))
+
+        for pos in range(prefix_length):
+            token = tokenized_record[pos]
+            lengths = self.inverted_index.get(token)
+
+            if lengths is None:
+                lengths = {}
+                self.inverted_index[token] = lengths
+
+            postings = lengths.get(record_length)
+
+            if postings is None:
+                postings = []
+                lengths[record_length] = postings
+
+            postings.append((i, pos))
+
+        return i
+
+    def __bulk_add(self, records):
+        records = list(records)
+        tokenized_records = [self.__tokens(record) for record in records]
+
+        if self.token_ordering == 'freq':
+            freqs = Counter()
+
+            for tokens in tokenized_records:
+                freqs.update(tokens)
+
+            self.labels = {
+                token: i for i, (token, _) in
+                enumerate(sorted(freqs.items(), key=lambda x: (x[1], x[0])))
+            }
+
+        for record, tokens in zip(records, tokenized_records):
+            self.__index(record, self.__labelize(tokens, register=True))
+
+    def add(self, record):
+        """
+        Method adding a single record to the index.
+
+        Args:
+            record (any): The record to add.
+
+        Returns:
+            int: The id of the added record.
+
+        """
+        tokens = self.__labelize(self.__tokens(record), register=True)
+
+        return self.__index(record, tokens)
+
+    def query(self, record, threshold=None):
+        """
+        Method returning an iterator over the indexed records that are similar
+        to the given one.
+
+        Args:
+            record (any): The record to query.
+            threshold (float, optional): The similarity threshold to use.
+                Cannot be less than the index's own threshold. Defaults to
+                the index's threshold.
+
+        Yields:
+            any: A similar indexed record.
+
+        """
+        if threshold is None:
+            threshold = self.threshold
+            helper = self.helper
+        else:
+            if threshold < self.threshold:
+                raise TypeError('fog.clustering.ppjoin: cannot query the index with a threshold less than %s' % self.threshold)
+
+            helper = METRIC_HELPERS[self.metric](threshold)
+
+        tokenized_records = self.tokenized_records
+        tokens = self.__labelize(self.__tokens(record))
+        record_length = len(tokens)
+
+        if record_length == 0:
+            return
+
+        min_length = helper.min_possible_length(record_length)
+        max_length = helper.max_possible_length(record_length)
+        probe_length = min(record_length, helper.probe_length(record_length))
+
+        require_overlaps = {}
+        occurances = {}
+
+        for t in range(probe_length):
+            lengths = self.inverted_index.get(tokens[t])
+
+            if lengths is None:
+                continue
+
+            for candidate_length in range(min_length, max_length + 1):
+                postings = lengths.get(candidate_length)
+
+                if postings is None:
+                    continue
+
+                require_overlap = require_overlaps.get(candidate_length)
+
+                if require_overlap is None:
+                    require_overlap = helper.require_overlap(record_length, candidate_length)
+                    require_overlaps[candidate_length] = require_overlap
+
+                for candidate_id, candidate_pos in postings:
+                    value = occurances.get(candidate_id, 0)
+
+                    if value == PRUNE_FLAG:
+                        continue
+
+                    # Positional filtering
+                    if (
+                        value + min(record_length - t, candidate_length - candidate_pos)
+                        < require_overlap
+                    ):
+                        occurances[candidate_id] = PRUNE_FLAG
+                        continue
+
+                    occurances[candidate_id] = value + 1
+
+        for candidate, count in occurances.items():
+            if count == PRUNE_FLAG:
+                continue
+
+            candidate_record = tokenized_records[candidate]
+            candidate_length = len(candidate_record)
+
+            real_overlap = compute_overlap(
+                tokens,
+                candidate_record,
+                require_overlaps[candidate_length]
+            )
+
+            if real_overlap == -1:
+                continue
+
+            similarity = helper.compute_similarity(record_length, candidate_length, real_overlap)
+
+            if similarity >= threshold:
+                yield self.records[candidate]
+
+    def save(self, path):
+        """
+        Method saving the index to disk.
+
+        Args:
+            path (str): Path of the file to write.
+
+        """
+        with open(path, 'wb') as f:
+            dill.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Method loading an index from disk.
+
+        Args:
+            path (str): Path of the file to read.
+
+        Returns:
+            PPJoinIndex: The loaded index.
+
+        """
+        with open(path, 'rb') as f:
+            index = dill.load(f)
+
+        if not isinstance(index, cls):
+            raise TypeError('fog.clustering.ppjoin: "%s" does not contain a valid index' % path)
+
+        return index
@@ -29,6 +29,8 @@
 #
 import dill
 import random
+from array import array
+from bisect import bisect_left, bisect_right
 from multiprocessing import Pool
 from phylactery import VPTree
 
@@ -36,12 +38,53 @@ from fog.clustering.utils import clusters_from_pairs
 
 # TODO: implement the eta parameter
 
+# NOTE: set once per worker process by `worker_init`
+WORKER_STATE = {}
+
+
+class QuickJoinStats(object):
+    """
+    Object that can be given to quickjoin to record statistics about its run.
+
+    Attributes:
+        distances (int): Number of calls to the distance function.
+        saved (int): Number of distance calls spared in blocks because the
+            distances of both items to the last pivot were enough to know
+            they could not be close enough.
+
+    """
+
+    __slots__ = ('distances', 'saved')
+
+    def __init__(self):
+        self.distances = 0
+        self.saved = 0
+
+    def update(self, other):
+        self.distances += other.distances
+        self.saved += other.saved
+
+    def __repr__(self):
+        return '<%(class_name)s %(attributes)s>' % {
+            'class_name': self.__class__.__name__,
+            'attributes': ' '.join(
+                '%s=%i' % (name, getattr(self, name))
+                for name in self.__slots__
+            )
+        }
+
 
 def partition(S, distance, p, radius, rho):
-    L = []
-    G = []
-    Lw = []
-    Gw = []
+    L = array('I')
+    G = array('I')
+    Lw = array('I')
+    Gw = array('I')
+
+    # Distances to the pivot, kept as lower bounds for the next level
+    DL = array('d')
+    DG = array('d')
+    DLw = array('d')
+    DGw = array('d')
 
     l = rho - radius
     g = rho + radius
@@ -51,40 +94,108 @@ def partition(S, distance, p, radius, rho):
 
         if d < rho:
             L.append(item)
+            DL.append(d)
 
             if l <= d:
                 Lw.append(item)
+                DLw.append(d)
         else:
             G.append(item)
+            DG.append(d)
 
             if d <= g:
                 Gw.append(item)
+                DGw.append(d)
+
+    return (L, G, Lw, Gw), (DL, DG, DLw, DGw)
+
+
+def quickjoin_bruteforce(S1, S2, distance, radius, D1=None, D2=None,
+                         stats=None):
+    if D1 is None:
+        for i in range(len(S1)):
+            A = S1[i]
 
-    return L, G, Lw, Gw
+            for j in range(len(S2)):
+                B = S2[j]
 
+                if distance(A, B) <= radius:
+                    yield (A, B)
+
+        if stats is not None:
+            stats.distances += len(S1) * len(S2)
+
+        return
+
+    # NOTE: by the triangle inequality, two items whose distances to the last
+    # pivot differ by more than the radius cannot be close enough. Sorting the
+    # second set by those distances lets us skip them without testing them
+    order = sorted(range(len(S2)), key=D2.__getitem__)
+    sorted_D2 = [D2[j] for j in order]
+    computed = 0
 
-def quickjoin_bruteforce(S1, S2, distance, radius):
     for i in range(len(S1)):
         A = S1[i]
+        d = D1[i]
 
-        for j in range(len(S2)):
-            B = S2[j]
+        lo = bisect_left(sorted_D2, d - radius)
+        hi = bisect_right(sorted_D2, d + radius)
+
+        computed += hi - lo
+
+        for x in range(lo, hi):
+            B = S2[order[x]]
 
             if distance(A, B) <= radius:
                 yield (A, B)
 
+    if stats is not None:
+        stats.distances += computed
+        stats.saved += len(S1) * len(S2) - computed
+
 
-def quickjoin_self_bruteforce(S, distance, radius):
+def quickjoin_self_bruteforce(S, distance, radius, D=None, stats=None):
     n = len(S)
 
-    for i in range(n):
+    if D is None:
+        for i in range(n):
+            A = S[i]
+
+            for j in range(i + 1, n):
+                B = S[j]
+
+                if distance(A, B) <= radius:
+                    yield (A, B)
+
+        if stats is not None:
+            stats.distances += n * (n - 1) // 2
+
+        return
+
+    # NOTE: same lower bound as above, items being sorted by their distance
+    # to the last pivot
+    order = sorted(range(n), key=D.__getitem__)
+    computed = 0
+
+    for x in range(n):
+        i = order[x]
         A = S[i]
+        limit = D[i] + radius
 
-        for j in range(i + 1, n):
-            B = S[j]
+        for y in range(x + 1, n):
+            j = order[y]
 
-            if distance(A, B) <= radius:
-                yield (A, B)
+            if D[j] > limit:
+                break
+
+            computed += 1
+
+            if distance(A, S[j]) <= radius:
+                yield (A, S[j])
+
+    if stats is not None:
+        stats.distances += computed
+        stats.saved += n * (n - 1) // 2 - computed
 
 
 def quickjoin_vptree(S1, S2, distance, radius):
@@ -114,12 +225,11 @@ def quickjoin_self_vptree(S, distance, radius):
 
     tree = VPTree(S, distance)
 
+    # NOTE: points are integer ids, so we can rely on them to avoid yielding
+    # a same pair twice
     for A in S:
         for B, d in tree.neighbors_in_radius(A, radius):
-            if A == B:
-                continue
-
-            if id(A) < id(B):
+            if A < B:
                 yield (A, B)
 
 
@@ -175,23 +285,191 @@ def select_block_functions(vp_tree):
     return quickjoin_bruteforce, quickjoin_self_bruteforce
 
 
-def worker(payload):
-    distance, radius, S1, S2, vp_tree = payload
+def select_pivots(rng, S1, S2):
+    """
+    Function randomly selecting two different pivots among the items of the
+    given sub-problem.
+
+    """
+    N1 = len(S1)
+    N = N1 + (len(S2) if S2 is not None else 0)
+
+    p1 = rng.randint(0, N - 1)
+    p2 = None
+
+    while p2 is None or p1 == p2:
+        p2 = rng.randint(0, N - 1)
+
+    p1 = S1[p1] if p1 < N1 else S2[p1 - N1]
+    p2 = S1[p2] if p2 < N1 else S2[p2 - N1]
+
+    return p1, p2
+
+
+def subproblems(root, distance, radius, block_size, beta, split=None,
+                bounds=False, stats=None):
+    """
+    Function recursively partitioning the given sub-problem using QuickJoin's
+    method and yielding blocks to solve.
+
+    Sub-problems are (S1, S2, seed, D1, D2) tuples, S2 being None for the
+    QuickJoin procedure & the set to join with S1 for the QuickJoinWin one.
+    Each one carries its own seed so that the partitioning does not depend on
+    the order in which sub-problems are processed, nor on the process doing
+    it. If `bounds` is True, D1 & D2 hold the distances of the items to the
+    pivot used to partition their parent, which can then be used as lower
+    bounds when solving blocks.
+
+    If `split` is given, sub-problems of no more than this size are yielded
+    as is instead of being partitioned further.
+
+    """
+    stack = [root]
+
+    # NOTE: the stack is processed depth-first, so yielded sub-problems are in
+    # the same order as the blocks they would produce
+    while len(stack) != 0:
+        S1, S2, seed, D1, D2 = stack.pop()
+
+        N1 = len(S1)
+        N2 = len(S2) if S2 is not None else 0
+        N = N1 + N2
+
+        # NOTE: L is empty when both pivots are at distance 0 from each other
+        if N1 == 0 or (S2 is not None and N2 == 0):
+            continue
+
+        if N <= block_size or (split is not None and N <= split):
+            yield S1, S2, seed, D1, D2
+            continue
 
-    distance = dill.loads(distance)
+        rng = random.Random(seed)
 
-    BF, SBF = select_block_functions(vp_tree)
+        p1, p2 = select_pivots(rng, S1, S2)
+        rho = beta * distance(p1, p2)
 
-    if S2 is None:
-        return list(SBF(S1, distance, radius))
+        # QuickJoin procedure
+        if S2 is None:
+            (L, G, Lw, Gw), (DL, DG, DLw, DGw) = partition(S1, distance, p1, radius, rho)
 
-    return list(BF(S1, S2, distance, radius))
+            if stats is not None:
+                stats.distances += N + 1
+
+            if not bounds:
+                DL = DG = DLw = DGw = None
+
+            # Recursion
+            stack.append((G, None, rng.getrandbits(64), DG, None))
+            stack.append((L, None, rng.getrandbits(64), DL, None))
+            stack.append((Lw, Gw, rng.getrandbits(64), DLw, DGw))
+
+        # QuickJoinWin procedure
+        else:
+            (L1, G1, Lw1, Gw1), (DL1, DG1, DLw1, DGw1) = partition(S1, distance, p1, radius, rho)
+            (L2, G2, Lw2, Gw2), (DL2, DG2, DLw2, DGw2) = partition(S2, distance, p1, radius, rho)
+
+            if stats is not None:
+                stats.distances += N + 1
+
+            if not bounds:
+                DL1 = DG1 = DLw1 = DGw1 = DL2 = DG2 = DLw2 = DGw2 = None
+
+            stack.append((L1, L2, rng.getrandbits(64), DL1, DL2))
+            stack.append((G1, G2, rng.getrandbits(64), DG1, DG2))
+            stack.append((Lw1, Gw2, rng.getrandbits(64), DLw1, DGw2))
+            stack.append((Gw1, Lw2, rng.getrandbits(64), DGw1, DLw2))
+
+
+def solve(root, distance, radius, block_size, beta, vp_tree, bounds=False,
+          stats=None):
+    """
+    Function yielding the pairs found by solving the given sub-problem.
+
+    """
+    blocks = subproblems(
+        root,
+        distance,
+        radius,
+        block_size,
+        beta,
+        bounds=bounds,
+        stats=stats
+    )
+
+    if vp_tree:
+        def counted_distance(i, j):
+            stats.distances += 1
+            return distance(i, j)
+
+        block_distance = counted_distance if stats is not None else distance
+
+        for S1, S2, _, _, _ in blocks:
+            if S2 is None:
+                yield from quickjoin_self_vptree(S1, block_distance, radius)
+            else:
+                yield from quickjoin_vptree(S1, S2, block_distance, radius)
+
+        return
+
+    for S1, S2, _, D1, D2 in blocks:
+        if S2 is None:
+            yield from quickjoin_self_bruteforce(S1, distance, radius, D1, stats)
+        else:
+            yield from quickjoin_bruteforce(S1, S2, distance, radius, D1, D2, stats)
+
+
+def worker_init(data, distance, radius, block_size, beta, vp_tree, bounds):
+    """
+    Initializer of the workers, storing the dataset & unpickling the distance
+    once per process.
+
+    """
+    item_distance = dill.loads(distance)
+
+    def distance(i, j):
+        return item_distance(data[i], data[j])
+
+    WORKER_STATE['distance'] = distance
+    WORKER_STATE['radius'] = radius
+    WORKER_STATE['block_size'] = block_size
+    WORKER_STATE['beta'] = beta
+    WORKER_STATE['vp_tree'] = vp_tree
+    WORKER_STATE['bounds'] = bounds
+
+
+def worker(subproblem):
+    """
+    Worker function solving a whole sub-problem, recursively partitioning it
+    locally.
+
+    Returns:
+        tuple: Found pairs, packed as consecutive ids, and stats.
+
+    """
+    pairs = array('I')
+    stats = QuickJoinStats()
+
+    for A, B in solve(
+        subproblem,
+        WORKER_STATE['distance'],
+        WORKER_STATE['radius'],
+        WORKER_STATE['block_size'],
+        WORKER_STATE['beta'],
+        WORKER_STATE['vp_tree'],
+        bounds=WORKER_STATE['bounds'],
+        stats=stats
+    ):
+        pairs.append(A)
+        pairs.append(B)
+
+    return pairs, stats
 
 
 def quickjoin(data, radius, distance=None, similarity=None, block_size=500,
               min_size=2, max_size=float('inf'),
               mode='connected_components',
-              seed=None, processes=1, beta=1.0, vp_tree=False):
+              seed=None, processes=1, beta=1.0, vp_tree=False,
+              task_size=None, stats=None):
     """
     Function returning an iterator over found clusters using the QuickJoin
     algorithm.
@@ -199,6 +477,17 @@ def quickjoin(data, radius, distance=None, similarity=None, block_size=500,
     Note that this algorithm returns the same result as pairwise computations
     would.
 
+    When using a distance, the distances of the items to the last pivot used
+    to partition them are kept so that, through the triangle inequality, they
+    can spare distance computations when solving blocks.
+
+    When using multiple processes, the data set is partitioned by the main
+    process until sub-problems are small enough. Those are then sent, as
+    arrays of ids, to the subprocesses that will partition them further
+    themselves. Since each sub-problem is partitioned using its own seed,
+    found pairs, and therefore clusters, only depend on the given seed and
+    not on the number of processes.
+
     Args:
         data (iterable): Arbitrary iterable containing data points to gather
             into clusters. Will be fully consumed.
@@ -222,6 +511,12 @@ def quickjoin(data, radius, distance=None, similarity=None, block_size=500,
             Braithwaite. Defaults to no-op 1.0.
         vp_tree (bool, optional): Whether to use Vantage Point Trees to solve
             blocks. Defaults to False.
+        task_size (number, optional): size under which sub-problems are sent
+            to the subprocesses instead of being partitioned by the main
+            process. Defaults to None, meaning the data size divided by
+            8 times the number of processes.
+        stats (QuickJoinStats, optional): Stats object that will be updated
+            while the clustering runs. Defaults to None.
 
     Yields:
         list: A viable cluster.
@@ -233,108 +528,77 @@ def quickjoin(data, radius, distance=None, similarity=None, block_size=500,
     if type(data) is not list:
         data = list(data)
 
-    if similarity is not None:
-        distance = lambda x, y: -similarity(x, y)
-        radius = -radius
-
-    # Iterator recursively partitioning the data set using QuickJoin's method
-    def blocks():
-        stack = [(data, None)]
-
-        # "Recursivity" through stack
-        while len(stack) != 0:
-            S1, S2 = stack.pop()
-
-            # QuickJoin procedure
-            if S2 is None:
-
-                S = S1
-                N = len(S)
-
-                if N <= block_size:
-                    yield (S, None)
-                    continue
-
-                # Randomly selecting pivots. They must be different
-                p1 = rng.randint(0, N - 1)
-                p2 = None
-
-                while p2 is None or p1 == p2:
-                    p2 = rng.randint(0, N - 1)
-
-                p1 = S[p1]
-                p2 = S[p2]
-
-                rho = beta * distance(p1, p2)
-
-                L, G, Lw, Gw = partition(S, distance, p1, radius, rho)
-
-                # Recursion
-                stack.append((G, None))
-                stack.append((L, None))
-                stack.append((Lw, Gw))
-
-            # QuickJoinWin procedure
-            else:
-                N1 = len(S1)
-                N2 = len(S2)
-                N = N1 + N2
+    if stats is None:
+        stats = QuickJoinStats()
 
-                if N <= block_size:
+    # NOTE: negated similarities do not satisfy the triangle inequality, so
+    # pivot distances cannot be used as lower bounds
+    bounds = similarity is None
 
-                    if N1 == 0 or N2 == 0:
-                        continue
-
-                    yield (S1, S2)
-                    continue
-
-                # Randomly selecting pivots. They must be different
-                p1 = rng.randint(0, N - 1)
-                p2 = None
-
-                while p2 is None or p1 == p2:
-                    p2 = rng.randint(0, N - 1)
-
-                p1 = S1[p1] if p1 < N1 else S2[p1 - N1]
-                p2 = S1[p2] if p2 < N1 else S2[p2 - N1]
-
-                rho = beta * distance(p1, p2)
+    if similarity is not None:
+        item_distance = lambda x, y: -similarity(x, y)
+        radius = -radius
+    else:
+        item_distance = distance
 
-                L1, G1, Lw1, Gw1 = partition(S1, distance, p1, radius, rho)
-                L2, G2, Lw2, Gw2 = partition(S2, distance, p1, radius, rho)
+    # NOTE: the algorithm works on integer ids so that items are never hashed
+    # nor copied around when partitioning
+    def distance(i, j):
+        return item_distance(data[i], data[j])
 
-                stack.append((L1, L2))
-                stack.append((G1, G2))
-                stack.append((Lw1, Gw2))
-                stack.append((Gw1, Lw2))
+    n = len(data)
+    root = (array('I', range(n)), None, rng.getrandbits(64), None, None)
 
-    # Iterator performing bruteforce distance computation over found blocks
     def clustering():
-
-        BF, SBF = select_block_functions(vp_tree)
-
-        for S1, S2 in blocks():
-            if S2 is None:
-                yield from SBF(S1, distance, radius)
-            else:
-                yield from BF(S1, S2, distance, radius)
+        yield from solve(root, distance, radius, block_size, beta, vp_tree, bounds=bounds, stats=stats)
 
     def clustering_parallel():
-        with Pool(processes=processes) as pool:
-            pickled_distance = dill.dumps(distance)
-
-            pool_iter = (
-                (pickled_distance, radius, S1, S2, vp_tree)
-                for S1, S2 in blocks()
-            )
-
-            for pairs in pool.imap_unordered(worker, pool_iter):
-                yield from pairs
+        split = task_size
+
+        if split is None:
+            split = max(block_size, n // (8 * processes))
+
+        initargs = (
+            data,
+            dill.dumps(item_distance),
+            radius,
+            block_size,
+            beta,
+            vp_tree,
+            bounds
+        )
+
+        # NOTE: tasks are consumed by the pool's task handler thread, so they
+        # must not update the stats object shared with this thread
+        partition_stats = QuickJoinStats()
+
+        tasks = subproblems(
+            root,
+            distance,
+            radius,
+            block_size,
+            beta,
+            split=split,
+            bounds=bounds,
+            stats=partition_stats
+        )
+
+        with Pool(processes=processes, initializer=worker_init, initargs=initargs) as pool:
+
+            # NOTE: results are consumed in order to stay deterministic
+            for pairs, task_stats in pool.imap(worker, tasks):
+                stats.update(task_stats)
+                it = iter(pairs)
+
+                yield from zip(it, it)
+
+        stats.update(partition_stats)
 
     yield from clusters_from_pairs(
         clustering() if processes == 1 else clustering_parallel(),
         min_size=min_size,
         max_size=max_size,
         mode=mode,
-        fuzzy=True
+        fuzzy=True,
+        items=data
     )
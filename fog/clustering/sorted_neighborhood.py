@@ -27,6 +27,17 @@ from fog.clustering.utils import make_similarity_function, clusters_from_pairs
 # TODO: multipass snm variant
 
 
+def sorted_ids(data, key=None):
+    """
+    Function returning the ids of the given data points, sorted using the
+    given key.
+    """
+    if key is None:
+        return sorted(range(len(data)), key=data.__getitem__)
+
+    return sorted(range(len(data)), key=lambda i: key(data[i]))
+
+
 def sorted_neighborhood(data, key=None, keys=None, similarity=None, distance=None,
                         radius=None, window=10, min_size=2, max_size=float('inf'),
                         mode='connected_components'):
@@ -81,22 +92,26 @@ def sorted_neighborhood(data, key=None, keys=None, similarity=None, distance=Non
     # Formatting similarity
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
+    if not isinstance(data, list):
+        data = list(data)
+
     # Iterating over sorted data
     def clustering():
         multipass_keys = keys if keys is not None else [key]
 
         for k in multipass_keys:
-            S = sorted(data, key=k)
+            S = sorted_ids(data, k)
             n = len(S)
 
             for i in range(n):
-                A = S[i]
+                a = S[i]
+                A = data[a]
 
                 for j in range(i + 1, min(n, i + window)):
-                    B = S[j]
+                    b = S[j]
 
-                    if similarity(A, B):
-                        yield (A, B)
+                    if similarity(A, data[b]):
+                        yield (a, b)
 
     # Building clusters
     yield from clusters_from_pairs(
@@ -104,7 +119,8 @@ def sorted_neighborhood(data, key=None, keys=None, similarity=None, distance=Non
         min_size=min_size,
         max_size=max_size,
         mode=mode,
-        fuzzy=keys is not None
+        fuzzy=keys is not None,
+        items=data
     )
 
 
@@ -197,34 +213,32 @@ def adaptive_sorted_neighborhood(data, key=None, keys=None, similarity=None,
     # Formatting similarity
     similarity = make_similarity_function(similarity=similarity, distance=distance, radius=radius)
 
+    if not isinstance(data, list):
+        data = list(data)
+
     # Iterating over sorted data
     def clustering():
         multipass_keys = keys if keys is not None else [key]
 
         for k in multipass_keys:
-            S = sorted(data, key=k)
+            S = sorted_ids(data, k)
+            sorted_records = [data[i] for i in S]
 
-            for start, end in full_AA_SNM(S, similarity, window):
+            for start, end in full_AA_SNM(sorted_records, similarity, window):
                 l = end - start + 1
 
                 if l == 1:
                     continue
 
                 elif l == 2:
-                    A = S[start]
-                    B = S[end]
-
-                    if similarity(A, B):
-                        yield (A, B)
+                    if similarity(sorted_records[start], sorted_records[end]):
+                        yield (S[start], S[end])
 
                 else:
                     for i in range(start, end + 1):
                         for j in range(i + 1, end + 1):
-                            A = S[i]
-                            B = S[j]
-
-                            if similarity(A, B):
-                                yield (A, B)
+                            if similarity(sorted_records[i], sorted_records[j]):
+                                yield (S[i], S[j])
 
     # Building clusters
     yield from clusters_from_pairs(
@@ -232,5 +246,6 @@ def adaptive_sorted_neighborhood(data, key=None, keys=None, similarity=None,
         min_size=min_size,
         max_size=max_size,
         mode=mode,
-        fuzzy=keys is not None
+        fuzzy=keys is not None,
+        items=data
     )
@@ -4,9 +4,26 @@
 #
 # Miscellaneous redundant functions used by clustering routines.
 #
+from array import array
 from collections import defaultdict
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+from os.path import join
+from tempfile import TemporaryDirectory
 import math
 
+try:
+    from cfog.metrics.levenshtein import (
+        levenshtein_distance as cfog_levenshtein_distance,
+        levenshtein_distance_many as cfog_levenshtein_distance_many
+    )
+except:
+    cfog_levenshtein_distance = None
+    cfog_levenshtein_distance_many = None
+
+SPILL_READ_SIZE = 2 ** 16
+
 
 def make_similarity_function(similarity=None, distance=None, radius=None):
     """
@@ -41,12 +58,166 @@ def make_similarity_function(similarity=None, distance=None, radius=None):
             return lambda A, B: not distance(A, B)
 
 
+def make_batch_similarity_function(similarity=None, distance=None, radius=None):
+    """
+    Function creating, when the given distance is a known cfog function
+    able to compare one item against many at once, a function returning the
+    indices of the given candidates that are similar to a given item.
+
+    Args:
+        similarity (callable, optional): Similarity function.
+        distance (callable, optional): Distance function.
+        radius (number, optional): Radius.
+
+    Returns:
+        function or None: A function with signature (A, candidates) -> list
+            of indices, or None if the distance cannot be batched.
+
+    """
+    if similarity is not None or radius is None or radius < 0:
+        return None
+
+    if cfog_levenshtein_distance is None or distance is not cfog_levenshtein_distance:
+        return None
+
+    limit = math.floor(radius)
+
+    def batch_similarity(A, candidates):
+        distances = cfog_levenshtein_distance_many(A, candidates, limit=limit)
+
+        return [i for i, d in enumerate(distances) if d <= limit]
+
+    return batch_similarity
+
+
+class IncrementalUnionFind(object):
+    """
+    Compact union-find structure over dense integer ids that can grow as new
+    items are added.
+    """
+
+    __slots__ = ('parents', 'sizes')
+
+    def __init__(self):
+        self.parents = array('I')
+        self.sizes = array('I')
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self):
+        i = len(self.parents)
+        self.parents.append(i)
+        self.sizes.append(1)
+
+        return i
+
+    def find(self, x):
+        parents = self.parents
+
+        # Path halving
+        while parents[x] != x:
+            parents[x] = parents[parents[x]]
+            x = parents[x]
+
+        return x
+
+    def union(self, x, y):
+        x = self.find(x)
+        y = self.find(y)
+
+        if x == y:
+            return
+
+        sizes = self.sizes
+
+        if sizes[x] < sizes[y]:
+            x, y = y, x
+
+        self.parents[y] = x
+        sizes[x] += sizes[y]
+
+    def components(self, min_size=1, max_size=float('inf')):
+        sizes = self.sizes
+        index = defaultdict(list)
+
+        for i in range(len(self.parents)):
+            root = self.find(i)
+            size = sizes[root]
+
+            if size < min_size or size > max_size:
+                continue
+
+            index[root].append(i)
+
+        yield from index.values()
+
+
+def read_edges_run(path):
+    """
+    Function yielding the edges of a run spilled to disk.
+
+    """
+    with open(path, 'rb') as f:
+        while True:
+            edges = array('I')
+
+            try:
+                edges.fromfile(f, SPILL_READ_SIZE)
+            except EOFError:
+                pass
+
+            if not edges:
+                break
+
+            yield from zip(edges[0::2], edges[1::2])
+
+
+def spilled_adjacency(edges, max_edges_in_memory, directory):
+    """
+    Function consuming directed edges over integer ids, spilling sorted runs
+    of them to disk when needed, and yielding the adjacency list of each
+    source, in increasing order, by merging the runs.
+
+    Note that the order in which edges arrived is kept for each source.
+
+    """
+    buffer = []
+    runs = []
+
+    for edge in edges:
+        buffer.append(edge)
+
+        if len(buffer) >= max_edges_in_memory:
+            buffer.sort(key=itemgetter(0))
+
+            path = join(directory, 'run-%i.bin' % len(runs))
+
+            with open(path, 'wb') as f:
+                array('I', (i for edge in buffer for i in edge)).tofile(f)
+
+            runs.append(path)
+            buffer = []
+
+    buffer.sort(key=itemgetter(0))
+
+    merged = merge(*(read_edges_run(path) for path in runs), buffer, key=itemgetter(0))
+
+    for source, group in groupby(merged, key=itemgetter(0)):
+        yield source, [target for _, target in group]
+
+
 def clusters_from_pairs(pairs, min_size=2, max_size=float('inf'),
-                        mode='connected_components', fuzzy=False):
+                        mode='connected_components', fuzzy=False,
+                        max_edges_in_memory=None, items=None):
     """
     Function consuming an iterator of similar pairs and merging them
     according to the desired strategy to yield valid clusters.
 
+    Note that items are interned into dense integer ids so that, in the
+    connected components case, no edge needs to be stored, since we only
+    rely on a union-find structure.
+
     Args:
         pairs (iterable): Similar pairs.
         min_size (int, optional): Minimum size of clusters, defaults to 2.
@@ -56,76 +227,109 @@ def clusters_from_pairs(pairs, min_size=2, max_size=float('inf'),
             Defaults to 'connected_components'.
         fuzzy (bool, optional): whether a same pair can arrive twice or not.
             Defaults to False.
+        max_edges_in_memory (int, optional): In 'fuzzy_clusters' mode, maximum
+            number of edges to keep in memory before spilling them to
+            temporary files on disk. Defaults to None, meaning edges are kept
+            in memory.
+        items (list, optional): If given, pairs are expected to be made of
+            integer ids indexing this list, which will be used to materialize
+            the yielded clusters. This means items are never hashed and
+            that duplicate items remain distinct. Defaults to None.
 
     Yields:
         list: A viable cluster.
 
     """
 
-    container = set if fuzzy else list
+    if mode not in ('fuzzy_clusters', 'connected_components'):
+        raise TypeError('fog.clustering: unknown mode "%s"' % mode)
+
+    if items is None:
+        ids = {}
+        items = []
+
+        def id_pairs():
+            for A, B in pairs:
+                a = ids.get(A)
+
+                if a is None:
+                    a = len(items)
+                    ids[A] = a
+                    items.append(A)
 
-    if fuzzy:
-        def add(c, x):
-            c.add(x)
+                b = ids.get(B)
+
+                if b is None:
+                    b = len(items)
+                    ids[B] = b
+                    items.append(B)
+
+                yield a, b
+
+        edges = id_pairs()
     else:
-        def add(c, x):
-            c.append(x)
+        edges = pairs
 
-    # TODO: later, we'll be able to use SparseSet rather than the graph
-    # TODO: in the connected component case, we don't need mutual links
-    graph = defaultdict(container)
+    if mode == 'connected_components':
+        sets = IncrementalUnionFind()
+        paired = bytearray()
 
-    for A, B in pairs:
-        add(graph[A], B)
-        add(graph[B], A)
+        for a, b in edges:
+            m = max(a, b)
 
-    if mode == 'fuzzy_clusters':
-        visited = set()
+            while len(sets) <= m:
+                sets.add()
+                paired.append(0)
 
-        for item, neighbors in graph.items():
-            if item in visited:
-                continue
+            paired[a] = 1
+            paired[b] = 1
 
-            if len(neighbors) + 1 < min_size:
-                continue
-            if len(neighbors) + 1 > max_size:
+            sets.union(a, b)
+
+        for component in sets.components(min_size=min_size, max_size=max_size):
+            if not paired[component[0]]:
                 continue
 
-            visited.update(neighbors)
+            yield [items[i] for i in component]
 
-            cluster = [item] + (list(neighbors) if fuzzy else neighbors)
-            yield cluster
+        return
 
-    elif mode == 'connected_components':
-        visited = set()
-        stack = []
+    def directed_edges():
+        for a, b in edges:
+            yield a, b
+            yield b, a
 
-        for item, neighbors in graph.items():
-            if item in visited:
-                continue
+    def fuzzy_clusters(adjacency):
+        visited = set()
 
-            visited.add(item)
+        for i, neighbors in adjacency:
+            if fuzzy:
+                neighbors = list(dict.fromkeys(neighbors))
 
-            cluster = [item]
+            if i in visited:
+                continue
 
-            stack.extend(neighbors)
+            if len(neighbors) + 1 < min_size:
+                continue
+            if len(neighbors) + 1 > max_size:
+                continue
 
-            while len(stack) != 0:
-                neighbor = stack.pop()
+            visited.update(neighbors)
 
-                if neighbor in visited:
-                    continue
+            yield [items[i]] + [items[j] for j in neighbors]
 
-                cluster.append(neighbor)
-                visited.add(neighbor)
+    if max_edges_in_memory is None:
+        graph = defaultdict(list)
 
-                stack.extend(graph[neighbor])
+        for a, b in directed_edges():
+            graph[a].append(b)
 
-            if len(cluster) >= min_size and len(cluster) <= max_size:
-                yield cluster
+        yield from fuzzy_clusters(graph.items())
 
     else:
-        raise TypeError('fog.clustering: unknown mode "%s"' % mode)
+        with TemporaryDirectory(prefix='fog-') as directory:
+            adjacency = spilled_adjacency(directed_edges(), max_edges_in_memory, directory)
+            yield from fuzzy_clusters(adjacency)
 
 
 def pairs_from_buckets(buckets):
@@ -147,7 +351,7 @@ def pairs_from_buckets(buckets):
 
 def clusters_from_buckets(buckets, min_size=2, max_size=float('inf'),
                           mode='connected_components', similarity=None,
-                          fuzzy=False):
+                          fuzzy=False, items=None):
     """
     Function merging buckets into fuzzy clusters. Each bucket will create
     relations in an undirected graph that is later solved to compose clusters.
@@ -163,17 +367,25 @@ def clusters_from_buckets(buckets, min_size=2, max_size=float('inf'),
             matches from buckets.
         fuzzy (bool, optional): whether a same pair can arrive twice or not.
             Defaults to False.
+        items (list, optional): If given, buckets are expected to contain
+            integer ids indexing this list. Defaults to None.
 
     Yields:
         list: A viable cluster.
 
     """
 
+    if items is None or similarity is None:
+        check = similarity
+    else:
+        def check(a, b):
+            return similarity(items[a], items[b])
+
     pairs = (
         pair
         for pair
         in pairs_from_buckets(buckets)
-        if similarity is None or similarity(pair[0], pair[1])
+        if check is None or check(pair[0], pair[1])
     )
 
     yield from clusters_from_pairs(
@@ -181,7 +393,8 @@ def clusters_from_buckets(buckets, min_size=2, max_size=float('inf'),
         min_size=min_size,
         max_size=max_size,
         mode=mode,
-        fuzzy=fuzzy
+        fuzzy=fuzzy,
+        items=items
     )
 
 
@@ -216,3 +429,22 @@ def upper_triangular_matrix_chunk_iter(data, chunk_size):
                 i_offset,
                 j_offset
             )
+
+
+def upper_triangular_matrix_tile_iter(n, tile_size):
+    """
+    Function returning an iterator over the offsets of the square tiles
+    covering an upper triangular matrix, so that workers sharing the matrix's
+    data only need to receive a pair of integers per tile.
+
+    Args:
+        n (int): The matrix's size.
+        tile_size (int): Size of the tiles.
+
+    Yields:
+        tuple of int: Row & column offsets of a tile.
+
+    """
+    for i_offset in range(0, n, tile_size):
+        for j_offset in range(i_offset, n, tile_size):
+            yield i_offset, j_offset
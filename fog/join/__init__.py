@@ -1 +1,4 @@
 from fog.join.hashjoin import hashjoin
+from fog.join.intersection_index import intersection_index
+from fog.join.passjoin import passjoin
+from fog.join.ppjoin import ppjoin
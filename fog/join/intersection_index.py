@@ -0,0 +1,88 @@
+# =============================================================================
+# Fog Intersection Index Join
+# =============================================================================
+#
+# Two-sided (R-S) variant of the intersection index, indexing the tokens of
+# the left collection and probing them with the right one, lazily.
+#
+from collections import defaultdict, Counter
+
+from fog.clustering.intersection_index import METRICS
+
+
+def intersection_index(left, right, metric='jaccard', radius=0.8, key=None):
+    """
+    For each element in right, intersection_index finds the elements in left
+    whose similarity with it is over the given radius, by counting shared
+    tokens using an inverted index.
+
+    Only left is indexed, meaning right is consumed lazily and can therefore be
+    a stream of arbitrary length. Left should thus be the smaller collection.
+
+    Args:
+        left (iterable): Arbitrary iterable containing the items to index.
+            Will be fully consumed.
+        right (iterable): Arbitrary iterable containing the items used to
+            probe the index. Will be lazily consumed.
+        metric (string, optional): Metric to use. One of {'jaccard', 'overlap'}.
+            Defaults to 'jaccard'.
+        radius (number, optional): Similarity radius. Defaults to 0.8.
+        key (callable, optional): Function returning an item's key.
+
+    Yields:
+        tuple: A similar pair (left_item, right_item).
+
+    """
+
+    if metric not in METRICS:
+        raise TypeError('fog.join.intersection_index: unknown metric "%s"' % metric)
+
+    if type(left) is not list:
+        left = list(left)
+
+    # Indexing left items
+    buckets = defaultdict(list)
+    sizes = [0] * len(left)
+
+    for j, item in enumerate(left):
+        if key is not None:
+            item = key(item)
+
+        shingles = set(item)
+        sizes[j] = len(shingles)
+
+        for shingle in shingles:
+            buckets[shingle].append(j)
+
+    # Probing the index
+    for B in right:
+        item = B
+
+        if key is not None:
+            item = key(item)
+
+        shingles = set(item)
+        size = len(shingles)
+        intersections = Counter()
+
+        for shingle in shingles:
+            bucket = buckets.get(shingle)
+
+            if bucket is None:
+                continue
+
+            for j in bucket:
+                intersections[j] += 1
+
+        for j, I in intersections.items():
+            if metric == 'jaccard':
+                U = sizes[j] + size - I
+
+                if I / U >= radius:
+                    yield left[j], B
+
+            else:
+                M = min(sizes[j], size)
+
+                if I / M >= radius:
+                    yield left[j], B
@@ -0,0 +1,80 @@
+# =============================================================================
+# Fog PassJoin Join
+# =============================================================================
+#
+# Two-sided (R-S) variant of the PassJoin algorithm, indexing the segments
+# of the left collection and probing them with the right one, lazily.
+#
+from collections import defaultdict
+
+from fog.clustering.passjoin import (
+    partition,
+    segments,
+    multi_match_aware_substrings
+)
+
+
+def passjoin(left, right, k, distance):
+    """
+    For each element in right, passjoin finds the elements in left whose
+    Levenshtein distance with it is less than or equal to k, using the
+    PassJoin algorithm.
+
+    Only left is indexed, meaning right is consumed lazily and can therefore be
+    a stream of arbitrary length. Left should thus be the smaller collection.
+
+    Args:
+        left (iterable): Arbitrary iterable containing the strings to index.
+            Will be fully consumed.
+        right (iterable): Arbitrary iterable containing the strings used to
+            probe the index. Will be lazily consumed.
+        k (number): Levenshtein distance threshold.
+        distance (callable): Function tasked to compute the Levenshtein distance
+            between two points of data.
+
+    Yields:
+        tuple: A similar pair (left_string, right_string).
+
+    """
+    if type(left) is not list:
+        left = list(left)
+
+    # Indexing left strings
+    L = defaultdict(lambda: defaultdict(list))
+
+    for j, B in enumerate(left):
+        Ll = L[len(B)]
+
+        for key in segments(k, B):
+            Ll[key].append(j)
+
+    # Probing the index
+    for A in right:
+        s = len(A)
+        seen = set()
+
+        for l in range(max(0, s - k), s + k + 1):
+            Ll = L.get(l)
+
+            if Ll is None:
+                continue
+
+            for i, start, length in partition(k, l):
+                for substring in multi_match_aware_substrings(k, A, l, i, start, length):
+                    candidates = Ll.get((i, substring))
+
+                    if candidates is None:
+                        continue
+
+                    for j in candidates:
+
+                        # NOTE: a same pair may be generated by multiple segments
+                        if j in seen:
+                            continue
+
+                        seen.add(j)
+
+                        B = left[j]
+
+                        if (s <= k and l <= k) or distance(A, B) <= k:
+                            yield B, A
@@ -0,0 +1,50 @@
+# =============================================================================
+# Fog PPJoin Join
+# =============================================================================
+#
+# Two-sided (R-S) variant of the PPJoin algorithm, indexing the left
+# collection and probing it with the right one, lazily.
+#
+from fog.clustering.ppjoin import PPJoinIndex
+
+
+def ppjoin(left, right, threshold, metric='jaccard', tokenizer=None,
+           token_ordering='freq'):
+    """
+    For each element in right, ppjoin finds the elements in left whose
+    similarity with it is over the given threshold, using the PPJoin algorithm.
+
+    Only left is indexed, meaning right is consumed lazily and can therefore be
+    a stream of arbitrary length. Left should thus be the smaller collection.
+
+    Args:
+        left (iterable): Arbitrary iterable containing the records to index.
+            Will be fully consumed.
+        right (iterable): Arbitrary iterable containing the records used to
+            probe the index. Will be lazily consumed.
+        threshold (float): The similarity threshold under which pairs of
+            records won't be deemed similar enough.
+        metric (str, optional): The similarity metric to use. Can be `jaccard`,
+            `dice` or `binary_cosine`. Defaults to `jaccard`.
+        tokenizer (callable, optional): An optional tokenizer function processing
+            the records, such as ngrams etc. Defaults to `None`.
+        token_ordering (str, optional): Which kind of token global ordering
+            to use when sorting tokens for prefix filtering. Can be `None`,
+            `freq` or `crc32`. Note that `freq` will only consider the
+            frequencies of tokens found in left. Defaults to `freq`.
+
+    Yields:
+        tuple: A similar pair (left_record, right_record).
+
+    """
+    index = PPJoinIndex(
+        threshold,
+        left,
+        metric=metric,
+        tokenizer=tokenizer,
+        token_ordering=token_ordering
+    )
+
+    for B in right:
+        for A in index.query(B):
+            yield A, B
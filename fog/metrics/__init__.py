@@ -15,3 +15,17 @@ from fog.metrics.jaccard import (
     weighted_jaccard_similarity
 )
 from fog.metrics.overlap import overlap_coefficient
+
+# NOTE: pure python versions are used when the native extension is missing
+try:
+    from cfog.metrics.levenshtein import (
+        damerau_levenshtein_distance,
+        limited_damerau_levenshtein_distance
+    )
+    from cfog.metrics.jaro import jaro_similarity, jaro_winkler_similarity
+except:
+    from fog.metrics.levenshtein import (
+        damerau_levenshtein_distance,
+        limited_damerau_levenshtein_distance
+    )
+    from fog.metrics.jaro import jaro_similarity, jaro_winkler_similarity
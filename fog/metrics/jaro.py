@@ -0,0 +1,129 @@
+# =============================================================================
+# Fog Jaro-Winkler Similarity
+# =============================================================================
+#
+# Pure python functions computing the Jaro similarity and its Jaro-Winkler
+# variant, used as fallbacks when the cfog native extension is not available.
+#
+# [Urls]:
+# https://en.wikipedia.org/wiki/Jaro%E2%80%93Winkler_distance
+#
+# [References]:
+# Jaro, M. A. (1989). "Advances in record linkage methodology as applied to
+# the 1985 census of Tampa Florida". Journal of the American Statistical
+# Association 84 (406): 414–20.
+#
+# Winkler, W. E. (1990). "String Comparator Metrics and Enhanced Decision
+# Rules in the Fellegi-Sunter Model of Record Linkage". Proceedings of the
+# Section on Survey Research Methods. American Statistical Association:
+# 354–359.
+#
+
+
+def jaro_similarity(A, B):
+    """
+    Function computing the Jaro similarity between two given strings.
+
+    Runs in O(m * w), m being the size of the first string and w the size of
+    the matching window.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        float: Jaro similarity between A & B.
+
+    Example:
+        from fog.metrics import jaro_similarity
+
+        jaro_similarity('MARTHA', 'MARHTA')
+        >>> ~0.944
+
+    """
+    if A is B or A == B:
+        return 1.0
+
+    LA = len(A)
+    LB = len(B)
+
+    if LA == 0 or LB == 0:
+        return 0.0
+
+    window = max(0, max(LA, LB) // 2 - 1)
+
+    flags_A = [False] * LA
+    flags_B = [False] * LB
+    matches = 0
+
+    # Finding matches
+    for i, a in enumerate(A):
+        for j in range(max(0, i - window), min(LB, i + window + 1)):
+            if not flags_B[j] and a == B[j]:
+                flags_A[i] = True
+                flags_B[j] = True
+                matches += 1
+                break
+
+    if matches == 0:
+        return 0.0
+
+    # Counting transpositions
+    transpositions = 0
+    j = 0
+
+    for i, a in enumerate(A):
+        if not flags_A[i]:
+            continue
+
+        while not flags_B[j]:
+            j += 1
+
+        if a != B[j]:
+            transpositions += 1
+
+        j += 1
+
+    return (
+        matches / LA +
+        matches / LB +
+        (matches - transpositions // 2) / matches
+    ) / 3
+
+
+def jaro_winkler_similarity(A, B, prefix_weight=0.1, boost_threshold=0.7):
+    """
+    Function computing the Jaro-Winkler similarity between two given strings,
+    i.e. the Jaro similarity boosted by the size of their common prefix, up
+    to 4 characters.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+        prefix_weight (float, optional): Weight of each character of the
+            common prefix. Should not exceed 0.25. Defaults to 0.1.
+        boost_threshold (float, optional): Jaro similarity over which the
+            similarity will be boosted. Defaults to 0.7.
+
+    Returns:
+        float: Jaro-Winkler similarity between A & B.
+
+    Example:
+        from fog.metrics import jaro_winkler_similarity
+
+        jaro_winkler_similarity('MARTHA', 'MARHTA')
+        >>> ~0.961
+
+    """
+    similarity = jaro_similarity(A, B)
+
+    if similarity <= boost_threshold:
+        return similarity
+
+    limit = min(len(A), len(B), 4)
+    prefix = 0
+
+    while prefix < limit and A[prefix] == B[prefix]:
+        prefix += 1
+
+    return similarity + prefix * prefix_weight * (1 - similarity)
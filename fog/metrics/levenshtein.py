@@ -0,0 +1,138 @@
+# =============================================================================
+# Fog Damerau-Levenshtein Distance
+# =============================================================================
+#
+# Pure python functions computing the Damerau-Levenshtein distance, in its
+# "optimal string alignment" variant, used as fallbacks when the cfog native
+# extension is not available.
+#
+# [Urls]:
+# https://en.wikipedia.org/wiki/Damerau%E2%80%93Levenshtein_distance
+#
+# [References]:
+# Damerau, Fred J. (March 1964), "A technique for computer detection and
+# correction of spelling errors", Communications of the ACM, ACM, 7 (3):
+# 171–176, doi:10.1145/363958.363994
+#
+
+
+def osa(A, B, max_distance=None):
+    """
+    Function computing the optimal string alignment distance between A & B,
+    A being the shortest one, using three rows of dynamic programming.
+
+    """
+    LA = len(A)
+    LB = len(B)
+
+    # Ignoring common suffix
+    while LA > 0 and A[LA - 1] == B[LB - 1]:
+        LA -= 1
+        LB -= 1
+
+    # Ignoring common prefix
+    start = 0
+
+    while start < LA and A[start] == B[start]:
+        start += 1
+
+    if start == LA:
+        return LB - start
+
+    A = A[start:LA]
+    B = B[start:LB]
+    LA -= start
+    LB -= start
+
+    shift = LB - LA
+
+    before = None
+    previous = list(range(LB + 1))
+
+    for i in range(1, LA + 1):
+        a = A[i - 1]
+        current = [i] + [0] * LB
+
+        for j in range(1, LB + 1):
+            b = B[j - 1]
+
+            value = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a != b)
+            )
+
+            if i > 1 and j > 1 and a == B[j - 2] and A[i - 2] == b:
+                value = min(value, before[j - 2] + 1)
+
+            current[j] = value
+
+        # Values never decrease along the diagonal of the last cell
+        if max_distance is not None and current[i + shift] > max_distance:
+            return max_distance + 1
+
+        before = previous
+        previous = current
+
+    return previous[LB]
+
+
+def damerau_levenshtein_distance(A, B):
+    """
+    Function computing the Damerau-Levenshtein distance between two given
+    strings, in its "optimal string alignment" variant, i.e. where no
+    substring can be edited more than once.
+
+    Runs in O(m * n), m & n being the sizes of both strings.
+
+    Args:
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        int: Damerau-Levenshtein distance between A & B.
+
+    Example:
+        from fog.metrics import damerau_levenshtein_distance
+
+        damerau_levenshtein_distance('abcd', 'acbd')
+        >>> 1
+
+    """
+    if A is B or A == B:
+        return 0
+
+    if len(A) > len(B):
+        A, B = B, A
+
+    return osa(A, B)
+
+
+def limited_damerau_levenshtein_distance(max_distance, A, B):
+    """
+    Function computing the limited Damerau-Levenshtein distance, in its
+    "optimal string alignment" variant, between two given strings, i.e. if
+    the distance between A & B is over the given maximum, the function will
+    stop computing and return an upper bound of max_distance + 1.
+
+    Args:
+        max_distance (number): Maximum allowable distance between A & B.
+        A (str): First string.
+        B (str): Second string.
+
+    Returns:
+        int: Damerau-Levenshtein distance between A & B or an upper bound.
+
+    """
+    if A is B or A == B:
+        return 0
+
+    if len(A) > len(B):
+        A, B = B, A
+
+    if len(B) - len(A) > max_distance:
+        return max_distance + 1
+
+    distance = osa(A, B, max_distance)
+
+    return distance if distance <= max_distance else max_distance + 1
@@ -8,6 +8,16 @@ EXTENSIONS = [
         'cfog.metrics.levenshtein',
         ['cfog/metrics/levenshtein.c'],
         optional=True
+    ),
+    Extension(
+        'cfog.metrics.jaro',
+        ['cfog/metrics/jaro.c'],
+        optional=True
+    ),
+    Extension(
+        'cfog.metrics.overlap',
+        ['cfog/metrics/overlap.c'],
+        optional=True
     )
 ]
 
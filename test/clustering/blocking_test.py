@@ -3,7 +3,7 @@
 # =============================================================================
 from test.clustering.utils import Clusters
 from Levenshtein import distance as levenshtein
-from fog.clustering import blocking
+from fog.clustering import blocking, BlockingStats
 
 DATA = [
     'Abelard',
@@ -36,3 +36,37 @@ class TestBlocking(object):
         clusters = Clusters(blocking(DATA, blocks=blocks, distance=levenshtein, radius=1))
 
         assert clusters == CLUSTERS
+
+    def test_stop_blocks(self):
+        data = DATA + ['Azerty', 'Aztec']
+
+        clusters = Clusters(blocking(data, block=lambda x: x[0], distance=levenshtein, radius=1))
+
+        assert clusters == CLUSTERS
+
+        stats = BlockingStats()
+        clusters = Clusters(blocking(data, block=lambda x: x[0], distance=levenshtein, radius=1, max_block_size=3, stats=stats))
+
+        assert clusters == Clusters([('Belgian', 'Belgia')])
+        assert stats.stop_blocks == 1
+        assert stats.blocks == 1
+        assert stats.comparisons == 1
+        assert stats.block_sizes == {2: 1}
+
+    def test_tiles(self):
+        for processes in [1, 2]:
+            for mode in ['connected_components', 'fuzzy_clusters']:
+                expected = Clusters(blocking(DATA, block=lambda x: x[0], distance=levenshtein, radius=1, mode=mode))
+
+                for tile_size in [1, 2, 3]:
+                    stats = BlockingStats()
+                    clusters = Clusters(blocking(DATA, block=lambda x: x[0], distance=levenshtein, radius=1, mode=mode, processes=processes, tile_size=tile_size, stats=stats))
+
+                    assert clusters == expected
+                    assert stats.comparisons == 7
+                    assert stats.max_block_comparisons == 6
+                    assert stats.tiles > 0
+                    assert stats.block_sizes == {4: 1, 2: 1}
+
+                    if processes > 1:
+                        assert stats.tasks == 1
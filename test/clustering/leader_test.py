@@ -0,0 +1,77 @@
+# =============================================================================
+# Fog Streaming Leader Clustering Unit Tests
+# =============================================================================
+from test.clustering.utils import Clusters
+from Levenshtein import distance as levenshtein
+from cfog.metrics import levenshtein_distance
+from fog.clustering import streaming_leader, pairwise_leader
+
+from test.clustering.pairwise_test import DATA, LEADER_CLUSTERS, NAMES
+
+
+class TestStreamingLeader(object):
+    def test_basics(self):
+        clusters = Clusters(streaming_leader(DATA, distance=levenshtein, radius=2))
+
+        assert clusters == LEADER_CLUSTERS
+
+        for radius in [1, 2]:
+            expected = Clusters(pairwise_leader(NAMES, distance=levenshtein, radius=radius))
+
+            for distance in [levenshtein, levenshtein_distance]:
+                clusters = Clusters(streaming_leader(iter(NAMES), distance=distance, radius=radius))
+
+                assert clusters == expected
+
+    def test_streaming(self):
+        def stream():
+            yield from ['abc', 'abd', 'xyz', 'xyw']
+
+            raise AssertionError('should not be consumed')
+
+        clusters = streaming_leader(stream(), distance=levenshtein, radius=1, max_leaders=1)
+
+        assert next(clusters) == ['abc', 'abd']
+
+    def test_eviction(self):
+        data = ['abc', 'xyz', 'abd', 'xyw', 'qrs', 'abe', 'xyv']
+
+        clusters = Clusters(streaming_leader(data, distance=levenshtein, radius=1))
+
+        assert clusters == Clusters([['abc', 'abd', 'abe'], ['xyz', 'xyw', 'xyv']])
+
+        # Least recently updated leaders are evicted first
+        clusters = list(streaming_leader(data[:5], distance=levenshtein, radius=1, max_leaders=2, min_size=1))
+
+        assert clusters == [['abc', 'abd'], ['xyz', 'xyw'], ['qrs']]
+
+        clusters = list(streaming_leader(['abc', 'xyz', 'abd', 'qrs', 'xyw'], distance=levenshtein, radius=1, max_leaders=2, min_size=1))
+
+        assert clusters == [['xyz'], ['abc', 'abd'], ['qrs'], ['xyw']]
+
+        # Leaders not updated in a while are evicted
+        clusters = Clusters(streaming_leader(data, distance=levenshtein, radius=1, max_age=2))
+
+        assert clusters == Clusters([['abc', 'abd'], ['xyz', 'xyw']])
+
+        times = [0, 1, 2, 3, 4, 4, 4]
+
+        clusters = Clusters(streaming_leader(zip(times, data), distance=levenshtein, radius=1, max_age=2, key=lambda x: x[1], timestamp=lambda x: x[0]))
+
+        assert clusters == Clusters([[(0, 'abc'), (2, 'abd'), (4, 'abe')], [(1, 'xyz'), (3, 'xyw'), (4, 'xyv')]])
+
+        # Full clusters are yielded right away
+        clusters = list(streaming_leader(data, distance=levenshtein, radius=1, max_size=2))
+
+        assert clusters == [['abc', 'abd'], ['xyz', 'xyw']]
+
+    def test_block(self):
+        data = ['abc', 'bbc', 'abd', 'bbd']
+
+        clusters = Clusters(streaming_leader(data, distance=levenshtein, radius=1))
+
+        assert clusters == Clusters([['abc', 'bbc', 'abd']])
+
+        clusters = Clusters(streaming_leader(data, distance=levenshtein, radius=1, block=lambda x: x[0]))
+
+        assert clusters == Clusters([['abc', 'abd'], ['bbc', 'bbd']])
@@ -2,9 +2,10 @@
 # Fog NN-Descent Clustering Unit Tests
 # =============================================================================
 import csv
+import pytest
 from test.clustering.utils import Clusters
 from Levenshtein import distance as levenshtein
-from fog.clustering import nn_descent, nn_descent_full
+from fog.clustering import nn_descent, nn_descent_full, NNDescentGraph
 
 DATA = [
     'Mister Hyde',
@@ -47,3 +48,107 @@ class TestNNDescent(object):
         clusters = Clusters(nn_descent_full(UNIVERSITIES, distance=levenshtein, radius=1, seed=123))
 
         assert clusters == UNIVERSITY_CLUSTERS
+
+
+NUMBERS = list(range(0, 200, 2))
+
+
+class TestNNDescentGraph(object):
+    def test_basics(self):
+        graph = NNDescentGraph(DATA, k=2, distance=levenshtein, seed=123)
+
+        assert len(graph) == 4
+        assert graph.neighbors(0)[0] == (1, 1)
+        assert graph.neighbors(3)[0] == (2, 1)
+
+        assert Clusters(graph.clusters(1)) == CLUSTERS
+
+    def test_query(self):
+        graph = NNDescentGraph(NUMBERS, k=4, distance=lambda x, y: abs(x - y), seed=123)
+
+        assert set(graph.query(51, k=2)) == {(25, 1), (26, 1)}
+        assert [j for j, _ in graph.query(100.5, k=3)] == [50, 51, 49]
+
+    def test_add(self):
+        graph = NNDescentGraph(NUMBERS, k=4, distance=lambda x, y: abs(x - y), seed=123)
+
+        i = graph.add(101)
+
+        assert i == 100
+        assert len(graph) == 101
+        assert set(j for j, _ in graph.neighbors(i)[:2]) == {50, 51}
+        assert (i, 1) in graph.neighbors(50)
+
+        graph = NNDescentGraph(k=1, distance=levenshtein, seed=123)
+
+        for item in DATA:
+            graph.add(item)
+
+        assert Clusters(graph.clusters(1)) == CLUSTERS
+
+    def test_save(self, tmpdir):
+        path = str(tmpdir.join('graph.dill'))
+
+        graph = NNDescentGraph(DATA, k=1, distance=levenshtein, seed=123)
+        graph.save(path)
+
+        loaded = NNDescentGraph.load(path)
+
+        assert loaded.heaps == graph.heaps
+        assert loaded.query('Mister Hyd', k=1) == [(0, 1)]
+
+    def test_numpy(self):
+        clusters = Clusters(nn_descent(DATA, k=2, distance=levenshtein, radius=1, seed=123, engine='numpy'))
+
+        assert clusters == CLUSTERS
+
+        distance = lambda x, y: abs(x - y)
+        distance_many = lambda x, Y: [abs(x - y) for y in Y]
+
+        graph = NNDescentGraph(NUMBERS, k=4, distance=distance, seed=123, engine='numpy')
+
+        assert set(graph.neighbors(5)) == {(4, 2), (6, 2), (3, 4), (7, 4)}
+        assert all(len(set(j for _, j in heap)) == 4 for heap in graph.heaps)
+
+        batched = NNDescentGraph(NUMBERS, k=4, distance=distance, distance_many=distance_many, seed=123, engine='numpy')
+
+        assert batched.heaps == graph.heaps
+
+        with pytest.raises(TypeError):
+            NNDescentGraph(NUMBERS, k=4, distance=distance, engine='unknown')
+
+    def test_processes(self):
+        distance = lambda x, y: abs(x - y)
+
+        for engine in ['python', 'numpy']:
+            stats = []
+
+            graph = NNDescentGraph(NUMBERS, k=4, distance=distance, seed=123, engine=engine, callback=stats.append)
+            parallel_graph = NNDescentGraph(NUMBERS, k=4, distance=distance, seed=123, engine=engine, processes=2)
+
+            assert parallel_graph.heaps == graph.heaps
+
+            assert [s.iteration for s in stats] == list(range(len(stats)))
+            assert stats[0].comparisons == 400
+            assert all(s.comparisons > 0 for s in stats)
+
+        clusters = Clusters(nn_descent(DATA, k=2, distance=levenshtein, radius=1, seed=123, processes=2))
+
+        assert clusters == CLUSTERS
+
+    def test_few_items(self):
+        for data in [[], ['Mister Hyde']]:
+            assert list(nn_descent(data, distance=levenshtein, radius=1)) == []
+
+            graph = NNDescentGraph(data, distance=levenshtein)
+
+            assert len(graph) == len(data)
+            assert graph.k == 1
+            assert list(graph.clusters(1)) == []
+
+        graph = NNDescentGraph([], distance=levenshtein)
+
+        for item in DATA:
+            graph.add(item)
+
+        assert Clusters(graph.clusters(1)) == CLUSTERS
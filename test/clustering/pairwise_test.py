@@ -3,10 +3,12 @@
 # =============================================================================
 from test.clustering.utils import Clusters
 from Levenshtein import distance as levenshtein
+from cfog.metrics import levenshtein_distance
 from fog.clustering import (
     pairwise_leader,
     pairwise_fuzzy_clusters,
-    pairwise_connected_components
+    pairwise_connected_components,
+    PairwiseStats
 )
 
 DATA = [
@@ -32,6 +34,12 @@ FUZZY_CLUSTERS = Clusters([
     ['ghi', 'fgh']
 ])
 
+NAMES = [
+    'Jon', 'John', 'Jonah', 'Joan', 'Joanna', 'Johanna', 'Jean', 'Jeanne',
+    'Anna', 'Ana', 'Anne', 'Hannah', 'Hanna', 'Mark', 'Marc', 'Marco',
+    'Marcus', 'Markus', 'Mario', 'Maria', 'Marie', 'Mary', 'Maryam'
+]
+
 MIN_FUZZY_CLUSTERS = Clusters([
     ['bcd', 'abc', 'cde'],
     ['def', 'cde', 'efg'],
@@ -45,6 +53,28 @@ class TestPairwiseClustering(object):
 
         assert clusters == LEADER_CLUSTERS
 
+        # Oversized clusters release their items
+        data = ['abc', 'abd', 'abe', 'xyz', 'aby', 'abz']
+
+        clusters = Clusters(pairwise_leader(data, distance=levenshtein, radius=1, max_size=3))
+
+        assert clusters == Clusters([['abe', 'aby', 'abz']])
+
+        clusters = Clusters(pairwise_leader(data, distance=levenshtein, radius=1, max_size=3, min_size=1))
+
+        assert clusters == Clusters([['abe', 'aby', 'abz'], ['xyz']])
+
+        # Parallelized & batched
+        for radius in [1, 2]:
+            for max_size in [2, 3, float('inf')]:
+                expected = list(pairwise_leader(NAMES, distance=levenshtein, radius=radius, max_size=max_size))
+
+                for distance in [levenshtein, levenshtein_distance]:
+                    for processes in [1, 2]:
+                        clusters = pairwise_leader(NAMES, distance=distance, radius=radius, max_size=max_size, processes=processes, chunk_size=4)
+
+                        assert list(clusters) == expected
+
     def test_pairwise_fuzzy_clusters(self):
         clusters = Clusters(pairwise_fuzzy_clusters(DATA, distance=levenshtein, radius=2))
 
@@ -66,6 +96,12 @@ class TestPairwiseClustering(object):
 
         assert clusters == FUZZY_CLUSTERS
 
+        # Batched cfog distance
+        for processes in [1, 2]:
+            clusters = Clusters(pairwise_fuzzy_clusters(DATA, distance=levenshtein_distance, radius=2, processes=processes, chunk_size=3))
+
+            assert clusters == FUZZY_CLUSTERS
+
     def test_pairwise_connected_components(self):
         clusters = Clusters(pairwise_connected_components(DATA, distance=levenshtein, radius=2))
 
@@ -82,3 +118,65 @@ class TestPairwiseClustering(object):
         clusters = Clusters(pairwise_connected_components(keyed_data, distance=levenshtein, radius=2, key=lambda x: x[1]))
 
         assert clusters == Clusters([keyed_data])
+
+        # Batched cfog distance
+        for processes in [1, 2]:
+            clusters = Clusters(pairwise_connected_components(DATA, distance=levenshtein_distance, radius=2, processes=processes, chunk_size=3))
+
+            assert clusters == Clusters([DATA])
+
+            clusters = Clusters(pairwise_connected_components(DATA, distance=levenshtein_distance, radius=1, processes=processes, chunk_size=3))
+
+            assert clusters == Clusters([])
+
+    def test_tiles(self):
+        for radius in [1, 2]:
+            fuzzy_clusters = list(pairwise_fuzzy_clusters(NAMES, distance=levenshtein, radius=radius))
+            components = Clusters(pairwise_connected_components(NAMES, distance=levenshtein, radius=radius))
+
+            for chunk_size in [1, 4, 7, 100]:
+                for distance in [levenshtein, levenshtein_distance]:
+                    kwargs = {
+                        'distance': distance,
+                        'radius': radius,
+                        'processes': 2,
+                        'chunk_size': chunk_size
+                    }
+
+                    assert list(pairwise_fuzzy_clusters(NAMES, **kwargs)) == fuzzy_clusters
+                    assert Clusters(pairwise_connected_components(NAMES, **kwargs)) == components
+
+    def test_prune(self):
+        n = len(NAMES)
+        pairs = n * (n - 1) // 2
+
+        components = Clusters(pairwise_connected_components(NAMES, distance=levenshtein, radius=2))
+
+        stats = PairwiseStats()
+        list(pairwise_connected_components(NAMES, distance=levenshtein, radius=2, stats=stats))
+
+        assert stats.comparisons + stats.pruned == pairs
+        assert stats.pruned > 0
+
+        for distance in [levenshtein, levenshtein_distance]:
+            for prune in [False, True]:
+                stats = PairwiseStats()
+                clusters = Clusters(pairwise_connected_components(NAMES, distance=distance, radius=2, processes=2, chunk_size=1, prune=prune, stats=stats))
+
+                assert clusters == components
+                assert stats.comparisons + stats.pruned == pairs
+
+                if not prune:
+                    assert stats.pruned == 0 and stats.relabels == 0
+
+        # Workers should skip most pairs of a single large component
+        data = ['abc'] * 200
+        pairs = 200 * 199 // 2
+
+        stats = PairwiseStats()
+        clusters = list(pairwise_connected_components(data, distance=levenshtein, radius=1, processes=2, chunk_size=2, stats=stats))
+
+        assert clusters == [data]
+        assert stats.comparisons + stats.pruned == pairs
+        assert stats.pruned > pairs // 2
+        assert stats.relabels >= 199
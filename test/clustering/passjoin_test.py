@@ -2,8 +2,9 @@
 # Fog PassJoin Unit Tests
 # =============================================================================
 from Levenshtein import distance as levenshtein
+from cfog.metrics import levenshtein_distance
 from test.clustering.utils import Clusters
-from fog.clustering import passjoin
+from fog.clustering import passjoin, PassJoinStats
 from fog.clustering.passjoin import (
     multi_match_aware_interval,
     multi_match_aware_substrings,
@@ -146,3 +147,97 @@ class TestPassJoins(object):
         clusters = Clusters(passjoin(STRINGS, 3, distance=levenshtein, sort=False))
 
         assert clusters == CLUSTERS_K3
+
+        # Duplicate items should remain distinct
+        clusters = Clusters(passjoin(['paul', 'paul', 'benjamin'], 1, distance=levenshtein))
+
+        assert clusters == Clusters([['paul', 'paul']])
+
+    def test_processes(self):
+        for k, expected in [(1, CLUSTERS_K1), (2, CLUSTERS_K2), (3, CLUSTERS_K3)]:
+            clusters = Clusters(passjoin(STRINGS, k, distance=levenshtein, processes=2))
+
+            assert clusters == expected
+
+    def test_stats(self):
+        strings = STRINGS + ['a' * 10, 'a' * 9, 'b' * 15]
+
+        for sort in [True, False]:
+            stats = PassJoinStats()
+
+            clusters = Clusters(passjoin(strings, 1, distance=levenshtein, sort=sort, stats=stats))
+
+            assert clusters == Clusters(list(CLUSTERS_K1) + [['a' * 10, 'a' * 9]])
+            assert stats.peak_index_size <= len(strings) * 2
+
+            if sort:
+                assert stats.evicted_lengths > 0
+                assert stats.peak_index_size < len(strings) * 2
+            else:
+                assert stats.evicted_lengths == 0
+                assert stats.peak_index_size == len(strings) * 2
+
+    def test_verification_cache(self):
+        strings = ['abcdef', 'abcdeg', 'abcdef', 'abcdeg', 'zbcdeh', 'zbcdeh']
+
+        calls = 0
+
+        def distance(A, B):
+            nonlocal calls
+            calls += 1
+            return levenshtein(A, B)
+
+        expected = Clusters([strings])
+
+        stats = PassJoinStats()
+        clusters = Clusters(passjoin(strings, 2, distance=distance, stats=stats))
+
+        assert clusters == expected
+        assert stats.verifications == calls == 15
+        assert stats.candidates >= stats.verifications
+        assert stats.cache_hits == 0
+
+        calls = 0
+        stats = PassJoinStats()
+        clusters = Clusters(passjoin(strings, 2, distance=distance, stats=stats, verification_cache=10))
+
+        assert clusters == expected
+        assert stats.verifications == calls == 6
+        assert stats.cache_hits == 9
+
+        # Cache smaller than the number of verified pairs
+        calls = 0
+        stats = PassJoinStats()
+        clusters = Clusters(passjoin(strings, 2, distance=distance, stats=stats, verification_cache=2))
+
+        assert clusters == expected
+        assert stats.verifications == calls == 8
+        assert stats.cache_hits == 7
+
+        # Null cache
+        calls = 0
+        stats = PassJoinStats()
+        clusters = Clusters(passjoin(strings, 2, distance=distance, stats=stats, verification_cache=0))
+
+        assert clusters == expected
+        assert stats.verifications == calls == 15
+        assert stats.cache_hits == 0
+
+        clusters = Clusters(passjoin(['abc', 'abd', 'xyz', 'abcd'], 1, distance=levenshtein, verification_cache=0))
+
+        assert clusters == Clusters([('abc', 'abd', 'abcd')])
+
+    def test_batch(self):
+        for k, expected in [(1, CLUSTERS_K1), (2, CLUSTERS_K2), (3, CLUSTERS_K3)]:
+            for processes in [1, 2]:
+                clusters = Clusters(passjoin(STRINGS, k, distance=levenshtein_distance, processes=processes))
+
+                assert clusters == expected
+
+        strings = ['abcdef', 'abcdeg', 'abcdef', 'abcdeg', 'zbcdeh', 'zbcdeh']
+
+        stats = PassJoinStats()
+        clusters = Clusters(passjoin(strings, 2, distance=levenshtein_distance, stats=stats))
+
+        assert clusters == Clusters([strings])
+        assert stats.verifications <= 15
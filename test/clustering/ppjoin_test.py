@@ -2,13 +2,24 @@
 # Fog PPJoin Clustering Unit Tests
 # =============================================================================
 import csv
+from array import array
+from collections import Counter
+from pytest import approx
 from test.clustering.utils import Clusters
-from fog.clustering import ppjoin
+from fog.clustering import ppjoin, ppjoin_top_k, weighted_ppjoin, PPJoinIndex
+from fog.clustering.ppjoin import (
+    TokenizedRecords,
+    python_overlaps,
+    numpy_overlaps,
+    cfog_overlaps
+)
 from fog.tokenizers import ngrams
 from fog.metrics import (
     jaccard_similarity,
+    weighted_jaccard_similarity,
     dice_coefficient,
-    binary_cosine_similarity
+    binary_cosine_similarity,
+    sparse_cosine_similarity
 )
 
 
@@ -112,3 +123,128 @@ class TestPPJoin(object):
 
             for A, B in pairs:
                 assert binary_cosine_similarity(tokenizer(A), tokenizer(B)) >= 0.9
+
+    def test_verification(self):
+        pairs = list(ppjoin(UNIVERSITIES, 0.5, tokenizer=tokenizer, verification='python'))
+
+        for verification in ['auto', 'numpy', 'cfog']:
+            assert list(ppjoin(UNIVERSITIES, 0.5, tokenizer=tokenizer, verification=verification)) == pairs
+
+    def test_sorted_overlaps(self):
+        records = TokenizedRecords()
+
+        for record in [[1, 2, 3, 4], [2, 4, 6], [7, 8], [1, 2, 3, 5, 8]]:
+            records.append(record)
+
+        record = array('I', [1, 2, 3, 5, 8])
+
+        # NOTE: large enough batch for numpy to kick in
+        candidates = [0, 1, 2] * 30
+
+        for overlaps in [python_overlaps, numpy_overlaps, cfog_overlaps]:
+            assert overlaps(record, records, candidates, [0] * 90) == [3, 1, 1] * 30
+            assert overlaps(record, records, candidates, [3] * 90) == [3, -1, -1] * 30
+            assert overlaps(record, records, candidates, [2] * 90) == [3, -1, -1] * 30
+
+    def test_empty_overlaps(self):
+        records = TokenizedRecords()
+
+        for record in [[], [1, 2], [3]]:
+            records.append(record)
+
+        empty_record = array('I')
+        record = array('I', [1, 2])
+
+        candidates = [0, 1, 2] * 30
+
+        for overlaps in [python_overlaps, numpy_overlaps, cfog_overlaps]:
+            assert overlaps(empty_record, records, candidates, [0] * 90) == [0, 0, 0] * 30
+            assert overlaps(empty_record, records, candidates, [1] * 90) == [-1, -1, -1] * 30
+            assert overlaps(record, records, candidates, [0] * 90) == [0, 2, 0] * 30
+            assert overlaps(record, records, candidates, [1] * 90) == [-1, 2, -1] * 30
+
+    def test_top_k(self):
+        k = len(JACCARD_5_GRAMS_T8_PAIRS)
+        triples = list(ppjoin_top_k(UNIVERSITIES, k, tokenizer=tokenizer))
+
+        assert Clusters((A, B) for A, B, _ in triples) == JACCARD_5_GRAMS_T8_PAIRS
+
+        similarities = [s for _, _, s in triples]
+
+        assert similarities == sorted(similarities, reverse=True)
+
+        for A, B, s in triples:
+            assert jaccard_similarity(tokenizer(A), tokenizer(B)) == approx(s)
+
+        neighbors = dict(ppjoin_top_k(UNIVERSITIES, 2, tokenizer=tokenizer, per_record=True))
+
+        assert len(neighbors) == len(UNIVERSITIES)
+
+        for A, B in JACCARD_5_GRAMS_T8_PAIRS:
+            similarity = jaccard_similarity(tokenizer(A), tokenizer(B))
+
+            assert len(neighbors[A]) == 2
+            assert neighbors[A][0][1] >= similarity - 1e-6
+            assert neighbors[B][0][1] >= similarity - 1e-6
+
+    def test_weighted(self):
+        def weighted_tokenizer(r):
+            return Counter(ngrams(2, r))
+
+        universities = UNIVERSITIES[:300]
+        vectors = [weighted_tokenizer(u) for u in universities]
+
+        for metric, similarity in [('cosine', sparse_cosine_similarity), ('jaccard', weighted_jaccard_similarity)]:
+            for threshold in [0.6, 0.8]:
+                pairs = Clusters(weighted_ppjoin(universities, threshold, metric=metric, tokenizer=weighted_tokenizer))
+
+                expected = Clusters(
+                    (universities[i], universities[j])
+                    for i in range(len(universities))
+                    for j in range(i + 1, len(universities))
+                    if similarity(vectors[i], vectors[j]) >= threshold
+                )
+
+                assert pairs == expected
+
+    def test_processes(self):
+        for kwargs in CLUSTERINGS:
+            pairs = list(ppjoin(UNIVERSITIES, 0.85, metric='dice', tokenizer=tokenizer, **kwargs))
+            parallel_pairs = list(ppjoin(UNIVERSITIES, 0.85, metric='dice', tokenizer=tokenizer, processes=2, **kwargs))
+
+            assert parallel_pairs == pairs
+            assert Clusters(parallel_pairs) == DICE_5_GRAMS_T85_PAIRS
+
+    def test_index(self, tmpdir):
+        for token_ordering in [None, 'freq', 'crc32']:
+            index = PPJoinIndex(0.8, UNIVERSITIES[:500], tokenizer=tokenizer, token_ordering=token_ordering)
+
+            for university in UNIVERSITIES[500:]:
+                index.add(university)
+
+            assert len(index) == len(UNIVERSITIES)
+
+            path = str(tmpdir.join('index.pkl'))
+            index.save(path)
+            index = PPJoinIndex.load(path)
+
+            pairs = Clusters(
+                (university, match)
+                for university in UNIVERSITIES
+                for match in index.query(university)
+                if match != university
+            )
+
+            assert pairs == JACCARD_5_GRAMS_T8_PAIRS
+
+            pairs = Clusters(
+                (university, match)
+                for university in UNIVERSITIES
+                for match in index.query(university, threshold=0.9)
+                if match != university
+            )
+
+            assert pairs == Clusters(
+                (A, B) for A, B in JACCARD_5_GRAMS_T8_PAIRS
+                if jaccard_similarity(tokenizer(A), tokenizer(B)) >= 0.9
+            )
@@ -4,7 +4,7 @@
 import csv
 from test.clustering.utils import Clusters
 from Levenshtein import distance as levenshtein
-from fog.clustering import quickjoin
+from fog.clustering import quickjoin, QuickJoinStats
 from fog.metrics import jaccard_similarity
 
 DATA = [
@@ -52,3 +52,44 @@ class TestQuickJoin(object):
         vptree_clusters = Clusters(quickjoin(UNIVERSITIES, distance=levenshtein, radius=1))
 
         assert vptree_clusters == UNIVERSITY_CLUSTERS
+
+    def test_determinism(self):
+        data = sorted(UNIVERSITIES)
+
+        for mode in ['connected_components', 'fuzzy_clusters']:
+            clusters = list(quickjoin(data, distance=levenshtein, radius=2, seed=123, block_size=50, mode=mode))
+
+            for processes, task_size in [(2, None), (3, 200), (2, len(data))]:
+                parallel_clusters = list(quickjoin(data, distance=levenshtein, radius=2, seed=123, block_size=50, mode=mode, processes=processes, task_size=task_size))
+
+                assert parallel_clusters == clusters
+
+    def test_stats(self):
+        data = sorted(UNIVERSITIES)
+        n = len(data)
+
+        stats = QuickJoinStats()
+        clusters = Clusters(quickjoin(data, distance=levenshtein, radius=1, block_size=50, stats=stats))
+
+        assert clusters == UNIVERSITY_CLUSTERS
+        assert stats.distances < n * (n - 1) // 2
+        assert stats.saved > 0
+
+        parallel_stats = QuickJoinStats()
+        list(quickjoin(data, distance=levenshtein, radius=1, block_size=50, stats=parallel_stats, seed=123, processes=2))
+
+        serial_stats = QuickJoinStats()
+        list(quickjoin(data, distance=levenshtein, radius=1, block_size=50, stats=serial_stats, seed=123))
+
+        assert parallel_stats.distances == serial_stats.distances
+        assert parallel_stats.saved == serial_stats.saved
+
+    def test_duplicates(self):
+        data = [(i * 7) % 50 for i in range(600)]
+        distance = lambda x, y: abs(x - y)
+
+        clusters = Clusters(quickjoin(data, distance=distance, radius=0, block_size=30, seed=123))
+        vp_tree_clusters = Clusters(quickjoin(data, distance=distance, radius=0, block_size=30, seed=123, vp_tree=True))
+
+        assert len(clusters) == 50
+        assert vp_tree_clusters == clusters
@@ -0,0 +1,102 @@
+# =============================================================================
+# Fog Clustering Utilities Unit Tests
+# =============================================================================
+import pytest
+from random import Random
+
+from test.clustering.utils import Clusters
+from fog.clustering.utils import clusters_from_pairs, IncrementalUnionFind
+
+PAIRS = [
+    ('a', 'b'),
+    ('b', 'c'),
+    ('d', 'e'),
+    ('f', 'g'),
+    ('g', 'h'),
+    ('h', 'f'),
+    ('i', 'j')
+]
+
+
+class TestClustersFromPairs(object):
+    def test_exceptions(self):
+        with pytest.raises(TypeError):
+            list(clusters_from_pairs(PAIRS, mode='unknown'))
+
+    def test_union_find(self):
+        sets = IncrementalUnionFind()
+
+        for _ in range(6):
+            sets.add()
+
+        sets.union(0, 1)
+        sets.union(2, 3)
+        sets.union(1, 3)
+
+        assert len(sets) == 6
+        assert sets.find(0) == sets.find(2)
+        assert sets.find(4) != sets.find(5)
+        assert Clusters(sets.components(min_size=2)) == Clusters([[0, 1, 2, 3]])
+
+    def test_connected_components(self):
+        clusters = Clusters(clusters_from_pairs(PAIRS))
+
+        assert clusters == Clusters([
+            ['a', 'b', 'c'],
+            ['d', 'e'],
+            ['f', 'g', 'h'],
+            ['i', 'j']
+        ])
+
+        clusters = Clusters(clusters_from_pairs(PAIRS, min_size=3))
+
+        assert clusters == Clusters([['a', 'b', 'c'], ['f', 'g', 'h']])
+
+        clusters = Clusters(clusters_from_pairs(PAIRS, max_size=2))
+
+        assert clusters == Clusters([['d', 'e'], ['i', 'j']])
+
+    def test_fuzzy_clusters(self):
+        clusters = Clusters(clusters_from_pairs(PAIRS, mode='fuzzy_clusters'))
+
+        assert clusters == Clusters([
+            ['a', 'b'],
+            ['c', 'b'],
+            ['d', 'e'],
+            ['f', 'g', 'h'],
+            ['i', 'j']
+        ])
+
+    def test_max_edges_in_memory(self):
+        rng = Random(123)
+        pairs = [(rng.randrange(200), rng.randrange(200)) for _ in range(500)]
+        pairs = [(a, b) for a, b in pairs if a != b]
+
+        for fuzzy in [False, True]:
+            expected = list(clusters_from_pairs(
+                pairs,
+                mode='fuzzy_clusters',
+                fuzzy=fuzzy
+            ))
+
+            for max_edges_in_memory in [1, 7, 100, 10000]:
+                clusters = list(clusters_from_pairs(
+                    pairs,
+                    mode='fuzzy_clusters',
+                    fuzzy=fuzzy,
+                    max_edges_in_memory=max_edges_in_memory
+                ))
+
+                assert clusters == expected
+
+    def test_items(self):
+        items = ['a', 'b', 'a', 'c', 'd']
+        pairs = [(0, 1), (1, 2), (3, 4)]
+
+        clusters = Clusters(clusters_from_pairs(pairs, items=items))
+
+        assert clusters == Clusters([['a', 'a', 'b'], ['c', 'd']])
+
+        clusters = Clusters(clusters_from_pairs(pairs, items=items, mode='fuzzy_clusters'))
+
+        assert clusters == Clusters([['a', 'b'], ['c', 'd']])
@@ -0,0 +1,53 @@
+# =============================================================================
+# Fog Intersection Index Join Unit Tests
+# =============================================================================
+from itertools import cycle, islice
+from fog.join import intersection_index
+
+LEFT = [
+    'abcde',
+    'zyx'
+]
+
+RIGHT = [
+    'abcdeg',
+    'abcdegfjexge',
+    'zyxw',
+    'klm'
+]
+
+
+class TestIntersectionIndex(object):
+    def test_basics(self):
+        pairs = set(intersection_index(LEFT, iter(RIGHT), radius=0.8))
+
+        assert pairs == {('abcde', 'abcdeg')}
+
+    def test_overlap(self):
+        pairs = set(intersection_index(LEFT, iter(RIGHT), radius=0.8, metric='overlap'))
+
+        assert pairs == {
+            ('abcde', 'abcdeg'),
+            ('abcde', 'abcdegfjexge'),
+            ('zyx', 'zyxw')
+        }
+
+    def test_stream(self):
+        consumed = 0
+
+        def stream():
+            nonlocal consumed
+
+            for B in islice(cycle(RIGHT), 100 * len(RIGHT)):
+                consumed += 1
+                yield B
+
+        pairs = intersection_index(LEFT, stream(), radius=0.8)
+
+        assert next(pairs) in {('abcde', 'abcdeg')}
+        assert consumed <= len(RIGHT)
+
+        for _ in pairs:
+            pass
+
+        assert consumed == 100 * len(RIGHT)
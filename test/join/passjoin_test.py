@@ -0,0 +1,61 @@
+# =============================================================================
+# Fog PassJoin Join Unit Tests
+# =============================================================================
+from itertools import cycle, islice
+from Levenshtein import distance as levenshtein
+from fog.join import passjoin
+
+LEFT = [
+    'benjamin',
+    'paul',
+    'pa',
+    'benja',
+    'a',
+    ''
+]
+
+RIGHT = [
+    'benjomon',
+    'paule',
+    'ab',
+    'paul',
+    'zorglub'
+]
+
+
+def naive_join(k):
+    return set(
+        (A, B)
+        for A in LEFT
+        for B in RIGHT
+        if levenshtein(A, B) <= k
+    )
+
+
+class TestPassJoin(object):
+    def test_passjoin(self):
+        for k in range(1, 4):
+            pairs = list(passjoin(LEFT, iter(RIGHT), k, distance=levenshtein))
+
+            assert len(pairs) == len(set(pairs))
+            assert set(pairs) == naive_join(k)
+
+    def test_stream(self):
+        consumed = 0
+
+        def stream():
+            nonlocal consumed
+
+            for B in islice(cycle(RIGHT), 100 * len(RIGHT)):
+                consumed += 1
+                yield B
+
+        pairs = passjoin(LEFT, stream(), 2, distance=levenshtein)
+
+        assert next(pairs) in naive_join(2)
+        assert consumed <= len(RIGHT)
+
+        for _ in pairs:
+            pass
+
+        assert consumed == 100 * len(RIGHT)
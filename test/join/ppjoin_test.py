@@ -0,0 +1,61 @@
+# =============================================================================
+# Fog PPJoin Join Unit Tests
+# =============================================================================
+from itertools import cycle, islice
+from fog.join import ppjoin
+from fog.metrics import jaccard_similarity
+from fog.tokenizers import ngrams
+
+LEFT = [
+    'Kansas State University',
+    'Taylor University',
+    'Western Kentucky University',
+    'University of Western Ontario'
+]
+
+RIGHT = [
+    'Arkansas State University',
+    'Baylor University',
+    'Eastern Kentucky University',
+    'The University of Western Ontario',
+    'University of Milan'
+]
+
+
+def tokenizer(r):
+    return ngrams(5, r)
+
+
+class TestPPJoin(object):
+    def test_ppjoin(self):
+        for token_ordering in [None, 'freq', 'crc32']:
+            pairs = set(ppjoin(LEFT, iter(RIGHT), 0.8, tokenizer=tokenizer, token_ordering=token_ordering))
+
+            assert pairs == set(
+                (A, B)
+                for A in LEFT
+                for B in RIGHT
+                if jaccard_similarity(tokenizer(A), tokenizer(B)) >= 0.8
+            )
+
+            assert len(pairs) == 4
+
+    def test_stream(self):
+        consumed = 0
+
+        def stream():
+            nonlocal consumed
+
+            for B in islice(cycle(RIGHT), 100 * len(RIGHT)):
+                consumed += 1
+                yield B
+
+        pairs = ppjoin(LEFT, stream(), 0.8, tokenizer=tokenizer)
+
+        assert next(pairs) in set(ppjoin(LEFT, RIGHT, 0.8, tokenizer=tokenizer))
+        assert consumed <= len(RIGHT)
+
+        for _ in pairs:
+            pass
+
+        assert consumed == 100 * len(RIGHT)
@@ -0,0 +1,49 @@
+# =============================================================================
+# Fog Jaro-Winkler Similarity Unit Tests
+# =============================================================================
+from pytest import approx
+
+from cfog.metrics import jaro_similarity, jaro_winkler_similarity
+from fog.metrics.jaro import (
+    jaro_similarity as python_jaro_similarity,
+    jaro_winkler_similarity as python_jaro_winkler_similarity
+)
+
+JARO_TESTS = [
+    ('MARTHA', 'MARHTA', 0.944),
+    ('DWAYNE', 'DUANE', 0.822),
+    ('DIXON', 'DICKSONX', 0.767),
+    ('CRATE', 'TRACE', 0.733),
+    ('abc', 'abc', 1),
+    ('abc', 'xyz', 0),
+    ('a', 'a', 1),
+    ('', 'abc', 0),
+    ('', '', 1),
+    ('因為我是', '為因我是', 0.917)
+]
+
+JARO_WINKLER_TESTS = [
+    ('MARTHA', 'MARHTA', 0.961),
+    ('DWAYNE', 'DUANE', 0.84),
+    ('DIXON', 'DICKSONX', 0.813),
+    ('CRATE', 'TRACE', 0.733),
+    ('abc', 'abc', 1),
+    ('abc', 'xyz', 0),
+    ('', '', 1)
+]
+
+
+class TestJaroSimilarity(object):
+    def test_jaro(self):
+        for fn in [jaro_similarity, python_jaro_similarity]:
+            for A, B, similarity in JARO_TESTS:
+                assert fn(A, B) == approx(similarity, abs=1e-3)
+                assert fn(B, A) == approx(similarity, abs=1e-3)
+
+    def test_jaro_winkler(self):
+        for fn in [jaro_winkler_similarity, python_jaro_winkler_similarity]:
+            for A, B, similarity in JARO_WINKLER_TESTS:
+                assert fn(A, B) == approx(similarity, abs=1e-3)
+
+            assert fn('MARTHA', 'MARHTA', prefix_weight=0.2) == approx(0.978, abs=1e-3)
+            assert fn('DIXON', 'DICKSONX', boost_threshold=0.8) == approx(0.767, abs=1e-3)
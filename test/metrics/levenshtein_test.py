@@ -4,9 +4,16 @@
 from cfog.metrics import (
     levenshtein_distance,
     limited_levenshtein_distance,
+    levenshtein_distance_many,
+    damerau_levenshtein_distance,
+    limited_damerau_levenshtein_distance,
     levenshtein_distance_lte1,
     damerau_levenshtein_distance_lte1
 )
+from fog.metrics.levenshtein import (
+    damerau_levenshtein_distance as python_damerau_levenshtein_distance,
+    limited_damerau_levenshtein_distance as python_limited_damerau_levenshtein_distance
+)
 
 BASIC_TESTS = [
     # (('b', 'o', 'o', 'k'), ('b', 'a', 'c', 'k'), 2),
@@ -25,6 +32,7 @@ BASIC_TESTS = [
     ('ab', 'ac', 1),
     ('ac', 'bc', 1),
     ('abc', 'axc', 1),
+    ('aa', 'ab', 1),
     ('xabxcdxxefxgx', '1ab2cd34ef5g6', 6),
     ('a', '', 1),
     ('ab', 'a', 1),
@@ -48,6 +56,32 @@ BASIC_TESTS = [
     # (list('因為我是中國人所以我會說中文'), list('因為我是英國人所以我會說英文'), 2)
 ]
 
+# NOTE: strings longer than 64 characters are dealt with using multiple words
+LONG_TESTS = [
+    ('a' * 100, 'a' * 99 + 'b', 1),
+    ('ab' * 50, 'ba' * 50, 2),
+    ('abcdefghij' * 7, 'abcdefghij' * 6 + 'abcdefghik', 1),
+    ('x' + 'abcdefghij' * 13, 'abcdefghij' * 13 + 'y', 2),
+    ('因為我是中國人所以我會說中文' * 6, '因為我是英國人所以我會說英文' * 6, 12),
+    ('levenshtein' * 8, 'frankenstein' * 8, 48),
+    ('a' * 64, 'b' * 64, 64),
+    ('a' * 65, '', 65)
+]
+
+# NOTE: optimal string alignment does not edit a substring more than once
+DAMERAU_TESTS = [
+    ('ab', 'ba', 1),
+    ('abcd', 'acbd', 1),
+    ('abcdef', 'badcfe', 3),
+    ('ca', 'abc', 3),
+    ('a cat', 'an act', 2),
+    ('BONJOUR', 'OBNJORU', 2),
+    ('因為我是', '為因我是', 1),
+    ('abcd' * 20, 'bacd' * 20, 20),
+    ('abcdefghij' * 7, 'abcdefghji' * 7, 7),
+    ('a' * 65, 'b' * 65, 65)
+]
+
 HELLO_WORDS = [
     'BONJOUR',
     'BINJOUR',
@@ -95,10 +129,53 @@ class TestLevenshteinSimilarity(object):
         for A, B, distance in BASIC_TESTS:
             assert levenshtein_distance(A, B) == distance, '%s // %s => %i' % (A, B, distance)
 
+    def test_long(self):
+        for A, B, distance in LONG_TESTS:
+            assert levenshtein_distance(A, B) == distance
+            assert levenshtein_distance(B, A) == distance
+
     def test_limited(self):
         for A, B, distance in BASIC_TESTS:
             assert limited_levenshtein_distance(2, A, B) == (distance if distance <= 2 else 3)
 
+        for A, B, distance in LONG_TESTS:
+            for k in [0, 1, 2, 11, 12, 13, 70]:
+                assert limited_levenshtein_distance(k, A, B) == (distance if distance <= k else k + 1)
+
+    def test_many(self):
+        tests = BASIC_TESTS + LONG_TESTS
+
+        for A, _, _ in tests:
+            candidates = [B for _, B, _ in tests]
+
+            assert list(levenshtein_distance_many(A, candidates)) == [levenshtein_distance(A, B) for B in candidates]
+
+            for limit in [0, 1, 2, 12]:
+                assert list(levenshtein_distance_many(A, candidates, limit=limit)) == [limited_levenshtein_distance(limit, A, B) for B in candidates]
+
+        assert list(levenshtein_distance_many('abc', [])) == []
+
+    def test_damerau(self):
+        for fn in [damerau_levenshtein_distance, python_damerau_levenshtein_distance]:
+            # Transpositions can only shorten the Levenshtein distance
+            for A, B, distance in BASIC_TESTS + LONG_TESTS:
+                assert fn(A, B) <= distance
+
+            for A, B, distance in DAMERAU_TESTS:
+                assert fn(A, B) == distance, '%s // %s => %i' % (A, B, distance)
+                assert fn(B, A) == distance
+
+            for word in HELLO_WORDS + HELLO_WORDS_TRANSPOSITIONS:
+                assert fn('BONJOUR', word) == (word != 'BONJOUR')
+
+    def test_limited_damerau(self):
+        fns = [limited_damerau_levenshtein_distance, python_limited_damerau_levenshtein_distance]
+
+        for fn in fns:
+            for A, B, distance in DAMERAU_TESTS:
+                for k in [0, 1, 2, 3, 7, 70]:
+                    assert fn(k, A, B) == (distance if distance <= k else k + 1)
+
     def test_lte1(self):
         for A, B, distance in BASIC_TESTS:
             assert levenshtein_distance_lte1(A, B) == (distance <= 1)